@@ -37,7 +37,8 @@ ALLOWED_HOSTS.extend(
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Admin modules are discovered by app.urls, not on every startup
+    'core.apps.LazyAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -52,14 +53,41 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.shedding.LoadSheddingMiddleware',
+    'core.instrumentation.ServerTimingMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.memory.MemoryWatermarkMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.RouteScopedMiddleware',
+]
+
+# Load shedding: low priority reads (list polling, schema and docs) get a
+# 503 while a worker handles over SHED_MAX_IN_FLIGHT requests or requests
+# waited over SHED_MAX_QUEUE_WAIT_MS behind the proxy, 0 disables a limit
+
+SHED_MAX_IN_FLIGHT = int(os.environ.get('SHED_MAX_IN_FLIGHT', 0))
+SHED_MAX_QUEUE_WAIT_MS = int(os.environ.get('SHED_MAX_QUEUE_WAIT_MS', 1000))
+SHED_RETRY_AFTER = int(os.environ.get('SHED_RETRY_AFTER', 2))
+
+# Browser middleware run by RouteScopedMiddleware, in order, for every path
+# but the token authenticated API routes below
+
+SCOPED_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+LEAN_ROUTE_PREFIXES = ['/api/user/', '/api/recipe/']
+
+# The admin checks look for its middleware in MIDDLEWARE only,
+# core.checks runs the same checks against SCOPED_MIDDLEWARE
+
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
 
 ROOT_URLCONF = 'app.urls'
 
@@ -133,10 +161,107 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
 STATIC_URL = '/static/static/'
-MEDIA_URL = '/static/media/'
+STATIC_ROOT = '/vol/web/static'
 
+# Recipe images are only served to their owner by recipe.views, which hands
+# the file to the nginx internal location below, or streams it from Django
+# when MEDIA_ACCEL_REDIRECT_PREFIX is empty, as with runserver
+
+MEDIA_URL = '/api/recipe/media/'
 MEDIA_ROOT = '/vol/web/media'
-STATIC_ROOT = '/vol/web/static'
+# Uploads are named after their sha256, identical files are stored once.
+# MEDIA_STORAGE=s3 keeps them in an S3 compatible bucket instead, read
+# from signed URLs or the AWS_S3_CUSTOM_DOMAIN of a CDN
+MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 'local')
+if MEDIA_STORAGE == 's3':
+    DEFAULT_FILE_STORAGE = 'core.s3.S3ContentAddressedStorage'
+else:
+    DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+AWS_STORAGE_BUCKET_NAME = os.environ.get('AWS_STORAGE_BUCKET_NAME')
+AWS_S3_ENDPOINT_URL = os.environ.get('AWS_S3_ENDPOINT_URL')
+AWS_S3_REGION_NAME = os.environ.get('AWS_S3_REGION_NAME')
+AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
+AWS_SECRET_ACCESS_KEY = os.environ.get('AWS_SECRET_ACCESS_KEY')
+AWS_S3_CUSTOM_DOMAIN = os.environ.get('AWS_S3_CUSTOM_DOMAIN')
+AWS_S3_SIGNATURE_VERSION = 's3v4'
+AWS_DEFAULT_ACL = None
+AWS_QUERYSTRING_EXPIRE = int(os.environ.get('AWS_QUERYSTRING_EXPIRE', 3600))
+
+# Direct uploads, the signed upload URLs are valid for this many seconds
+MEDIA_UPLOAD_URL_EXPIRES = int(os.environ.get('MEDIA_UPLOAD_URL_EXPIRES', 300))
+# and the confirmations returned with them for this many, below the grace
+# period of garbage collection
+MEDIA_UPLOAD_CONFIRM_EXPIRES = int(
+    os.environ.get('MEDIA_UPLOAD_CONFIRM_EXPIRES', 3600)
+)
+MEDIA_UPLOAD_MAX_BYTES = int(
+    os.environ.get('MEDIA_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+)
+# Resumable uploads append their chunks to files in this directory, shared by
+# every replica of the API as the chunks of a session may reach any of them.
+# python manage.py cleanup_uploads deletes sessions idle for longer than the expiry
+MEDIA_UPLOAD_SESSION_ROOT = os.environ.get(
+    'MEDIA_UPLOAD_SESSION_ROOT',
+    '/vol/web/upload-sessions',
+)
+MEDIA_UPLOAD_SESSION_EXPIRY_HOURS = float(
+    os.environ.get('MEDIA_UPLOAD_SESSION_EXPIRY_HOURS', 24)
+)
+# Rows deleted per transaction when deleted users and recipes are purged
+DELETION_BATCH_SIZE = int(os.environ.get('DELETION_BATCH_SIZE', 500))
+# A run leases its task for this long after each batch, so no other run
+# purges it meanwhile. Once the lease expires the task can be run again
+DELETION_LEASE_SECONDS = int(os.environ.get('DELETION_LEASE_SECONDS', 600))
+# Background jobs run by python manage.py run_worker. A job not finished
+# within its lease is run again, JOB_DEFAULT_LEASE_SECONDS applies to jobs
+# no longer registered. Failed attempts are retried after a delay doubling
+# from the base up to the max, finished jobs are kept for the retention
+JOB_DEFAULT_LEASE_SECONDS = int(
+    os.environ.get('JOB_DEFAULT_LEASE_SECONDS', 300)
+)
+JOB_RETRY_BASE_DELAY_SECONDS = float(
+    os.environ.get('JOB_RETRY_BASE_DELAY_SECONDS', 10)
+)
+JOB_RETRY_MAX_DELAY_SECONDS = float(
+    os.environ.get('JOB_RETRY_MAX_DELAY_SECONDS', 3600)
+)
+JOB_RETENTION_DAYS = float(os.environ.get('JOB_RETENTION_DAYS', 7))
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', 2))
+JOB_POLL_INTERVAL_SECONDS = float(
+    os.environ.get('JOB_POLL_INTERVAL_SECONDS', 1)
+)
+# python manage.py gc_images keeps unreferenced files this recent, they
+# may belong to a recipe being saved
+MEDIA_GC_GRACE_HOURS = float(os.environ.get('MEDIA_GC_GRACE_HOURS', 24))
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX',
+    '/protected-media/',
+)
+
+# Cache shared by every worker, used by the API throttles. The database
+# table is created by the boot command
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'api_cache'),
+    }
+}
+
+# Password hashing, PASSWORD_HASH_ITERATIONS sets the PBKDF2 work factor
+# (Django's default when 0). Hashes are upgraded on the next login
+
+PASSWORD_HASHERS = [
+    'core.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('PASSWORD_HASH_ITERATIONS', 0))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -147,8 +272,87 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Proxies in front of the app whose X-Forwarded-For entries are
+    # trusted, 0 keys throttles by REMOTE_ADDR as set by nginx
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # Requests hashing a password, per client address and per email
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_THROTTLE_IP_RATE', '30/min'),
+        'login_email': os.environ.get('LOGIN_THROTTLE_EMAIL_RATE', '5/min'),
+        'signup_ip': os.environ.get('SIGNUP_THROTTLE_IP_RATE', '10/hour'),
+        'signup_email': os.environ.get(
+            'SIGNUP_THROTTLE_EMAIL_RATE', '5/hour',
+        ),
+        # Recipe API requests per user, counted in fixed windows
+        'api_read': os.environ.get('API_THROTTLE_READ_RATE', '600/min'),
+        'api_write': os.environ.get('API_THROTTLE_WRITE_RATE', '120/min'),
+        'api_upload': os.environ.get('API_THROTTLE_UPLOAD_RATE', '20/min'),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Prebuilt schema served at /api/schema/, regenerate it with
+# python manage.py generate_schema after changing the API
+
+OPENAPI_SCHEMA_FILE = BASE_DIR / 'openapi.yml'
+
+# Performance instrumentation
+# Fraction of requests (0 to 1) whose timings are collected and logged
+
+PERFORMANCE_SAMPLE_RATE = float(os.environ.get('PERFORMANCE_SAMPLE_RATE', 0))
+PERFORMANCE_SERVER_TIMING = bool(
+    int(os.environ.get('PERFORMANCE_SERVER_TIMING', 0))
+)
+
+# Slow query log, disabled unless a threshold in milliseconds is set
+# SLOW_QUERY_LOG_RATE limits reports per view and minute in each worker
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 0))
+SLOW_QUERY_EXPLAIN = bool(int(os.environ.get('SLOW_QUERY_EXPLAIN', 1)))
+SLOW_QUERY_LOG_RATE = int(os.environ.get('SLOW_QUERY_LOG_RATE', 10))
+
+# Worker memory limits in megabytes, 0 disables them
+# uWSGI recycles a worker after its current request over the soft limit
+# and kills it over the hard limit (see scripts/run.sh)
+
+MEMORY_SOFT_LIMIT_MB = int(os.environ.get('MEMORY_SOFT_LIMIT_MB', 0))
+MEMORY_HARD_LIMIT_MB = int(os.environ.get('MEMORY_HARD_LIMIT_MB', 0))
+
+# Serve recipe, tag and ingredient reads from async views, set by app.asgi
+
+ASYNC_READ_VIEWS = bool(int(os.environ.get('ASYNC_READ_VIEWS', 0)))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.performance': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.slow_queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.memory': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'core.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
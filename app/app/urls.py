@@ -13,30 +13,36 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
-
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
-from django.conf import settings
+
+from core import views as core_views
+
+# Registered here rather than by the admin app so that management commands
+# that never resolve a URL do not import every admin module
+admin.autodiscover()
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
+    path('metrics', core_views.metrics, name='metrics'),
+    path('api/schema/', core_views.openapi_schema, name='api-schema'),
+    path('api/docs/', core_views.api_docs, name='api-docs'),
+    path(
+        'api/profiler/',
+        core_views.ProfilerView.as_view(),
+        name='profiler',
+    ),
+    path(
+        'api/profiler/stats/',
+        core_views.ProfilerStatsView.as_view(),
+        name='profiler-stats',
+    ),
+    path('api/memory/', core_views.MemoryView.as_view(), name='memory'),
     path(
-        'api/docs/',
-        SpectacularSwaggerView.as_view(url_name='api-schema'),
-        name='api-docs',
+        'api/memory/snapshot/',
+        core_views.MemorySnapshotView.as_view(),
+        name='memory-snapshot',
     ),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL,
-        document_root=settings.MEDIA_ROOT,
-    )
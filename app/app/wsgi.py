@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
+import gc
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,15 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+# uWSGI imports this module in the master before forking the workers.
+# Resolving the URLconf imports every view and serializer now instead of in
+# each worker on its first request, and freezing the collected heap keeps
+# the garbage collector from writing to those shared pages later.
+from django.db import connections  # noqa: E402
+from django.urls import get_resolver  # noqa: E402
+
+get_resolver().url_patterns
+connections.close_all()
+gc.collect()
+gc.freeze()
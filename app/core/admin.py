@@ -2,17 +2,51 @@
 Django Admin
 """
 
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelectMultiple
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
 from core import models
+from core.changelist import EstimatedCountPaginator, KeysetChangeList
+from core.image_metadata import METADATA_FIELDS
 
 
-class UserAdmin(BaseUserAdmin):
+class ScalableAdminMixin:
+    """Admin pages that stay fast on tables of millions of rows.
+
+    Counts are estimated and pages follow the primary key, see
+    core.changelist. Searches match the start of a column, which the
+    UPPER(column) text_pattern_ops indexes of migration 0011 serve.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/core/change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+
+class UserScopedAdminMixin:
+    """Admin pages of rows that stay with the user they were added for.
+
+    The user is the key the recipe tables are partitioned by, see
+    core.partitioning, so it is only chosen when adding a row.
+    """
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is None:
+            return readonly_fields
+        return [*readonly_fields, 'user']
+
+
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
     """Define the admin pages for users"""
     ordering = ['id']
     list_display = ['email', 'name']
+    search_fields = ['^email']
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Info'), {'fields': ('name',)}),
@@ -45,7 +79,99 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class RecipeAdminForm(forms.ModelForm):
+    """Recipe form linking only tags and ingredients of the recipe's user.
+
+    Links name the user of the recipe, whose partition of the tag or
+    ingredient table they reference, see core.partitioning.
+    """
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk is not None:
+            user_id = self.instance.user_id
+        elif cleaned_data.get('user') is not None:
+            user_id = cleaned_data['user'].pk
+        else:
+            return cleaned_data
+
+        for field in ('tags', 'ingredients'):
+            others = [
+                row.name
+                for row in cleaned_data.get(field, [])
+                if row.user_id != user_id
+            ]
+            if others:
+                self.add_error(field, _(
+                    '%(names)s belong to another user than the recipe.'
+                ) % {'names': ', '.join(others)})
+        return cleaned_data
+
+
+class RecipeAdmin(UserScopedAdminMixin, ScalableAdminMixin,
+                  admin.ModelAdmin):
+    """Define the admin pages for recipes"""
+    form = RecipeAdminForm
+    ordering = ['-id']
+    list_display = ['title', 'user', 'time_minutes', 'price']
+    list_select_related = ['user']
+    search_fields = ['^title']
+    autocomplete_fields = ['user', 'tags', 'ingredients']
+    readonly_fields = [*METADATA_FIELDS, 'deletion']
+
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        # The admin leaves out fields with a through model, though links
+        # fill in their user and are edited like auto created ones
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault('widget', AutocompleteSelectMultiple(
+                db_field, self.admin_site, using=kwargs.get('using'),
+            ))
+            return db_field.formfield(**kwargs)
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
+
+class RecipeAttributeAdmin(UserScopedAdminMixin, ScalableAdminMixin,
+                           admin.ModelAdmin):
+    """Define the admin pages for tags and ingredients"""
+    ordering = ['-id']
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    search_fields = ['^name']
+    autocomplete_fields = ['user']
+
+
+class DeletionTaskAdmin(admin.ModelAdmin):
+    """Define the admin pages showing the progress of deletions"""
+    ordering = ['-id']
+    list_display = [
+        'id', 'kind', 'user', 'status', 'deleted', 'total', 'created_at',
+        'finished_at',
+    ]
+    list_filter = ['status', 'kind']
+    list_select_related = ['user']
+    readonly_fields = [
+        'kind', 'user', 'status', 'total', 'deleted', 'error', 'locked_until',
+        'created_at', 'updated_at', 'finished_at',
+    ]
+
+
+class JobAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages showing queued and finished jobs"""
+    ordering = ['-id']
+    list_display = [
+        'id', 'name', 'status', 'priority', 'attempts', 'run_at',
+        'finished_at',
+    ]
+    list_filter = ['status', 'name']
+    readonly_fields = [
+        'name', 'kwargs', 'key', 'status', 'attempts', 'max_attempts',
+        'locked_until', 'last_error', 'created_at', 'finished_at',
+    ]
+
+
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, RecipeAttributeAdmin)
+admin.site.register(models.Ingredient, RecipeAttributeAdmin)
+admin.site.register(models.DeletionTask, DeletionTaskAdmin)
+admin.site.register(models.Job, JobAdmin)
@@ -1,6 +1,34 @@
 from django.apps import AppConfig
+from django.contrib.admin.apps import SimpleAdminConfig
+from django.contrib.admin.checks import check_admin_app, check_dependencies
+from django.core import checks
 
 
 class CoreConfig(AppConfig):
+    default = True
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import checks  # noqa: F401
+
+
+def check_discovered_admin(app_configs, **kwargs):
+    """Run the admin checks once the admin modules are imported"""
+    from django.contrib import admin
+
+    admin.autodiscover()
+    return check_admin_app(app_configs, **kwargs)
+
+
+class LazyAdminConfig(SimpleAdminConfig):
+    """Admin app whose modules are discovered by app.urls, or when checked.
+
+    Startup skips importing every admin module, the system checks still
+    cover the ModelAdmins they register.
+    """
+    default = False
+
+    def ready(self):
+        checks.register(check_dependencies, checks.Tags.admin)
+        checks.register(check_discovered_admin, checks.Tags.admin)
@@ -0,0 +1,168 @@
+"""
+Micro-benchmarks for the hot in-process code paths
+"""
+import fnmatch
+import json
+import statistics
+import time
+
+from django.db import transaction
+
+
+BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """Raised by a benchmark setup that cannot run here, with the reason"""
+
+
+class Benchmark:
+    """A named benchmark parametrized by dataset size"""
+
+    def __init__(self, name, setup, sizes, budget=None):
+        self.name = name
+        self.setup = setup
+        self.sizes = tuple(sizes)
+        self.budget = budget
+
+    def __repr__(self):
+        return f'<Benchmark {self.name}>'
+
+
+def benchmark(name, sizes=(100, 1000), budget=None):
+    """Register a benchmark.
+
+    The decorated function receives the dataset size, builds its data and
+    returns the callable that is timed. A budget in seconds fails the run
+    whenever the median exceeds it, baseline or not.
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, sizes, budget)
+        return setup
+
+    return decorator
+
+
+def load_benchmarks():
+    """Import every module that registers benchmarks"""
+    from core.benchmarks import (  # noqa: F401
+        jobs,
+        middleware,
+        partitioning,
+        recipes,
+        startup,
+        users,
+    )
+
+    return BENCHMARKS
+
+
+def select(pattern=None):
+    """Return the registered benchmarks matching a glob pattern"""
+    benchmarks = load_benchmarks()
+    return [
+        bench for name, bench in sorted(benchmarks.items())
+        if not pattern or fnmatch.fnmatch(name, pattern)
+    ]
+
+
+def result_key(name, size):
+    """Return the key a benchmark result is stored under"""
+    return f'{name}[{size}]'
+
+
+def run_benchmark(bench, size, rounds=5):
+    """Run one benchmark at one size and return its timings.
+
+    Data is created in a transaction that is rolled back afterwards and
+    every round runs in its own savepoint, so rounds do not see each
+    other's writes.
+    """
+    timings = []
+    with transaction.atomic():
+        func = bench.setup(size)
+        for _ in range(rounds):
+            with transaction.atomic():
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+                transaction.set_rollback(True)
+        transaction.set_rollback(True)
+
+    result = {
+        'size': size,
+        'rounds': rounds,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+    }
+    if bench.budget is not None:
+        result['budget'] = bench.budget
+
+    return result
+
+
+def run(benchmarks, sizes=None, rounds=5, report=None):
+    """Run benchmarks and return a mapping of result key to timings.
+
+    Skipped benchmarks are reported with the reason instead of timings,
+    and left out of the results.
+    """
+    results = {}
+    for bench in benchmarks:
+        for size in sizes or bench.sizes:
+            try:
+                result = run_benchmark(bench, size, rounds=rounds)
+            except SkipBenchmark as exc:
+                if report:
+                    report(bench.name, {'size': size, 'skipped': str(exc)})
+                continue
+            results[result_key(bench.name, size)] = result
+            if report:
+                report(bench.name, result)
+
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """Return results whose median regressed beyond threshold vs baseline"""
+    regressions = []
+    for key, result in sorted(results.items()):
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        ratio = result['median'] / previous['median']
+        if ratio > 1 + threshold:
+            regressions.append({
+                'benchmark': key,
+                'baseline': previous['median'],
+                'current': result['median'],
+                'ratio': ratio,
+            })
+
+    return regressions
+
+
+def over_budget(results):
+    """Return results whose median exceeds the budget of their benchmark"""
+    return [
+        {
+            'benchmark': key,
+            'budget': result['budget'],
+            'current': result['median'],
+        }
+        for key, result in sorted(results.items())
+        if 'budget' in result and result['median'] > result['budget']
+    ]
+
+
+def save(results, path):
+    """Store results as a baseline file"""
+    with open(path, 'w') as baseline_file:
+        json.dump(results, baseline_file, indent=2, sort_keys=True)
+
+
+def load(path):
+    """Load results stored with save()"""
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
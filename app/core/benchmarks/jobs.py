@@ -0,0 +1,35 @@
+"""
+Benchmarks for the job queue
+"""
+from core import jobs
+from core.benchmarks import benchmark
+from core.models import Job
+
+
+@benchmark('job_enqueue', sizes=(100, 1000))
+def job_enqueue(size):
+    """jobs.enqueue of a batch of jobs, one INSERT each"""
+    def enqueue():
+        for i in range(size):
+            jobs.enqueue('noop', priority=i % 3)
+
+    return enqueue
+
+
+@benchmark('job_claim_and_run', sizes=(100, 1000))
+def job_claim_and_run(size):
+    """jobs.run_next until a queue of no-op jobs is empty.
+
+    The overhead of the queue per job in one worker thread, compare it with
+    run_worker --burst against PostgreSQL for concurrent workers.
+    """
+    jobs.load_jobs()
+    Job.objects.bulk_create(
+        Job(name='noop', priority=i % 3) for i in range(size)
+    )
+
+    def run():
+        while jobs.run_next() is not None:
+            pass
+
+    return run
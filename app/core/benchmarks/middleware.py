@@ -0,0 +1,47 @@
+"""
+Benchmarks for the middleware overhead of API requests
+"""
+import logging
+
+from django.core.handlers.base import BaseHandler
+from django.test import RequestFactory, override_settings
+
+from core.benchmarks import benchmark
+
+
+def api_requests(size, lean_prefixes):
+    """Return a callable handling API requests through the middleware"""
+    with override_settings(LEAN_ROUTE_PREFIXES=lean_prefixes):
+        handler = BaseHandler()
+        handler.load_middleware()
+
+    # Unauthenticated, so the view answers 401 without touching the
+    # database, and its warning is not logged, so the timings are
+    # dominated by the middleware
+    requests = [
+        RequestFactory().get('/api/recipe/tags/') for _ in range(size)
+    ]
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def handle():
+        logging.disable(logging.WARNING)
+        try:
+            for request in requests:
+                response = handler.get_response(request)
+                assert response.status_code == 401, response.status_code
+        finally:
+            logging.disable(logging.NOTSET)
+
+    return handle
+
+
+@benchmark('middleware_api_full_chain', sizes=(100, 1000))
+def middleware_api_full_chain(size):
+    """API requests through sessions, CSRF, auth, messages, clickjacking"""
+    return api_requests(size, [])
+
+
+@benchmark('middleware_api_lean_chain', sizes=(100, 1000))
+def middleware_api_lean_chain(size):
+    """API requests on the lean routes, skipping the browser middleware"""
+    return api_requests(size, ['/api/user/', '/api/recipe/'])
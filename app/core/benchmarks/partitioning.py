@@ -0,0 +1,147 @@
+"""
+Benchmarks of the recipe endpoints on single and partitioned tables
+
+Both build the same recipes of many users, the partitioned one partitions
+the tables by user first (see core.partitioning). Compare their medians at
+each size, on PostgreSQL, the only database partitioning the tables.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from core import partitioning
+from core.benchmarks import SkipBenchmark, benchmark
+from core.benchmarks.recipes import make_request
+from core.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from recipe import serializers
+from recipe.views import RecipeViewSet, TagViewSet
+
+
+RECIPES_PER_USER = 50
+TAGS_PER_USER = 5
+INGREDIENTS_PER_USER = 10
+# Users whose endpoints are read each round, spread over the partitions
+USERS_READ = 20
+BATCH_SIZE = 5000
+
+
+def create_users_recipes(size):
+    """Create size recipes of many users with tags and ingredients.
+
+    Return the users, RECIPES_PER_USER recipes each.
+    """
+    users = size // RECIPES_PER_USER or 1
+    get_user_model().objects.bulk_create(
+        (
+            get_user_model()(email=f'partition{i}@example.com')
+            for i in range(users)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    users = list(
+        get_user_model().objects
+        .filter(email__startswith='partition')
+        .order_by('id')
+    )
+    for model, count in [
+        (Tag, TAGS_PER_USER),
+        (Ingredient, INGREDIENTS_PER_USER),
+    ]:
+        model.objects.bulk_create(
+            (
+                model(user=user, name=f'{model.__name__} {i}')
+                for user in users
+                for i in range(count)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                user=user,
+                title=f'Recipe {i}',
+                time_minutes=i % 120,
+                price=Decimal('9.99'),
+            )
+            for user in users
+            for i in range(RECIPES_PER_USER)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    for link, model, field, per_recipe in [
+        (RecipeTag, Tag, 'tag_id', 2),
+        (RecipeIngredient, Ingredient, 'ingredient_id', 3),
+    ]:
+        rows = {}
+        for pk, user_id in model.objects.values_list('pk', 'user_id'):
+            rows.setdefault(user_id, []).append(pk)
+        recipes = Recipe.objects.values_list('pk', 'user_id').order_by('pk')
+        link.objects.bulk_create(
+            (
+                link(recipe_id=pk, user_id=user_id, **{
+                    field: rows[user_id][(pk + offset) % len(rows[user_id])],
+                })
+                for pk, user_id in recipes.iterator()
+                for offset in range(per_recipe)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+    return users
+
+
+def recipe_reads(partitioned):
+    """Build a benchmark of the reads of the recipe and tag endpoints"""
+    def setup(size):
+        if connection.vendor != 'postgresql':
+            raise SkipBenchmark('partitioning needs PostgreSQL')
+
+        users = create_users_recipes(size)
+        tables = partitioning.partitioned_tables()
+        with connection.cursor() as cursor:
+            if partitioned:
+                statements = partitioning.partition_sql(
+                    *partitioning.describe(connection, tables),
+                )
+            else:
+                statements = [f'ANALYZE {table}' for table in tables]
+            for statement in statements:
+                cursor.execute(statement)
+
+        step = max(len(users) // USERS_READ, 1)
+        views = []
+        for user in users[::step][:USERS_READ]:
+            tag = Tag.objects.filter(user=user).first()
+            views.append((
+                RecipeViewSet(
+                    request=make_request(user, {'tags': str(tag.pk)}),
+                    action='list',
+                    format_kwarg=None,
+                ),
+                TagViewSet(
+                    request=make_request(user, {'assigned_only': 1}),
+                    action='list',
+                    format_kwarg=None,
+                ),
+            ))
+
+        def read():
+            for recipe_view, tag_view in views:
+                serializers.RecipeSerializer(
+                    recipe_view.get_queryset(),
+                    many=True,
+                ).data
+                list(tag_view.get_queryset())
+
+        return read
+
+    return setup
+
+
+for layout, partitioned in [('single_table', False), ('partitioned', True)]:
+    benchmark(
+        f'recipe_reads_{layout}',
+        sizes=(10000, 100000),
+    )(recipe_reads(partitioned))
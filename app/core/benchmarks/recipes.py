@@ -0,0 +1,149 @@
+"""
+Benchmarks for recipe serializers, querysets and tag handling
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.benchmarks import benchmark
+from core.models import Recipe, Tag, Ingredient
+from recipe import serializers
+from recipe.views import RecipeViewSet
+
+
+TAGS_PER_RECIPE = 2
+INGREDIENTS_PER_RECIPE = 3
+
+
+def create_user(email='bench@example.com'):
+    """Create and return the user owning the benchmark data"""
+    return get_user_model().objects.create_user(email, 'benchpass123')
+
+
+def create_recipes(user, size):
+    """Bulk create recipes with tags and ingredients for a user"""
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'Tag {i}') for i in range(max(size // 10, 1))
+    )
+    Ingredient.objects.bulk_create(
+        Ingredient(user=user, name=f'Ingredient {i}')
+        for i in range(max(size // 5, 1))
+    )
+    Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f'Recipe {i}',
+            description='Benchmark recipe',
+            time_minutes=i % 120,
+            price=Decimal('9.99'),
+            link=f'https://example.com/recipes/{i}',
+        )
+        for i in range(size)
+    )
+    # Re-read rows, not every backend returns ids from bulk_create
+    recipes = list(Recipe.objects.filter(user=user).order_by('id'))
+    tags = list(Tag.objects.filter(user=user).order_by('id'))
+    ingredients = list(Ingredient.objects.filter(user=user).order_by('id'))
+
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(
+            recipe_id=recipe.id,
+            user_id=user.id,
+            tag_id=tags[(i + offset) % len(tags)].id,
+        )
+        for i, recipe in enumerate(recipes)
+        for offset in range(min(TAGS_PER_RECIPE, len(tags)))
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(
+            recipe_id=recipe.id,
+            user_id=user.id,
+            ingredient_id=ingredients[(i + offset) % len(ingredients)].id,
+        )
+        for i, recipe in enumerate(recipes)
+        for offset in range(min(INGREDIENTS_PER_RECIPE, len(ingredients)))
+    )
+
+    return recipes, tags, ingredients
+
+
+def make_request(user, params=None):
+    """Return an authenticated DRF request for the given query params"""
+    request = Request(APIRequestFactory().get('/', params or {}))
+    request.user = user
+    return request
+
+
+@benchmark('recipe_serializer', sizes=(1000, 10000))
+def recipe_serializer(size):
+    """RecipeSerializer.to_representation over a user's recipe list"""
+    user = create_user()
+    create_recipes(user, size)
+
+    # A fresh queryset each round, a cached one would skip the reads
+    return lambda: serializers.RecipeSerializer(
+        Recipe.objects.filter(user=user).order_by('-id'),
+        many=True,
+    ).data
+
+
+@benchmark('recipe_detail_serializer', sizes=(1000, 10000))
+def recipe_detail_serializer(size):
+    """RecipeDetailSerializer.to_representation over a user's recipe list"""
+    user = create_user()
+    create_recipes(user, size)
+    context = {'request': make_request(user)}
+
+    return lambda: serializers.RecipeDetailSerializer(
+        Recipe.objects.filter(user=user).order_by('-id'),
+        many=True,
+        context=context,
+    ).data
+
+
+def recipe_queryset(filters):
+    """Build a benchmark of RecipeViewSet.get_queryset for a filter set"""
+    def setup(size):
+        user = create_user()
+        recipes, tags, ingredients = create_recipes(user, size)
+        params = {}
+        if 'tags' in filters:
+            params['tags'] = ','.join(str(tag.id) for tag in tags[:3])
+        if 'ingredients' in filters:
+            params['ingredients'] = ','.join(
+                str(ingredient.id) for ingredient in ingredients[:3]
+            )
+        view = RecipeViewSet(
+            request=make_request(user, params),
+            action='list',
+            format_kwarg=None,
+        )
+
+        return lambda: list(view.get_queryset())
+
+    return setup
+
+
+for filters in [(), ('tags',), ('ingredients',), ('tags', 'ingredients')]:
+    name = '_'.join(('recipe_queryset',) + (filters or ('unfiltered',)))
+    benchmark(name, sizes=(1000, 10000))(recipe_queryset(filters))
+
+
+@benchmark('get_or_create_tags', sizes=(10, 100, 1000))
+def get_or_create_tags(size):
+    """RecipeSerializer._get_or_create_tags with half the tags existing"""
+    user = create_user()
+    recipe, = create_recipes(user, 1)[0]
+    Tag.objects.bulk_create(
+        Tag(user=user, name=f'Existing {i}') for i in range(size // 2)
+    )
+    tags = [{'name': f'Existing {i}'} for i in range(size // 2)]
+    tags += [{'name': f'New {i}'} for i in range(size - size // 2)]
+    serializer = serializers.RecipeSerializer(
+        context={'request': make_request(user)},
+    )
+
+    return lambda: serializer._get_or_create_tags(tags, recipe)
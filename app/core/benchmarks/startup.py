@@ -0,0 +1,65 @@
+"""
+Benchmarks for the cold start of the app and of management commands
+
+Each round starts a fresh interpreter, so the timings include Python
+startup and every import, as paid by a uWSGI master or a command run from
+scripts/run.sh.
+"""
+import collections
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+
+from core.benchmarks import benchmark
+
+
+TARGETS = {
+    'wsgi': ['-c', 'import app.wsgi'],
+    'wait_for_db': ['manage.py', 'wait_for_db', '--timeout', '0'],
+}
+IMPORT_TIME = re.compile(r'import time:\s+(\d+) \|\s+\d+ \|\s+(\S+)')
+
+
+def run_python(args, importtime=False):
+    """Run a fresh interpreter in the project and return its stderr"""
+    options = ['-X', 'importtime'] if importtime else []
+    process = subprocess.run(
+        [sys.executable, *options, *args],
+        cwd=settings.BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return process.stderr
+
+
+def import_profile(target, depth=2):
+    """Return the import time of a target in seconds by package.
+
+    Modules are grouped by the first depth components of their name
+    (django.db, rest_framework.fields, ...), slowest first.
+    """
+    packages = collections.Counter()
+    for line in run_python(TARGETS[target], importtime=True).splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            own, module = match.groups()
+            package = '.'.join(module.split('.')[:depth])
+            packages[package] += int(own) / 1e6
+
+    return packages.most_common()
+
+
+@benchmark('startup_import_wsgi', sizes=(1,), budget=0.8)
+def startup_import_wsgi(size):
+    """Import app.wsgi as the uWSGI master does before forking workers"""
+    return lambda: run_python(TARGETS['wsgi'])
+
+
+@benchmark('startup_wait_for_db', sizes=(1,), budget=0.5)
+def startup_wait_for_db(size):
+    """Run wait_for_db, the first command of every container start"""
+    return lambda: run_python(TARGETS['wait_for_db'])
@@ -0,0 +1,44 @@
+"""
+Benchmarks for the user serializers
+"""
+from django.contrib.auth.hashers import check_password, make_password
+from django.test import override_settings
+
+from core.benchmarks import benchmark
+from user.serializers import UserSerializer
+
+
+@benchmark('user_serializer_validation', sizes=(100, 1000))
+def user_serializer_validation(size):
+    """UserSerializer.is_valid on a batch of sign-up payloads"""
+    payloads = [
+        {
+            'email': f'user{i}@example.com',
+            'password': f'benchpass{i:06d}',
+            'name': f'User {i}',
+        }
+        for i in range(size)
+    ]
+
+    def validate():
+        for payload in payloads:
+            UserSerializer(data=payload).is_valid(raise_exception=True)
+
+    return validate
+
+
+@benchmark('password_check', sizes=(100000, 260000, 390000))
+def password_check(size):
+    """check_password with PASSWORD_HASH_ITERATIONS set to the size.
+
+    This is the CPU one login costs a worker, compare it to the login p99
+    measured with scripts/loadtest.py at the same work factor.
+    """
+    with override_settings(PASSWORD_HASH_ITERATIONS=size):
+        encoded = make_password('benchpass123')
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=size)
+    def check():
+        check_password('benchpass123', encoded)
+
+    return check
@@ -0,0 +1,122 @@
+"""
+Admin change lists for tables too large to count or page with OFFSET
+
+The number of rows is the planner's estimate rather than a COUNT(*), and
+lists ordered by primary key are paged with a cursor: the next page starts
+after the last key shown, so any page is read straight from the index.
+"""
+import json
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+KEYSET_VAR = 'after'
+
+
+def estimated_count(queryset):
+    """Return the planner's estimate of the rows of a queryset, or None.
+
+    Only PostgreSQL keeps the statistics to estimate from. The estimate
+    includes any filter, and the rows of every partition of the table.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator estimating large counts instead of counting every row"""
+    # Estimates below this are counted exactly, which is cheap for them
+    exact_count_limit = 10000
+    estimated = False
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is not None and estimate >= self.exact_count_limit:
+            self.estimated = True
+            return estimate
+        return super().count
+
+
+class KeysetChangeList(ChangeList):
+    """Change list paged by primary key when ordered by it"""
+
+    def __init__(self, request, *args, **kwargs):
+        self.after = request.GET.get(KEYSET_VAR)
+        self.keyset = False
+        self.next_after = None
+        super().__init__(request, *args, **kwargs)
+        # Sorting, searching and filtering start again from the first page
+        self.params.pop(KEYSET_VAR, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(KEYSET_VAR, None)
+        return lookup_params
+
+    def keyset_lookup(self, request):
+        """Return the lookup paging after a key, if ordered by primary key"""
+        # The admin's ordering repeats that of the ordered queryset
+        ordering = list(dict.fromkeys(
+            self.get_ordering(request, self.root_queryset)
+        ))
+        key = self.lookup_opts.pk.attname
+        if ordering in (['-pk'], [f'-{key}']):
+            return 'pk__lt'
+        if ordering in (['pk'], [key]):
+            return 'pk__gt'
+        return None
+
+    def get_results(self, request):
+        lookup = self.keyset_lookup(request)
+        if lookup is None or self.show_all:
+            self.after = None
+            return super().get_results(request)
+
+        queryset = self.queryset
+        if self.after is not None:
+            try:
+                queryset = queryset.filter(**{lookup: self.after})
+            except (ValueError, TypeError):
+                raise IncorrectLookupParameters
+
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page,
+        )
+        self.result_list = queryset[:self.list_per_page]
+        page = list(self.result_list)
+        if len(page) == self.list_per_page:
+            self.next_after = page[-1].pk
+
+        self.keyset = True
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.can_show_all = False
+        self.multi_page = self.after is not None or self.next_after is not None
+        self.paginator = paginator
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string(remove=[PAGE_VAR])
+
+    @property
+    def next_page_url(self):
+        return self.get_query_string(
+            {KEYSET_VAR: self.next_after},
+            [PAGE_VAR],
+        )
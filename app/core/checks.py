@@ -0,0 +1,49 @@
+"""
+System checks for the project configuration
+"""
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+
+REQUIRED_BY_ADMIN = {
+    'core.E001': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.E002': 'django.contrib.messages.middleware.MessageMiddleware',
+    'core.E003': 'django.contrib.sessions.middleware.SessionMiddleware',
+}
+
+
+@checks.register(checks.Tags.admin)
+def check_scoped_middleware(app_configs, **kwargs):
+    """Check the admin middleware run for the routes outside the API"""
+    installed = list(settings.MIDDLEWARE) + list(
+        getattr(settings, 'SCOPED_MIDDLEWARE', [])
+    )
+    return [
+        checks.Error(
+            f"'{path}' must be in MIDDLEWARE or SCOPED_MIDDLEWARE in order "
+            "to use the admin application.",
+            id=check_id,
+        )
+        for check_id, path in REQUIRED_BY_ADMIN.items()
+        if path not in installed
+    ]
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_atomic_cache(app_configs, **kwargs):
+    """Check the API throttles count requests in an atomic cache"""
+    # Not loaded with the app config, it imports rest_framework
+    from recipe.throttles import atomic_increments
+
+    if atomic_increments(caches['default']):
+        return []
+    return [
+        checks.Warning(
+            'The default cache increments with a read then a write, the API '
+            'throttles lose the requests of concurrent workers.',
+            hint='Set CACHE_BACKEND to memcached or Redis, as '
+                 'docker-compose-deploy.yml does.',
+            id='core.W001',
+        ),
+    ]
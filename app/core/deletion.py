@@ -0,0 +1,180 @@
+"""
+Deletion of users and recipes in background batches
+
+Deleting a user with Django's collector cascades over every recipe, tag,
+ingredient and through row in one transaction, which takes minutes for
+heavy users. Instead the account is deactivated at once and a DeletionTask
+and a job to run it queued, then the rows are purged in batches of bounded
+transactions by a worker (or python manage.py process_deletions). A run
+stopped halfway resumes where it stopped, and the task records the progress.
+A run leases its task first, so a job and the command never purge the same
+task at once.
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core import jobs
+from core.models import (
+    DeletionTask,
+    Ingredient,
+    Recipe,
+    Tag,
+    UploadSession,
+)
+
+
+# Models whose referencing rows PostgreSQL deletes, see migration 0013
+DATABASE_CASCADED = (Recipe, Tag, Ingredient)
+
+
+class TaskLeased(Exception):
+    """Another run holds the lease of a task"""
+
+
+def delete_user(user):
+    """Deactivate a user and queue the deletion of their data"""
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+        Token.objects.filter(user=user).delete()
+        task = DeletionTask.objects.create(kind=DeletionTask.USER, user=user)
+        jobs.enqueue('process_deletion', task_id=task.pk)
+    return task
+
+
+def delete_recipes(user, ids):
+    """Hide recipes of a user from the API and queue their deletion"""
+    with transaction.atomic():
+        task = DeletionTask.objects.create(
+            kind=DeletionTask.RECIPES,
+            user=user,
+        )
+        task.total = Recipe.objects.filter(
+            user=user,
+            pk__in=ids,
+            deletion__isnull=True,
+        ).update(deletion=task)
+        task.save(update_fields=['total'])
+        jobs.enqueue('process_deletion', task_id=task.pk)
+    return task
+
+
+def unleased(now=None):
+    """Return the unfinished tasks no run holds the lease of"""
+    now = now or timezone.now()
+    return DeletionTask.objects.exclude(
+        status=DeletionTask.DONE,
+    ).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+    )
+
+
+def pending():
+    """Return the tasks to run, including those a failed run left over"""
+    return unleased().order_by('pk')
+
+
+def lease_expiry(now=None):
+    """Return when a lease taken or renewed now expires"""
+    return (now or timezone.now()) + datetime.timedelta(
+        seconds=settings.DELETION_LEASE_SECONDS,
+    )
+
+
+def claim(task):
+    """Lease a task to this run and reload it, return if it was free"""
+    now = timezone.now()
+    claimed = unleased(now).filter(pk=task.pk).update(
+        locked_until=lease_expiry(now),
+    )
+    if claimed:
+        task.refresh_from_db()
+    return bool(claimed)
+
+
+def task_querysets(task):
+    """Return the querysets of the rows a task deletes, in order"""
+    if task.kind == DeletionTask.RECIPES:
+        return [Recipe.objects.filter(deletion=task)]
+
+    return [
+        Recipe.objects.filter(user_id=task.user_id),
+        UploadSession.objects.filter(user_id=task.user_id),
+        Tag.objects.filter(user_id=task.user_id),
+        Ingredient.objects.filter(user_id=task.user_id),
+    ]
+
+
+def delete_rows(queryset):
+    """Delete the rows of a queryset, return how many were deleted"""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql' and queryset.model in DATABASE_CASCADED:
+        # One DELETE, the database removes the rows referencing them
+        return queryset._raw_delete(queryset.db)
+
+    _, deleted = queryset.delete()
+    return deleted.get(queryset.model._meta.label, 0)
+
+
+def purge(task, queryset, batch_size):
+    """Delete the rows of a queryset, one transaction per batch"""
+    while True:
+        with transaction.atomic():
+            ids = list(
+                queryset.order_by('pk').values_list('pk', flat=True)
+                [:batch_size]
+            )
+            if not ids:
+                return
+            # Still naming the user, to read a single partition
+            deleted = delete_rows(queryset.filter(pk__in=ids))
+            DeletionTask.objects.filter(pk=task.pk).update(
+                deleted=F('deleted') + deleted,
+                locked_until=lease_expiry(),
+                updated_at=timezone.now(),
+            )
+        task.deleted += deleted
+
+
+def run(task, batch_size=None):
+    """Purge the rows of a task, then the user of a user deletion.
+
+    Raises TaskLeased, leaving the task alone, while another run holds it.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    if not claim(task):
+        raise TaskLeased(task.pk)
+
+    querysets = task_querysets(task)
+    try:
+        if task.status == DeletionTask.PENDING:
+            task.total = sum(queryset.count() for queryset in querysets)
+            task.status = DeletionTask.RUNNING
+            task.save(update_fields=['total', 'status', 'updated_at'])
+        for queryset in querysets:
+            purge(task, queryset, batch_size)
+        if task.kind == DeletionTask.USER and task.user_id is not None:
+            # Only the token and admin rows are left to cascade to
+            get_user_model().objects.filter(pk=task.user_id).delete()
+    except Exception as exc:
+        task.status = DeletionTask.FAILED
+        task.error = str(exc)
+        task.locked_until = None
+        task.save(update_fields=['status', 'error', 'locked_until', 'updated_at'])
+        raise
+
+    task.status = DeletionTask.DONE
+    task.error = ''
+    task.locked_until = None
+    task.finished_at = timezone.now()
+    # Not the user, which the database has set to null
+    task.save(update_fields=[
+        'status', 'error', 'locked_until', 'finished_at', 'updated_at',
+    ])
+    return task
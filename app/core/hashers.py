@@ -0,0 +1,20 @@
+"""
+Password hashers
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with the iteration count set by PASSWORD_HASH_ITERATIONS.
+
+    The algorithm name is unchanged, so existing hashes still verify, and
+    Django rehashes a password at the next login when the count changed.
+    """
+
+    @property
+    def iterations(self):
+        return (
+            getattr(settings, 'PASSWORD_HASH_ITERATIONS', 0)
+            or PBKDF2PasswordHasher.iterations
+        )
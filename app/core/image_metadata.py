@@ -0,0 +1,181 @@
+"""
+Metadata of recipe images, computed once when an image is attached
+
+List screens lay out images from their dimensions, and show the dominant
+colour or the placeholder until the image arrives. The placeholder is a
+BlurHash (https://blurha.sh), a few bytes any BlurHash decoder turns into a
+blurred preview.
+"""
+import math
+
+from django.core.files.storage import default_storage
+
+from core.models import Recipe
+
+
+# Pixels of the side of the thumbnail the placeholder is computed from
+PLACEHOLDER_SIZE = 32
+# Cosine components along the longer and the shorter side of the image
+PLACEHOLDER_COMPONENTS = (4, 3)
+BASE83 = (
+    '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    'abcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+)
+METADATA_FIELDS = [
+    'image_width',
+    'image_height',
+    'image_size',
+    'image_color',
+    'image_placeholder',
+]
+
+
+class UnreadableImage(Exception):
+    """A file is not an image Pillow can read"""
+
+
+def image_metadata(content):
+    """Return the metadata fields of a recipe for an image File"""
+    # Only imported where images are processed
+    from PIL import Image
+
+    try:
+        image = Image.open(content)
+        width, height = image.size
+        # Lets JPEG decode at a fraction of the size, much faster
+        image.draft('RGB', (PLACEHOLDER_SIZE * 2, PLACEHOLDER_SIZE * 2))
+        thumbnail = image.convert('RGB')
+        thumbnail.thumbnail(
+            (PLACEHOLDER_SIZE, PLACEHOLDER_SIZE),
+            Image.BILINEAR,
+        )
+    except Exception as exc:
+        raise UnreadableImage(str(exc)) from exc
+    finally:
+        content.seek(0)
+
+    if width >= height:
+        components = PLACEHOLDER_COMPONENTS
+    else:
+        components = PLACEHOLDER_COMPONENTS[::-1]
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': content.size,
+        'image_color': dominant_color(thumbnail),
+        'image_placeholder': blurhash(thumbnail, *components),
+    }
+
+
+def known_image_metadata(name):
+    """Return the metadata a recipe with the same stored image has, or None.
+
+    Identical images are stored once, so the metadata is copied from such
+    a recipe rather than read again.
+    """
+    return (
+        Recipe.objects
+        .filter(image=name, image_width__isnull=False)
+        .values(*METADATA_FIELDS)
+        .first()
+    )
+
+
+def stored_image_metadata(name):
+    """Return the metadata fields of a recipe for a stored image"""
+    known = known_image_metadata(name)
+    if known is not None:
+        return known
+
+    with default_storage.open(name) as content:
+        return image_metadata(content)
+
+
+def dominant_color(image):
+    """Return the most common colour of an RGB image as #rrggbb"""
+    quantized = image.quantize(colors=4)
+    _, index = max(quantized.getcolors())
+    red, green, blue = quantized.getpalette()[index * 3:index * 3 + 3]
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def blurhash(image, x_components, y_components):
+    """Return the BlurHash of an RGB image"""
+    width, height = image.size
+    pixels = [
+        tuple(srgb_to_linear(value) for value in pixel)
+        for pixel in image.getdata()
+    ]
+
+    factors = []
+    for j in range(y_components):
+        y_basis = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            x_basis = [
+                math.cos(math.pi * i * x / width) for x in range(width)
+            ]
+            normalisation = 1 if i == j == 0 else 2
+            total = [0.0, 0.0, 0.0]
+            for y in range(height):
+                row = y * width
+                for x in range(width):
+                    basis = x_basis[x] * y_basis[y]
+                    for channel, value in enumerate(pixels[row + x]):
+                        total[channel] += basis * value
+            scale = normalisation / (width * height)
+            factors.append([value * scale for value in total])
+
+    dc, ac = factors[0], factors[1:]
+    placeholder = encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_maximum = max(abs(value) for factor in ac for value in factor)
+        quantised_maximum = max(
+            0, min(82, math.floor(actual_maximum * 166 - 0.5)),
+        )
+        maximum = (quantised_maximum + 1) / 166
+    else:
+        quantised_maximum = 0
+        maximum = 1
+    placeholder += encode83(quantised_maximum, 1)
+
+    red, green, blue = (linear_to_srgb(value) for value in dc)
+    placeholder += encode83((red << 16) + (green << 8) + blue, 4)
+    for factor in ac:
+        red, green, blue = (
+            max(0, min(18, math.floor(
+                signed_pow(value / maximum, 0.5) * 9 + 9.5
+            )))
+            for value in factor
+        )
+        placeholder += encode83(red * 19 * 19 + green * 19 + blue, 2)
+
+    return placeholder
+
+
+def encode83(value, length):
+    """Return value as length base 83 digits"""
+    return ''.join(
+        BASE83[value // 83 ** (length - position) % 83]
+        for position in range(1, length + 1)
+    )
+
+
+def srgb_to_linear(value):
+    """Return the linear intensity of an sRGB channel value"""
+    value = value / 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(value):
+    """Return the sRGB channel value of a linear intensity"""
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def signed_pow(value, exponent):
+    """Return value to the power of exponent, keeping its sign"""
+    return math.copysign(abs(value) ** exponent, value)
@@ -0,0 +1,179 @@
+"""
+Per-request performance instrumentation
+"""
+import contextvars
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+from core.middleware import HybridMiddleware
+
+
+logger = logging.getLogger('core.performance')
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Durations and query counts collected while handling one request"""
+
+    def __init__(self):
+        self.durations = {}
+        self.query_count = 0
+
+    def add(self, name, seconds):
+        """Add time spent in a named phase"""
+        self.durations[name] = self.durations.get(name, 0) + seconds
+
+    def record_query(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing queries"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            self.add('db', time.perf_counter() - start)
+
+    def server_timing(self):
+        """Return the value of a Server-Timing header"""
+        metrics = []
+        for name, seconds in self.durations.items():
+            metric = f'{name};dur={seconds * 1000:.1f}'
+            if name == 'db':
+                metric += f';desc="{self.query_count} queries"'
+            metrics.append(metric)
+
+        return ', '.join(metrics)
+
+    def log_fields(self):
+        """Return the timings as flat structured log fields"""
+        fields = {
+            f'{name}_ms': round(seconds * 1000, 1)
+            for name, seconds in self.durations.items()
+        }
+        fields['db_queries'] = self.query_count
+        return fields
+
+
+def current_timings():
+    """Return the timings of the request being handled, if it is sampled"""
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Record the time spent in the block on the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+class ServerTimingMiddleware(HybridMiddleware):
+    """Collect timings for a sample of requests and report them"""
+
+    def sample(self):
+        """Return True when the next request should be instrumented"""
+        sample_rate = getattr(settings, 'PERFORMANCE_SAMPLE_RATE', 0)
+        return bool(sample_rate) and random.random() < sample_rate
+
+    def sync_call(self, request):
+        if not self.sample():
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings.record_query):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        timings.add('total', time.perf_counter() - start)
+
+        return self.report(request, response, timings)
+
+    async def async_call(self, request):
+        if not self.sample():
+            return await self.get_response(request)
+
+        # The context is copied into the threads running sync code, so
+        # phases are still recorded, database time is not
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        timings.add('total', time.perf_counter() - start)
+
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        """Log the timings and add them to the response when enabled"""
+        if getattr(settings, 'PERFORMANCE_SERVER_TIMING', False):
+            response['Server-Timing'] = timings.server_timing()
+
+        fields = timings.log_fields()
+        logger.info(
+            '%s %s %s %s',
+            request.method,
+            request.path,
+            response.status_code,
+            ' '.join(f'{key}={value}' for key, value in fields.items()),
+            extra=dict(
+                fields,
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+            ),
+        )
+
+        return response
+
+
+class InstrumentedViewMixin:
+    """Time authentication, serialization and rendering of a view.
+
+    Views time their own get_queryset with the timed('queryset') decorator.
+    """
+
+    def perform_authentication(self, request):
+        with timed('auth'):
+            super().perform_authentication(request)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if _current.get() is not None:
+            to_representation = serializer.to_representation
+
+            def timed_to_representation(*args, **kwargs):
+                with timed('serialize'):
+                    return to_representation(*args, **kwargs)
+
+            serializer.to_representation = timed_to_representation
+
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if _current.get() is not None and hasattr(response, 'render'):
+            # Render eagerly so rendering is attributed to this phase,
+            # Django skips rendering a response that is already rendered
+            with timed('render'):
+                response.render()
+
+        return response
@@ -0,0 +1,294 @@
+"""
+Background jobs queued in the database
+
+Jobs are rows of core.Job, run by python manage.py run_worker, so no other
+service is needed. Workers claim the ready job of highest priority with
+SELECT ... FOR UPDATE SKIP LOCKED: concurrent workers skip the rows others
+are claiming instead of waiting for them. A claimed job holds a lease, if
+its worker dies the lease expires and another worker runs it again. Jobs
+run at least once, so they must be safe to run twice.
+"""
+import datetime
+import logging
+import random
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core.models import Job
+
+
+logger = logging.getLogger('core.jobs')
+
+JOB_TYPES = {}
+
+
+class UnknownJob(Exception):
+    """No job is registered under a name"""
+
+
+class JobType:
+    """A function run by workers, with how its jobs are retried"""
+
+    def __init__(self, name, func, lease, max_attempts, priority, every):
+        self.name = name
+        self.func = func
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.priority = priority
+        self.every = every
+
+    def __repr__(self):
+        return f'<JobType {self.name}>'
+
+
+def job(name=None, lease=300, max_attempts=5, priority=0, every=None):
+    """Register a function as a job type.
+
+    Workers call it with the keyword arguments it was enqueued with. The
+    lease in seconds must exceed its longest run, and every, a timedelta,
+    makes it periodic: a new job is queued that long after each run.
+    """
+    def decorator(func):
+        job_name = name or func.__name__
+        JOB_TYPES[job_name] = JobType(
+            job_name, func, lease, max_attempts, priority, every,
+        )
+        return func
+
+    return decorator
+
+
+def load_jobs():
+    """Import every module that registers jobs"""
+    from core import tasks  # noqa: F401
+
+    return JOB_TYPES
+
+
+def registered_job(name):
+    """Return the job type registered under a name"""
+    try:
+        return load_jobs()[name]
+    except KeyError:
+        raise UnknownJob(name)
+
+
+def enqueue(name, priority=None, delay=None, key=None, **kwargs):
+    """Queue a job and return it.
+
+    Queued inside a transaction, the job only runs once it commits. While
+    a job with the same key is queued or running, that job is returned
+    instead of queuing another.
+    """
+    job_type = registered_job(name)
+    fields = {
+        'name': name,
+        'kwargs': kwargs,
+        'key': key,
+        'priority': job_type.priority if priority is None else priority,
+        'max_attempts': job_type.max_attempts,
+    }
+    if delay is not None:
+        fields['run_at'] = timezone.now() + delay
+    if key is None:
+        return Job.objects.create(**fields)
+
+    try:
+        with transaction.atomic():
+            return Job.objects.create(**fields)
+    except IntegrityError:
+        return Job.objects.get(key=key, status__in=Job.ACTIVE)
+
+
+def ready(now=None):
+    """Return the jobs a worker may claim, in the order they run"""
+    now = now or timezone.now()
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    ).order_by('-priority', 'run_at', 'pk')
+
+
+def claim(now=None):
+    """Lease the next ready job to this worker, return it or None"""
+    now = now or timezone.now()
+    if connection.vendor == 'postgresql':
+        return claim_returning(now)
+
+    with transaction.atomic():
+        job = ready(now).select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+
+        locked_until = lease_expiry(job.name, now)
+        # Without row locks, as on SQLite, the attempts tell if another
+        # worker claimed the job first
+        claimed = Job.objects.filter(
+            pk=job.pk,
+            attempts=job.attempts,
+        ).update(
+            status=Job.RUNNING,
+            attempts=F('attempts') + 1,
+            locked_until=locked_until,
+        )
+        if not claimed:
+            return None
+
+    job.status = Job.RUNNING
+    job.attempts += 1
+    job.locked_until = locked_until
+    return job
+
+
+def claim_returning(now):
+    """Claim the next ready job in one statement, on PostgreSQL.
+
+    The job is selected, locked and leased by a single UPDATE, committed at
+    once: one round trip per job, and the row stays locked for no longer.
+    """
+    cases = []
+    lease_params = []
+    for name in load_jobs():
+        cases.append('WHEN %s THEN %s')
+        lease_params += [name, lease_expiry(name, now)]
+    lease_params.append(lease_expiry(None, now))
+    sql = f'''
+        UPDATE {Job._meta.db_table}
+        SET status = %s,
+            attempts = attempts + 1,
+            locked_until = CASE name {' '.join(cases)} ELSE %s END
+        WHERE id = (
+            SELECT id FROM {Job._meta.db_table}
+            WHERE (status = %s AND run_at <= %s)
+               OR (status = %s AND locked_until < %s)
+            ORDER BY priority DESC, run_at, id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *
+    '''
+    params = [
+        Job.RUNNING,
+        *lease_params,
+        Job.QUEUED, now,
+        Job.RUNNING, now,
+    ]
+    return next(iter(Job.objects.raw(sql, params)), None)
+
+
+def lease_expiry(name, now):
+    """Return when the lease of a job claimed now expires"""
+    try:
+        lease = JOB_TYPES[name].lease
+    except KeyError:
+        lease = settings.JOB_DEFAULT_LEASE_SECONDS
+    return now + datetime.timedelta(seconds=lease)
+
+
+def retry_delay(attempts):
+    """Return how long to wait before another attempt, with jitter"""
+    delay = min(
+        settings.JOB_RETRY_MAX_DELAY_SECONDS,
+        settings.JOB_RETRY_BASE_DELAY_SECONDS * 2 ** (attempts - 1),
+    )
+    return datetime.timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def execute(job):
+    """Run a claimed job, then record its outcome, return if it succeeded.
+
+    A job whose lease expired while it ran has been claimed again, the
+    outcome of the later attempt is the one recorded.
+    """
+    attempt = Job.objects.filter(
+        pk=job.pk,
+        status=Job.RUNNING,
+        attempts=job.attempts,
+    )
+    try:
+        job_type = load_jobs()[job.name]
+    except KeyError:
+        attempt.update(
+            status=Job.FAILED,
+            last_error=f'Unknown job {job.name}',
+            locked_until=None,
+            finished_at=timezone.now(),
+        )
+        logger.error('Unknown job %s %s', job.name, job.pk)
+        return False
+
+    try:
+        job_type.func(**job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            failed = attempt.update(
+                status=Job.FAILED,
+                last_error=error,
+                locked_until=None,
+                finished_at=timezone.now(),
+            )
+            logger.error(
+                'Job %s %s failed after %s attempts\n%s',
+                job.name, job.pk, job.attempts, error,
+            )
+            if failed and job_type.every is not None:
+                schedule(job_type)
+        else:
+            attempt.update(
+                status=Job.QUEUED,
+                last_error=error,
+                locked_until=None,
+                run_at=timezone.now() + retry_delay(job.attempts),
+            )
+            logger.warning(
+                'Job %s %s failed, attempt %s of %s\n%s',
+                job.name, job.pk, job.attempts, job.max_attempts, error,
+            )
+        return False
+
+    done = attempt.update(
+        status=Job.DONE,
+        locked_until=None,
+        finished_at=timezone.now(),
+    )
+    # Should the worker die first, it queues the run when it starts again
+    if done and job_type.every is not None:
+        schedule(job_type)
+    return True
+
+
+def run_next():
+    """Claim and run the next ready job, return it or None when idle"""
+    job = claim()
+    if job is not None:
+        execute(job)
+    return job
+
+
+def schedule(job_type):
+    """Queue the next run of a periodic job unless one is queued"""
+    return enqueue(
+        job_type.name,
+        delay=job_type.every,
+        key=f'periodic:{job_type.name}',
+    )
+
+
+def ensure_periodic():
+    """Queue every periodic job that has no run queued, to run now"""
+    for job_type in load_jobs().values():
+        if job_type.every is not None:
+            enqueue(job_type.name, key=f'periodic:{job_type.name}')
+
+
+def finished_before(cutoff):
+    """Return the done and failed jobs that finished before a time"""
+    return Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED],
+        finished_at__lt=cutoff,
+    )
@@ -0,0 +1,55 @@
+"""
+Django command to record the metadata of images uploaded before it was kept
+"""
+from django.core.management.base import BaseCommand
+
+from core.image_metadata import UnreadableImage, stored_image_metadata
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to compute missing recipe image metadata"""
+    help = (
+        'Compute the dimensions, size, colour and placeholder of recipe '
+        'images that have none recorded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        pending = (
+            Recipe.objects
+            .filter(image_width__isnull=True)
+            .exclude(image__isnull=True)
+            .exclude(image='')
+            .order_by('pk')
+            .only('pk', 'image')
+        )
+        updated = failed = last = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last)[:options['batch_size']])
+            if not batch:
+                break
+
+            for recipe in batch:
+                name = recipe.image.name
+                try:
+                    metadata = stored_image_metadata(name)
+                except (OSError, UnreadableImage) as exc:
+                    failed += 1
+                    self.stderr.write(f'{name}: {exc}')
+                    continue
+
+                # Skipped if the image was replaced in the meantime
+                updated += Recipe.objects.filter(
+                    pk=recipe.pk,
+                    image=name,
+                ).update(**metadata)
+            last = batch[-1].pk
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recorded the metadata of {updated} images, '
+            f'{failed} could not be read'
+        ))
@@ -0,0 +1,115 @@
+"""
+Django command to run the micro-benchmarks
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    """Run micro-benchmarks against a throwaway test database"""
+    help = 'Run micro-benchmarks and optionally compare them to a baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'pattern', nargs='?',
+            help='Only run benchmarks whose name matches this glob.',
+        )
+        parser.add_argument(
+            '--sizes',
+            help='Comma separated dataset sizes overriding the defaults.',
+        )
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--save', help='Store results as a baseline.')
+        parser.add_argument('--compare', help='Baseline file to compare to.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed slowdown of the median before failing (0.2 = 20%%).',
+        )
+        parser.add_argument('--keepdb', action='store_true')
+        parser.add_argument(
+            '--list', action='store_true', help='List benchmarks and exit.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        selected = benchmarks.select(options['pattern'])
+        if options['list']:
+            for bench in selected:
+                sizes = ', '.join(str(size) for size in bench.sizes)
+                self.stdout.write(f'{bench.name} ({sizes})')
+            return
+        if not selected:
+            raise CommandError('No benchmarks match the given pattern.')
+
+        sizes = None
+        if options['sizes']:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+
+        old_config = setup_databases(
+            verbosity=0,
+            interactive=False,
+            keepdb=options['keepdb'],
+        )
+        try:
+            results = benchmarks.run(
+                selected,
+                sizes=sizes,
+                rounds=options['rounds'],
+                report=self.report,
+            )
+        finally:
+            teardown_databases(
+                old_config,
+                verbosity=0,
+                keepdb=options['keepdb'],
+            )
+
+        if options['save']:
+            benchmarks.save(results, options['save'])
+            self.stdout.write(f'Results saved to {options["save"]}')
+
+        over_budget = benchmarks.over_budget(results)
+        for result in over_budget:
+            self.stdout.write(self.style.ERROR(
+                '{benchmark}: {current:.4f}s over its {budget:.4f}s '
+                'budget'.format(**result)
+            ))
+        if over_budget:
+            raise CommandError(
+                f'{len(over_budget)} benchmark(s) over budget.'
+            )
+
+        if options['compare']:
+            baseline = benchmarks.load(options['compare'])
+            regressions = benchmarks.compare(
+                results,
+                baseline,
+                threshold=options['threshold'],
+            )
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(
+                    '{benchmark}: {baseline:.4f}s -> {current:.4f}s '
+                    '({ratio:.2f}x)'.format(**regression)
+                ))
+            if regressions:
+                raise CommandError(
+                    f'{len(regressions)} benchmark(s) regressed beyond '
+                    f'{options["threshold"]:.0%}.'
+                )
+            self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def report(self, name, result):
+        """Write one benchmark result"""
+        if 'skipped' in result:
+            self.stdout.write(
+                f'{benchmarks.result_key(name, result["size"])}: '
+                f'skipped, {result["skipped"]}'
+            )
+            return
+        self.stdout.write(
+            f'{benchmarks.result_key(name, result["size"])}: '
+            f'median {result["median"]:.4f}s, min {result["min"]:.4f}s '
+            f'over {result["rounds"]} rounds'
+        )
@@ -0,0 +1,136 @@
+"""
+Django command to prepare the container before the server starts
+"""
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.migrations.executor import MigrationExecutor
+
+from core.metrics import BOOT_STEP_DURATION, STARTUP_TIME
+
+
+STATIC_HASH_FILE = '.collectstatic.sha256'
+IGNORE_PATTERNS = ['CVS', '.*', '*~']
+
+
+def static_hash():
+    """Return a hash of the names and contents of every static file"""
+    found = {}
+    for finder in get_finders():
+        for path, storage in finder.list(IGNORE_PATTERNS):
+            # The first finder wins, as in collectstatic
+            found.setdefault(path, storage)
+
+    digest = hashlib.sha256()
+    for path in sorted(found):
+        digest.update(path.encode())
+        digest.update(b'\0')
+        with found[path].open(path) as file:
+            for chunk in iter(lambda: file.read(65536), b''):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def static_hash_path():
+    """Return where the hash of the last collected static files is kept"""
+    return os.path.join(settings.STATIC_ROOT, STATIC_HASH_FILE)
+
+
+def collected_hash():
+    """Return the hash stored by the last collectstatic, if any"""
+    try:
+        with open(static_hash_path()) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def unapplied_migrations(database='default'):
+    """Return the migrations migrate would apply"""
+    executor = MigrationExecutor(connections[database])
+    targets = executor.loader.graph.leaf_nodes()
+    return executor.migration_plan(targets)
+
+
+class Command(BaseCommand):
+    """Django command to wait for the database, collect static and migrate"""
+    help = 'Run the startup steps, skipping those with nothing to do.'
+    # System checks import every URLconf, view and Pillow, which startup
+    # does not need; the server runs them when it loads the app
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait for the database.',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Run every step even when nothing changed.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        started = float(os.environ.get('BOOT_STARTED_AT') or time.time())
+        STARTUP_TIME.labels('boot_started').set(started)
+        self.force = options['force']
+        self.timings = []
+
+        self.step('wait_for_db', self.wait_for_db, options['timeout'])
+        self.step('collectstatic', self.collectstatic)
+        self.step('migrate', self.migrate)
+        self.step('createcachetable', self.createcachetable)
+
+        self.report(time.time() - started)
+
+    def step(self, name, func, *args):
+        """Run a step and record how long it took"""
+        start = time.perf_counter()
+        outcome = func(*args)
+        duration = time.perf_counter() - start
+        BOOT_STEP_DURATION.labels(name).set(duration)
+        self.timings.append((name, duration, outcome))
+
+    def wait_for_db(self, timeout):
+        """Wait until the database accepts connections"""
+        call_command('wait_for_db', timeout=timeout, stdout=self.stdout)
+        return 'ran'
+
+    def collectstatic(self):
+        """Collect static files unless they match the last collection"""
+        current = static_hash()
+        if not self.force and current == collected_hash():
+            return 'skipped, unchanged'
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(static_hash_path(), 'w') as file:
+            file.write(current)
+        return 'ran'
+
+    def migrate(self):
+        """Apply migrations when there are any to apply"""
+        if not self.force and not unapplied_migrations():
+            return 'skipped, nothing to apply'
+
+        call_command('migrate', interactive=False, stdout=self.stdout)
+        return 'ran'
+
+    def createcachetable(self):
+        """Create the tables of database caches, existing ones are kept"""
+        call_command('createcachetable')
+        return 'ran'
+
+    def report(self, total):
+        """Write how long each step took"""
+        self.stdout.write('Boot timings:')
+        for name, duration, outcome in self.timings:
+            self.stdout.write(f'  {name:<17} {duration:7.2f}s  {outcome}')
+        self.stdout.write(f'  {"total":<17} {total:7.2f}s')
+        BOOT_STEP_DURATION.labels('total').set(total)
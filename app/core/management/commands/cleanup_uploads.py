@@ -0,0 +1,43 @@
+"""
+Django command to delete abandoned resumable uploads
+"""
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import uploads
+
+
+class Command(BaseCommand):
+    """Django command to delete upload sessions idle past their expiry"""
+    help = (
+        'Delete resumable upload sessions idle for longer than the expiry, '
+        'with their received chunks.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--expiry-hours', type=float,
+            default=settings.MEDIA_UPLOAD_SESSION_EXPIRY_HOURS,
+            help='Delete sessions that received nothing for this long.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        expiry = datetime.timedelta(hours=options['expiry_hours'])
+        sessions = 0
+        for session in uploads.expired(expiry).iterator():
+            uploads.discard(session)
+            sessions += 1
+
+        # Files left by sessions deleted along with their recipe or user
+        files = 0
+        for path in uploads.stray_files(expiry):
+            uploads.remove(path)
+            files += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {sessions} expired upload sessions and {files} '
+            'stray files'
+        ))
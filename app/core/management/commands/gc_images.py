@@ -0,0 +1,85 @@
+"""
+Django command to delete media files no recipe references
+"""
+import datetime
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.media_gc import Collection
+
+
+MEGABYTE = 1024 * 1024
+
+
+class Command(BaseCommand):
+    """Django command to garbage collect orphaned recipe images"""
+    help = (
+        'Delete stored images no recipe references, older than a grace '
+        'period. Use --dry-run to only report them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the files that would be deleted, delete nothing.',
+        )
+        parser.add_argument(
+            '--grace-hours', type=float,
+            default=settings.MEDIA_GC_GRACE_HOURS,
+            help='Keep orphans modified more recently than this.',
+        )
+        parser.add_argument(
+            '--path', default='uploads',
+            help='Storage directory to collect.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Repeat every this many seconds instead of running once.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        while True:
+            self.collect(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def collect(self, options):
+        """Run one pass of the garbage collector"""
+        collection = Collection(
+            default_storage,
+            path=options['path'],
+            grace=datetime.timedelta(hours=options['grace_hours']),
+            batch_size=options['batch_size'],
+        )
+        dry_run = options['dry_run']
+        orphaned_bytes = 0
+        for name, size, age in collection.orphans():
+            orphaned_bytes += size
+            if dry_run:
+                self.stdout.write(
+                    f'would delete {name} ({size} bytes, '
+                    f'{age.total_seconds() / 3600:.0f} h old)'
+                )
+            elif collection.delete(name, size) and options['verbosity'] > 1:
+                self.stdout.write(f'deleted {name} ({size} bytes)')
+
+        stats = collection.stats
+        self.stdout.write(
+            f'{stats["files"]} files, {stats["orphans"]} unreferenced, '
+            f'{stats["recent"]} within the grace period'
+        )
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run, {orphaned_bytes / MEGABYTE:.1f} MB would be freed'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Deleted {stats["deleted"]} files, '
+                f'{stats["deleted_bytes"] / MEGABYTE:.1f} MB freed'
+            ))
@@ -0,0 +1,40 @@
+"""
+Django command to regenerate the prebuilt OpenAPI schema
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import schema
+
+
+class Command(BaseCommand):
+    """Django command to write the OpenAPI schema served by the API"""
+    help = 'Generate the prebuilt OpenAPI schema, or check it is current.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Fail if the prebuilt schema differs from the API.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        content = schema.generate()
+        if options['check']:
+            try:
+                with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as schema_file:
+                    current = schema_file.read()
+            except FileNotFoundError:
+                current = None
+            if current != content:
+                raise CommandError(
+                    f'{settings.OPENAPI_SCHEMA_FILE} is stale, run '
+                    'python manage.py generate_schema'
+                )
+            self.stdout.write(self.style.SUCCESS('Schema is up to date'))
+            return
+
+        schema.write(content)
+        self.stdout.write(
+            self.style.SUCCESS(f'Wrote {settings.OPENAPI_SCHEMA_FILE}')
+        )
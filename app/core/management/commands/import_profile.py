@@ -0,0 +1,34 @@
+"""
+Django command to show where startup spends its import time
+"""
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import startup
+
+
+class Command(BaseCommand):
+    """Django command to profile the imports of a cold start"""
+    help = 'Show the slowest imports of app.wsgi or a management command.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'target', nargs='?', default='wsgi', choices=startup.TARGETS,
+        )
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--depth', type=int, default=2,
+            help='Module name components packages are grouped by.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        packages = startup.import_profile(
+            options['target'],
+            depth=options['depth'],
+        )
+        for package, seconds in packages[:options['limit']]:
+            self.stdout.write(f'{seconds * 1000:8.1f} ms  {package}')
+
+        total = sum(seconds for _, seconds in packages)
+        self.stdout.write(f'{total * 1000:8.1f} ms  total')
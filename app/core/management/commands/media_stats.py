@@ -0,0 +1,30 @@
+"""
+Django command to report how much storage image deduplication saves
+"""
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core.storage import dedup_stats
+
+
+MEGABYTE = 1024 * 1024
+
+
+class Command(BaseCommand):
+    """Django command to report stored and deduplicated media"""
+    help = 'Report stored files, their references and the bytes saved.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        stats = dedup_stats(default_storage)
+        self.stdout.write(
+            f'{stats["files"]} files referenced {stats["references"]} times'
+        )
+        for key in ('stored_bytes', 'referenced_bytes', 'saved_bytes'):
+            self.stdout.write(
+                f'{key:<17}{stats[key] / MEGABYTE:10.1f} MB'
+            )
+        if stats['missing']:
+            self.stdout.write(self.style.WARNING(
+                f'{stats["missing"]} referenced files are missing'
+            ))
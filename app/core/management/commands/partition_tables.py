@@ -0,0 +1,192 @@
+"""
+Django command to partition the recipe tables by user on PostgreSQL
+"""
+import json
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import partitioning
+from core.models import Ingredient, Recipe, Tag
+from recipe import views
+
+
+# Inserts are routed to the partition of their row rather than pruned
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    """Print or apply the SQL partitioning the recipe tables by user"""
+    help = (
+        'Partition recipes, tags, ingredients and their links by a hash of '
+        'their user. Prints the SQL unless --apply is given, --check '
+        'verifies every endpoint reads a single partition of each table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--partitions', type=int, default=16,
+            help='Partitions of each table.',
+        )
+        parser.add_argument(
+            '--apply', action='store_true',
+            help='Partition the tables, in one transaction.',
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Explain the statements of every endpoint and fail if one '
+                 'reads more than one partition of a table.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning needs PostgreSQL.')
+
+        tables = partitioning.partitioned_tables()
+        if options['check'] and not options['apply']:
+            self.check_pruning(tables)
+            return
+        if partitioning.is_partitioned(connection, tables[0]):
+            raise CommandError('The recipe tables are already partitioned.')
+
+        statements = partitioning.partition_sql(
+            *partitioning.describe(connection, tables),
+            partitions=options['partitions'],
+        )
+        if not options['apply']:
+            for statement in statements:
+                self.stdout.write(f'{statement};')
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS(
+            f'Partitioned {", ".join(tables)} in '
+            f'{options["partitions"]} partitions each'
+        ))
+        if options['check']:
+            self.check_pruning(tables)
+
+    def check_pruning(self, tables):
+        """Fail unless each endpoint statement reads one partition a table"""
+        if not partitioning.is_partitioned(connection, tables[0]):
+            raise CommandError('The recipe tables are not partitioned.')
+
+        owners = partitioning.partitions(connection, tables)
+        failures = 0
+        # The requests are made for a throwaway user, then rolled back
+        with transaction.atomic():
+            for endpoint, queries in self.endpoint_queries():
+                for sql in queries:
+                    if not sql.lstrip().upper().startswith(EXPLAINED):
+                        continue
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+                        plan = cursor.fetchone()[0]
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+                    for table, read in partitioning.unpruned(
+                        plan, owners,
+                    ).items():
+                        failures += 1
+                        self.stdout.write(self.style.ERROR(
+                            f'{endpoint}: {len(read)} partitions of {table} '
+                            f'read by {sql}'
+                        ))
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                f'{failures} statement(s) read more than one partition.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Every endpoint reads a single partition of each table'
+        ))
+
+    def endpoint_queries(self):
+        """Request every endpoint, yield each with the SQL it ran.
+
+        Uploads are left out: they read the recipe through get_object like
+        the detail endpoint, and look images up across users by name.
+        """
+        user = get_user_model().objects.create_user(
+            f'partition-check-{uuid.uuid4().hex}@example.com',
+        )
+        recipe, spare = (
+            Recipe.objects.create(
+                user=user,
+                title=title,
+                time_minutes=5,
+                price=Decimal('5.00'),
+            )
+            for title in ('Checked', 'Spare')
+        )
+        tag = Tag.objects.create(user=user, name='Checked')
+        ingredient = Ingredient.objects.create(user=user, name='Checked')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        payload = {
+            'title': 'Checked',
+            'time_minutes': 10,
+            'price': '10.00',
+            'tags': [{'name': 'Checked'}, {'name': 'New'}],
+            'ingredients': [{'name': 'Salt'}],
+        }
+        detail = {'pk': recipe.pk}
+        endpoints = [
+            (views.RecipeViewSet, 'get', 'list', {}, {}),
+            (views.RecipeViewSet, 'get', 'list', {
+                'tags': str(tag.pk),
+                'ingredients': str(ingredient.pk),
+            }, {}),
+            (views.RecipeViewSet, 'post', 'create', payload, {}),
+            (views.RecipeViewSet, 'get', 'retrieve', {}, detail),
+            (views.RecipeViewSet, 'put', 'update', payload, detail),
+            (views.RecipeViewSet, 'patch', 'partial_update', {
+                'tags': [{'name': 'Patched'}],
+            }, detail),
+            (views.RecipeViewSet, 'post', 'bulk_delete', {
+                'ids': [spare.pk],
+            }, {}),
+        ]
+        for viewset, row in [
+            (views.TagViewSet, tag),
+            (views.IngredientViewSet, ingredient),
+        ]:
+            endpoints += [
+                (viewset, 'get', 'list', {}, {}),
+                (viewset, 'get', 'list', {'assigned_only': 1}, {}),
+                (viewset, 'patch', 'partial_update', {'name': 'Renamed'}, {
+                    'pk': row.pk,
+                }),
+                (viewset, 'delete', 'destroy', {}, {'pk': row.pk}),
+            ]
+        endpoints.append((views.RecipeViewSet, 'delete', 'destroy', {}, detail))
+
+        factory = APIRequestFactory()
+        for viewset, method, action, data, kwargs in endpoints:
+            if method == 'get':
+                request = factory.get('/', data)
+            else:
+                request = getattr(factory, method)('/', data, format='json')
+            force_authenticate(request, user=user)
+            view = viewset.as_view({method: action})
+
+            endpoint = f'{viewset.__name__}.{action}'
+            with CaptureQueriesContext(connection) as queries:
+                response = view(request, **kwargs)
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'{endpoint} failed with {response.status_code}: '
+                    f'{response.data}'
+                )
+            yield endpoint, [query['sql'] for query in queries]
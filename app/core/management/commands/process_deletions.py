@@ -0,0 +1,50 @@
+"""
+Django command to purge queued user and recipe deletions
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import deletion
+
+
+class Command(BaseCommand):
+    """Django command to run pending deletion tasks in batches"""
+    help = (
+        'Delete the data of deactivated users and of bulk deleted recipes, '
+        'in batches of bounded transactions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Rows deleted per transaction, DELETION_BATCH_SIZE if unset.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Check for new tasks every this many seconds instead of '
+                 'running once.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        while True:
+            self.process(options)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def process(self, options):
+        """Run every pending task once"""
+        for task in deletion.pending():
+            try:
+                deletion.run(task, options['batch_size'])
+            except deletion.TaskLeased:
+                # Claimed by a job since the tasks were listed
+                continue
+            except Exception as exc:
+                self.stderr.write(f'{task}: {exc}')
+                continue
+            self.stdout.write(self.style.SUCCESS(
+                f'{task}: deleted {task.deleted} of {task.total} rows'
+            ))
@@ -0,0 +1,108 @@
+"""
+Django command to run queued background jobs
+"""
+import logging
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core import jobs
+
+
+logger = logging.getLogger('core.jobs')
+
+
+class Command(BaseCommand):
+    """Django command to claim and run jobs until stopped"""
+    help = (
+        'Run queued jobs in threads until SIGTERM or SIGINT, which let the '
+        'running jobs finish. Use --burst to stop once the queue is empty.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help='Jobs run at the same time, each in its own thread.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=settings.JOB_POLL_INTERVAL_SECONDS,
+            help='Seconds an idle thread waits before looking for jobs.',
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Run the ready jobs, then exit and report the throughput. '
+                 'Periodic jobs are not queued.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+        self.processed = 0
+        if not options['burst']:
+            jobs.ensure_periodic()
+        handlers = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        start = time.perf_counter()
+        try:
+            if options['concurrency'] <= 1:
+                self.work(options)
+            else:
+                threads = [
+                    threading.Thread(target=self.work_thread, args=(options,))
+                    for _ in range(options['concurrency'])
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {self.processed} jobs in {elapsed:.2f} s '
+            f'({self.processed / elapsed:.0f} jobs/s)'
+        ))
+
+    def stop(self, signum, frame):
+        """Let the running jobs finish, then exit"""
+        self.stdout.write('Stopping once the running jobs finish')
+        self.stopping.set()
+
+    def work(self, options):
+        """Run jobs until stopped, or until idle in burst mode"""
+        while not self.stopping.is_set():
+            try:
+                job = jobs.run_next()
+            except Exception:
+                logger.exception('Could not claim a job')
+                # A lost database connection is opened again
+                connection.close_if_unusable_or_obsolete()
+                self.stopping.wait(options['poll_interval'])
+                continue
+
+            if job is None:
+                if options['burst']:
+                    return
+                self.stopping.wait(options['poll_interval'])
+                continue
+            with self.lock:
+                self.processed += 1
+
+    def work_thread(self, options):
+        """Run jobs in a thread, with its own database connection"""
+        try:
+            self.work(options)
+        finally:
+            connection.close()
@@ -0,0 +1,163 @@
+"""
+Django command to generate the uWSGI configuration for this container
+"""
+import math
+import os
+
+from django.core.management.base import BaseCommand
+
+
+MEGABYTE = 1024 * 1024
+
+
+def read_first_line(path):
+    """Return the first line of a file, or None when it cannot be read"""
+    try:
+        with open(path) as file:
+            return file.readline().strip()
+    except OSError:
+        return None
+
+
+def available_cpus():
+    """Return the CPUs this container may use, honouring cgroup quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = read_first_line('/sys/fs/cgroup/cpu.max')
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()
+        cpus = min(cpus, math.ceil(int(limit) / int(period)))
+    else:
+        limit = read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        period = read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if limit and period and int(limit) > 0:
+            cpus = min(cpus, math.ceil(int(limit) / int(period)))
+
+    return max(cpus, 1)
+
+
+def available_memory():
+    """Return the memory this container may use in bytes"""
+    total = None
+    meminfo = read_first_line('/proc/meminfo')
+    if meminfo and meminfo.startswith('MemTotal:'):
+        total = int(meminfo.split()[1]) * 1024
+
+    for path in (
+        '/sys/fs/cgroup/memory.max',
+        '/sys/fs/cgroup/memory/memory.limit_in_bytes',
+    ):
+        limit = read_first_line(path)
+        if limit and limit.isdigit():
+            # cgroup v1 reports a huge number when there is no limit
+            total = min(total, int(limit)) if total else int(limit)
+            break
+
+    return total
+
+
+def somaxconn():
+    """Return the kernel cap on listen queues"""
+    value = read_first_line('/proc/sys/net/core/somaxconn')
+    return int(value) if value and value.isdigit() else 128
+
+
+def size_workers(cpus, memory, worker_memory, reserved_memory):
+    """Return how many worker processes fit the CPUs and memory.
+
+    Workers mostly wait on the database, so two per core plus one keeps
+    the CPUs busy, as long as they fit in memory next to the master.
+    """
+    processes = 2 * cpus + 1
+    if memory:
+        fit = (memory - reserved_memory) // worker_memory
+        processes = min(processes, fit)
+
+    return max(processes, 1)
+
+
+def env_int(name, default):
+    """Return an integer environment variable"""
+    return int(os.environ.get(name) or default)
+
+
+def build_config():
+    """Return the uWSGI options for this container as (name, value) pairs"""
+    cpus = available_cpus()
+    memory = available_memory()
+    worker_memory = env_int('WORKER_MEMORY_MB', 160) * MEGABYTE
+    reserved_memory = env_int('RESERVED_MEMORY_MB', 128) * MEGABYTE
+
+    processes = env_int(
+        'WORKER_PROCESSES',
+        size_workers(cpus, memory, worker_memory, reserved_memory),
+    )
+    threads = env_int('WORKER_THREADS', 2)
+    listen = min(
+        env_int('LISTEN_QUEUE', max(128, 64 * processes * threads)),
+        somaxconn(),
+    )
+
+    config = [
+        ('socket', f':{env_int("APP_PORT", 9000)}'),
+        ('module', 'app.wsgi'),
+        ('master', 'true'),
+        # The app is imported once in the master and workers are forked
+        # from it, sharing its pages until they write to them
+        ('lazy-apps', 'false'),
+        ('need-app', 'true'),
+        ('single-interpreter', 'true'),
+        ('die-on-term', 'true'),
+        ('vacuum', 'true'),
+        ('enable-threads', 'true'),
+        ('processes', processes),
+        ('threads', threads),
+        ('listen', listen),
+        ('harakiri', env_int('HARAKIRI_SECONDS', 30)),
+        ('harakiri-verbose', 'true'),
+        ('reload-on-rss', env_int('MEMORY_SOFT_LIMIT_MB', 0)),
+        ('evil-reload-on-rss', env_int('MEMORY_HARD_LIMIT_MB', 0)),
+    ]
+
+    cheaper = env_int('WORKER_MIN_PROCESSES', max(processes // 4, 1))
+    if cheaper < processes:
+        config += [
+            ('cheaper-algo', 'spare'),
+            ('cheaper', cheaper),
+            ('cheaper-initial', cheaper),
+            ('cheaper-step', 1),
+            ('cheaper-overload', 5),
+        ]
+
+    return config
+
+
+def render(config):
+    """Return the options as an ini file"""
+    lines = ['[uwsgi]']
+    lines += [f'{name} = {value}' for name, value in config]
+    return '\n'.join(lines) + '\n'
+
+
+class Command(BaseCommand):
+    """Django command to write the uWSGI configuration"""
+    help = 'Size uWSGI workers from the available CPUs and memory.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output',
+            help='Write the configuration to this file instead of stdout.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command"""
+        ini = render(build_config())
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(ini)
+        else:
+            self.stdout.write(ini, ending='')
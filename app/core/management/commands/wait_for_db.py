@@ -1,26 +1,55 @@
 """
 Django command to wait for database to be available
 """
+import random
 import time
 from psycopg2 import OperationalError as Psycopg2OpError
 
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """ Django command to wait for database"""
+    help = 'Wait until the database accepts connections.'
+    requires_system_checks = []
+
+    initial_delay = 0.05
+    max_delay = 2
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before giving up.',
+        )
+        parser.add_argument('--database', default='default')
+
+    def probe(self, database):
+        """Open a connection, raising OperationalError when it fails"""
+        connections[database].ensure_connection()
 
     def handle(self, *args, **options):
         """Entrypoint for command"""
         self.stdout.write('Waiting for database....')
-        db_up = False
-        while db_up is False:
+        deadline = time.monotonic() + options['timeout']
+        delay = self.initial_delay
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self.probe(options['database'])
+                break
             except (Psycopg2OpError, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                if time.monotonic() >= deadline:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]}s'
+                    )
+                # Full jitter keeps containers restarted together from
+                # retrying in lockstep
+                wait = random.uniform(0, delay)
+                self.stdout.write(
+                    f'Database unavailable, waiting {wait:.2f} seconds...'
+                )
+                time.sleep(wait)
+                delay = min(delay * 2, self.max_delay)
 
         self.stdout.write(self.style.SUCCESS('Database available'))
@@ -0,0 +1,128 @@
+"""
+Garbage collection of media files no recipe references
+
+The names in storage and the names in the Recipe.image column are both
+read in byte order, storage one directory at a time and the database in
+keyset paginated batches, and merged like a sorted merge join. Memory use
+depends on the batch size and the largest directory, not on the number of
+files, which the sharded content addressed layout keeps small.
+"""
+import posixpath
+
+from django.db import connection
+from django.db.models.functions import Collate
+from django.utils import timezone
+
+from core.models import Recipe
+
+
+# Collations ordering text by bytes, as Python orders the storage names
+BYTE_ORDER_COLLATIONS = {
+    'postgresql': 'C',
+    'sqlite': 'BINARY',
+    'mysql': 'utf8mb4_bin',
+}
+
+
+def stored_names(storage, path=''):
+    """Yield the names of all files under path in byte order"""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+
+    # A directory sorts as its name followed by '/', as its files' names do
+    entries = sorted(
+        [(f'{directory}/', True) for directory in directories]
+        + [(name, False) for name in files]
+    )
+    for entry, is_directory in entries:
+        name = posixpath.join(path, entry.rstrip('/'))
+        if is_directory:
+            yield from stored_names(storage, name)
+        else:
+            yield name
+
+
+def referenced_names(batch_size=1000):
+    """Yield the distinct image names of all recipes in byte order"""
+    collation = BYTE_ORDER_COLLATIONS[connection.vendor]
+    last = ''
+    while True:
+        batch = list(
+            Recipe.objects.annotate(name=Collate('image', collation))
+            .filter(name__gt=last)
+            .order_by('name')
+            .values_list('name', flat=True)
+            .distinct()[:batch_size]
+        )
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+
+
+def unreferenced(stored, referenced):
+    """Yield the stored names missing from referenced, both sorted"""
+    referenced = iter(referenced)
+    current = next(referenced, None)
+    for name in stored:
+        while current is not None and current < name:
+            current = next(referenced, None)
+        if name != current:
+            yield name
+
+
+class Collection:
+    """One pass of the garbage collector over a storage"""
+
+    def __init__(self, storage, path='', grace=None, batch_size=1000):
+        self.storage = storage
+        self.path = path
+        self.grace = grace
+        self.batch_size = batch_size
+        self.stats = {
+            'files': 0,
+            'orphans': 0,
+            'recent': 0,
+            'deleted': 0,
+            'deleted_bytes': 0,
+        }
+
+    def count_files(self, names):
+        """Count the stored names passing through"""
+        for name in names:
+            self.stats['files'] += 1
+            yield name
+
+    def orphans(self):
+        """Yield the name, size and age of orphans past the grace period"""
+        now = timezone.now()
+        names = unreferenced(
+            self.count_files(stored_names(self.storage, self.path)),
+            referenced_names(self.batch_size),
+        )
+        for name in names:
+            self.stats['orphans'] += 1
+            age = now - self.storage.get_modified_time(name)
+            if self.grace is not None and age < self.grace:
+                # May belong to a recipe being saved right now
+                self.stats['recent'] += 1
+                continue
+            yield name, self.storage.size(name), age
+
+    def delete(self, name, size):
+        """Delete an orphan, unless it was referenced or touched since"""
+        references = getattr(self.storage, 'references', None)
+        if references is not None and references(name):
+            return False
+        # Saving a duplicate touches the file before the recipe commits
+        age = timezone.now() - self.storage.get_modified_time(name)
+        if self.grace is not None and age < self.grace:
+            self.stats['recent'] += 1
+            return False
+
+        self.storage.delete(name)
+        self.stats['deleted'] += 1
+        self.stats['deleted_bytes'] += size
+        return True
@@ -0,0 +1,160 @@
+"""
+Per-worker memory accounting
+"""
+import logging
+import os
+import resource
+import threading
+import tracemalloc
+
+from prometheus_client import Gauge
+
+from django.conf import settings
+
+from core.middleware import HybridMiddleware
+
+
+logger = logging.getLogger('core.memory')
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+TRACEMALLOC_FRAMES = 1
+MEGABYTE = 1024 * 1024
+
+# Series of exited or killed workers are dropped, see core.metrics
+WORKER_RSS = Gauge(
+    'worker_resident_memory_bytes',
+    'Resident set size of each worker after its last request.',
+    multiprocess_mode='liveall',
+)
+
+
+def rss_bytes():
+    """Return the current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    """Return the highest resident set size this process has reached"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def limit_bytes(name):
+    """Return a limit configured in megabytes as bytes, or None"""
+    megabytes = getattr(settings, name, 0)
+    return megabytes * MEGABYTE if megabytes else None
+
+
+class Watermarks:
+    """Memory seen after requests handled by this worker"""
+
+    def __init__(self):
+        self.high = 0
+        self.last = 0
+        self.requests = 0
+        self.soft_limit_logged = False
+
+    def record(self, rss):
+        """Record the resident set size after a request"""
+        self.last = rss
+        self.high = max(self.high, rss)
+        self.requests += 1
+
+    def status(self):
+        """Return the watermarks and limits of this worker"""
+        return {
+            'pid': os.getpid(),
+            'rss': rss_bytes(),
+            'peak_rss': peak_rss_bytes(),
+            'high_watermark': self.high,
+            'requests': self.requests,
+            'soft_limit': limit_bytes('MEMORY_SOFT_LIMIT_MB'),
+            'hard_limit': limit_bytes('MEMORY_HARD_LIMIT_MB'),
+            'tracing': tracemalloc.is_tracing(),
+        }
+
+
+watermarks = Watermarks()
+
+_snapshot_lock = threading.Lock()
+_previous_snapshot = None
+
+
+def allocation_sites(limit=25):
+    """Return the top allocation sites and their growth since last call.
+
+    Tracing starts on the first call, so the first snapshot only covers
+    allocations made since then.
+    """
+    global _previous_snapshot
+    with _snapshot_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _previous_snapshot = None
+
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        if _previous_snapshot is None:
+            stats = snapshot.statistics('lineno')
+        else:
+            stats = snapshot.compare_to(_previous_snapshot, 'lineno')
+        _previous_snapshot = snapshot
+
+    return [
+        {
+            'location': str(stat.traceback[0]),
+            'size': stat.size,
+            'count': stat.count,
+            'size_diff': getattr(stat, 'size_diff', stat.size),
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def stop_tracing():
+    """Stop tracing allocations and drop the stored snapshot"""
+    global _previous_snapshot
+    with _snapshot_lock:
+        tracemalloc.stop()
+        _previous_snapshot = None
+
+
+class MemoryWatermarkMiddleware(HybridMiddleware):
+    """Record the resident memory of the worker after every request.
+
+    Recycling workers over the limits is left to uWSGI (reload-on-rss and
+    evil-reload-on-rss in run.sh), which lets the current request finish
+    for the soft limit.
+    """
+
+    def sync_call(self, request):
+        response = self.get_response(request)
+        self.record(request)
+        return response
+
+    async def async_call(self, request):
+        response = await self.get_response(request)
+        self.record(request)
+        return response
+
+    def record(self, request):
+        """Record the resident memory after a request"""
+        rss = rss_bytes()
+        watermarks.record(rss)
+        WORKER_RSS.set(rss)
+
+        soft_limit = limit_bytes('MEMORY_SOFT_LIMIT_MB')
+        if soft_limit and rss > soft_limit and not watermarks.soft_limit_logged:
+            watermarks.soft_limit_logged = True
+            logger.warning(
+                'Worker %s over soft memory limit after %s %s: %.0f MB',
+                os.getpid(),
+                request.method,
+                request.path,
+                rss / MEGABYTE,
+                extra={'rss': rss, 'path': request.path},
+            )
@@ -0,0 +1,224 @@
+"""
+Prometheus metrics
+
+Under uWSGI every worker is a separate process. When the
+PROMETHEUS_MULTIPROC_DIR environment variable is set, each worker writes its
+samples to its own memory mapped files in that directory and the metrics
+view merges them, so nothing is shared or locked between workers while
+requests are handled.
+"""
+import atexit
+import glob
+import os
+import re
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from django.db import connection
+
+from core.middleware import HybridMiddleware
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds',
+    'Request latency by view and action.',
+    ['view', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSES = Counter(
+    'api_responses_total',
+    'Responses by view, action and status code.',
+    ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'api_request_db_queries',
+    'Database queries issued per request.',
+    ['view'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    'api_requests_in_flight',
+    'Requests currently being handled.',
+    multiprocess_mode='livesum',
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by cache name and result (hit or miss).',
+    ['cache', 'result'],
+)
+BOOT_STEP_DURATION = Gauge(
+    'app_boot_step_duration_seconds',
+    'Time taken by each step of the last container boot.',
+    ['step'],
+    multiprocess_mode='max',
+)
+STARTUP_TIME = Gauge(
+    'app_startup_time_seconds',
+    'Unix time the boot started and the first request was handled.',
+    ['event'],
+    multiprocess_mode='min',
+)
+
+
+def multiprocess_dir():
+    """Return the directory shared by worker processes, if configured"""
+    return (
+        os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+        or os.environ.get('prometheus_multiproc_dir')
+    )
+
+
+def _mark_dead_on_exit():
+    """Drop live gauges of this process from the shared directory on exit"""
+    if multiprocess_dir():
+        atexit.register(multiprocess.mark_process_dead, os.getpid())
+
+
+_mark_dead_on_exit()
+os.register_at_fork(after_in_child=_mark_dead_on_exit)
+
+LIVE_GAUGE_FILE = re.compile(r'gauge_live\w+?_(\d+)\.db$')
+
+
+def process_exists(pid):
+    """Return whether a process with this PID is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, but owned by another user
+        pass
+    return True
+
+
+def sweep_dead_processes(path):
+    """Drop live gauges left behind by processes that no longer exist
+
+    Workers killed with SIGKILL, as uWSGI does on harakiri and when
+    recycling on RSS, never run their atexit hooks.
+    """
+    pids = set()
+    for filename in glob.glob(os.path.join(path, 'gauge_live*_*.db')):
+        match = LIVE_GAUGE_FILE.search(os.path.basename(filename))
+        if match:
+            pids.add(int(match.group(1)))
+
+    for pid in pids:
+        if not process_exists(pid):
+            multiprocess.mark_process_dead(pid, path)
+
+
+def record_cache(cache, hit):
+    """Count a cache lookup for the hit ratio"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def view_name(request):
+    """Return a low cardinality label for the view that handled a request"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+
+    cls = getattr(match.func, 'cls', None) or getattr(
+        match.func, 'view_class', None
+    )
+    if cls is None:
+        return match.func.__name__
+
+    actions = getattr(match.func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{cls.__name__}.{action}'
+
+    return cls.__name__
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Record latency, status codes and query counts of every request"""
+
+    first_request_seen = False
+
+    def sync_call(self, request):
+        queries = QueryCounter()
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            IN_FLIGHT.dec()
+
+        self.observe(request, response, start, queries.count)
+        return response
+
+    async def async_call(self, request):
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            IN_FLIGHT.dec()
+
+        # Async views query from executor threads, whose connections
+        # cannot be wrapped from here, so no query count is observed
+        self.observe(request, response, start)
+        return response
+
+    def observe(self, request, response, start, query_count=None):
+        """Record the metrics of a finished request"""
+        if not MetricsMiddleware.first_request_seen:
+            # Time to first request is this minus the boot_started event
+            MetricsMiddleware.first_request_seen = True
+            STARTUP_TIME.labels('first_request').set(time.time())
+
+        view = view_name(request)
+        REQUEST_LATENCY.labels(view, request.method).observe(
+            time.perf_counter() - start
+        )
+        RESPONSES.labels(view, request.method, response.status_code).inc()
+        if query_count is not None:
+            DB_QUERIES.labels(view).observe(query_count)
+
+
+def registry():
+    """Return the registry to expose, merging workers when configured"""
+    path = multiprocess_dir()
+    if not path:
+        return REGISTRY
+
+    sweep_dead_processes(path)
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged, path=path)
+    return merged
+
+
+def exposition():
+    """Return the metrics in the Prometheus text format"""
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
@@ -0,0 +1,120 @@
+"""
+Base for middleware running in both WSGI and ASGI deployments
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+
+class HybridMiddleware:
+    """Middleware adapting to the sync or the async request stack.
+
+    Django only keeps the stack async under ASGI when every middleware is
+    async capable, otherwise async views are run in a thread again.
+    Subclasses implement sync_call and async_call.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function for Django, like
+            # django.utils.deprecation.MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.async_call(request)
+        return self.sync_call(request)
+
+    def sync_call(self, request):
+        return self.get_response(request)
+
+    async def async_call(self, request):
+        return await self.get_response(request)
+
+
+class RouteScopedMiddleware(HybridMiddleware):
+    """Run browser-only middleware everywhere except the token API routes.
+
+    The middleware listed in SCOPED_MIDDLEWARE are chained inside this one,
+    as Django would chain them in MIDDLEWARE, and skipped entirely for
+    paths starting with one of LEAN_ROUTE_PREFIXES. The API authenticates
+    with tokens, so sessions, CSRF, messages and clickjacking protection
+    only add overhead there.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.prefixes = tuple(settings.LEAN_ROUTE_PREFIXES)
+        self.view_middleware = []
+        self.exception_middleware = []
+
+        handler = get_response
+        for path in reversed(settings.SCOPED_MIDDLEWARE):
+            try:
+                middleware = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(middleware, 'process_view'):
+                self.view_middleware.insert(0, middleware.process_view)
+            if hasattr(middleware, 'process_exception'):
+                self.exception_middleware.append(middleware.process_exception)
+            handler = convert_exception_to_response(middleware)
+        self.scoped = handler
+
+        if self.is_async:
+            # Django runs sync view hooks of an async stack in a thread,
+            # which lean requests should not pay for
+            self.process_view = self.async_process_view
+
+    def is_lean(self, request):
+        """Return True when the request skips the scoped middleware"""
+        return request.path_info.startswith(self.prefixes)
+
+    def sync_call(self, request):
+        if self.is_lean(request):
+            return self.get_response(request)
+        return self.scoped(request)
+
+    async def async_call(self, request):
+        if self.is_lean(request):
+            return await self.get_response(request)
+        return await self.scoped(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        """Run the view hooks of the scoped middleware, such as CSRF"""
+        if self.is_lean(request):
+            return None
+
+        for process_view in self.view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    async def async_process_view(self, request, view_func, view_args,
+                                 view_kwargs):
+        if self.is_lean(request):
+            return None
+        return await sync_to_async(RouteScopedMiddleware.process_view)(
+            self, request, view_func, view_args, view_kwargs,
+        )
+
+    def process_exception(self, request, exception):
+        """Run the exception hooks of the scoped middleware"""
+        if self.is_lean(request):
+            return None
+
+        for process_exception in self.exception_middleware:
+            response = process_exception(request, exception)
+            if response is not None:
+                return response
+        return None
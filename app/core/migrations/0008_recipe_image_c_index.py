@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+INDEX = 'core_recipe_image_c_idx'
+
+
+def create_index(apps, schema_editor):
+    """Index image names in byte order for the garbage collector"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX} '
+        'ON core_recipe ((image COLLATE "C"))'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,42 @@
+from django.db import migrations
+
+
+# Admin searches match the start of these columns case insensitively,
+# UPPER("column"::text) LIKE UPPER('term%') on PostgreSQL
+INDEXES = {
+    'core_user_email_upper_like': ('core_user', 'email'),
+    'core_recipe_title_upper_like': ('core_recipe', 'title'),
+    'core_tag_name_upper_like': ('core_tag', 'name'),
+    'core_ingredient_name_upper_like': ('core_ingredient', 'name'),
+}
+
+
+def create_indexes(apps, schema_editor):
+    """Index the searched columns for prefix matches"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index, (table, column) in INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} '
+            f'ON {table} ((UPPER({column}::text)) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+    # Built without locking writes to the tables, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ('core', '0010_recipe_image_metadata'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
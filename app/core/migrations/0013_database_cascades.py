@@ -0,0 +1,65 @@
+from django.db import migrations, transaction
+
+
+# Foreign keys PostgreSQL cascades itself, so core.deletion removes a batch
+# of recipes, tags or ingredients with a single DELETE
+CASCADES = [
+    ('core_recipe_tags', 'recipe_id', 'core_recipe'),
+    ('core_recipe_tags', 'tag_id', 'core_tag'),
+    ('core_recipe_ingredients', 'recipe_id', 'core_recipe'),
+    ('core_recipe_ingredients', 'ingredient_id', 'core_ingredient'),
+    ('core_uploadsession', 'recipe_id', 'core_recipe'),
+]
+
+
+def replace_foreign_key(schema_editor, table, column, target, on_delete):
+    """Recreate the foreign key of a column with another ON DELETE action"""
+    connection = schema_editor.connection
+    name = f'{table}_{column}_fk'
+    # Swapped in a short transaction, the table is locked only meanwhile
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, table,
+            )
+        for old_name, constraint in constraints.items():
+            if constraint['foreign_key'] and constraint['columns'] == [column]:
+                schema_editor.execute(
+                    f'ALTER TABLE {table} DROP CONSTRAINT {old_name}'
+                )
+        schema_editor.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+            f'FOREIGN KEY ({column}) REFERENCES {target} (id) {on_delete} '
+            'DEFERRABLE INITIALLY DEFERRED NOT VALID'
+        )
+    # Validated in its own transaction, without blocking writes to the table
+    schema_editor.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+
+def cascade(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column, target in CASCADES:
+        replace_foreign_key(
+            schema_editor, table, column, target, 'ON DELETE CASCADE',
+        )
+
+
+def uncascade(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, column, target in CASCADES:
+        replace_foreign_key(schema_editor, table, column, target, '')
+
+
+class Migration(migrations.Migration):
+    # Or the constraints are validated in the transaction that added them
+    atomic = False
+
+    dependencies = [
+        ('core', '0012_deletiontask'),
+    ]
+
+    operations = [
+        migrations.RunPython(cascade, uncascade),
+    ]
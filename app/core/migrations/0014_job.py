@@ -0,0 +1,67 @@
+# Generated by Django 3.2.25 on 2026-10-19 04:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def queue_pending_deletions(apps, schema_editor):
+    """Queue a job for each deletion task process_deletions had yet to run"""
+    DeletionTask = apps.get_model('core', 'DeletionTask')
+    Job = apps.get_model('core', 'Job')
+    Job.objects.bulk_create(
+        Job(
+            name='process_deletion',
+            kwargs={'task_id': pk},
+            priority=10,
+            max_attempts=10,
+        )
+        for pk in (
+            DeletionTask.objects
+            .exclude(status='done')
+            .values_list('pk', flat=True)
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_database_cascades'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('key', models.CharField(blank=True, max_length=255, null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status__in', ['queued', 'running'])), fields=['-priority', 'run_at', 'id'], name='core_job_ready_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status__in', ['done', 'failed'])), fields=['finished_at'], name='core_job_finished_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('key',), name='core_job_active_key'),
+        ),
+        migrations.RunPython(
+            queue_pending_deletions,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+BATCH_SIZE = 10000
+
+
+def recipe_user(Recipe):
+    """Return the user of the recipe of a link, to update it with"""
+    return Subquery(
+        Recipe.objects
+        .filter(pk=OuterRef('recipe_id'))
+        .values('user_id')[:1]
+    )
+
+
+def fill_link_users(apps, schema_editor):
+    """Copy the user of each recipe to its links, a batch per transaction"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for name in ('RecipeTag', 'RecipeIngredient'):
+        Link = apps.get_model('core', name)
+        last = 0
+        while True:
+            ids = list(
+                Link.objects
+                .filter(pk__gt=last)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:BATCH_SIZE]
+            )
+            if not ids:
+                break
+            Link.objects.filter(pk__in=ids).update(user=recipe_user(Recipe))
+            last = ids[-1]
+
+
+class RequireLinkUser(migrations.AlterField):
+    """Make the user of links required, filling the links missing it first.
+
+    Code still running without the user keeps adding links during the
+    batches. With the table locked, the last of them are filled in the
+    transaction that sets the column NOT NULL.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        connection = schema_editor.connection
+        Recipe = from_state.apps.get_model(app_label, 'Recipe')
+        Link = from_state.apps.get_model(app_label, self.model_name)
+        with transaction.atomic(using=connection.alias):
+            if connection.vendor == 'postgresql':
+                schema_editor.execute(
+                    f'LOCK TABLE {Link._meta.db_table} IN SHARE MODE'
+                )
+            Link.objects.filter(user__isnull=True).update(
+                user=recipe_user(Recipe),
+            )
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state,
+            )
+
+
+class Migration(migrations.Migration):
+    # The links are filled in by batches committed one at a time
+    atomic = False
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0014_job'),
+    ]
+
+    operations = [
+        # The through tables Django created for the many to many fields
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.tag')),
+                    ],
+                    options={
+                        'db_table': 'core_recipe_tags',
+                        'unique_together': {('recipe', 'tag')},
+                    },
+                ),
+                migrations.CreateModel(
+                    name='RecipeIngredient',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ingredient')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+                    ],
+                    options={
+                        'db_table': 'core_recipe_ingredients',
+                        'unique_together': {('recipe', 'ingredient')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='ingredients',
+                    field=models.ManyToManyField(through='core.RecipeIngredient', to='core.Ingredient'),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='tags',
+                    field=models.ManyToManyField(through='core.RecipeTag', to='core.Tag'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipetag',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(fill_link_users, migrations.RunPython.noop),
+        RequireLinkUser(
+            model_name='recipetag',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        RequireLinkUser(
+            model_name='recipeingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_links'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletiontask',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
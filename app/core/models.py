@@ -7,6 +7,8 @@ import os
 from app import settings
 
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -56,7 +58,35 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
-class Recipe(models.Model):
+class UserScopedModel(models.Model):
+    """Rows of one user, updated by their user as well as their key.
+
+    The user is the key the tables are partitioned by on PostgreSQL (see
+    python manage.py partition_tables), naming it lets an update read a
+    single partition. Updates name the user the row was stored with.
+    """
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_user_id = instance.__dict__.get('user_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._stored_user_id = self.user_id
+
+    def _do_update(self, base_qs, *args, **kwargs):
+        user_id = getattr(self, '_stored_user_id', None)
+        if user_id is not None:
+            base_qs = base_qs.filter(user_id=user_id)
+        return super()._do_update(base_qs, *args, **kwargs)
+
+
+class Recipe(UserScopedModel):
     """Recipe objects"""
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -68,15 +98,32 @@ class Recipe(models.Model):
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
-    tags = models.ManyToManyField('Tag')
-    ingredients = models.ManyToManyField('Ingredient')
+    tags = models.ManyToManyField('Tag', through='RecipeTag')
+    ingredients = models.ManyToManyField(
+        'Ingredient',
+        through='RecipeIngredient',
+    )
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # Computed by core.image_metadata when the image is attached
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_size = models.PositiveIntegerField(null=True, blank=True)
+    image_color = models.CharField(max_length=7, blank=True)
+    image_placeholder = models.CharField(max_length=32, blank=True)
+    # Set when the recipe is queued for deletion, the API hides it from then
+    deletion = models.ForeignKey(
+        'DeletionTask',
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='+',
+    )
 
     def __str__(self):
         return self.title
 
 
-class Tag(models.Model):
+class Tag(UserScopedModel):
     """"Create a tag for filtering recipes"""
     name = models.CharField(max_length=256)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -85,7 +132,7 @@ class Tag(models.Model):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(UserScopedModel):
     """Ingredient for recipes."""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
@@ -95,3 +142,188 @@ class Ingredient(models.Model):
 
     def __str__(self):
         return self.name
+
+
+class RecipeLinkQuerySet(models.QuerySet):
+    """Links filling in their user from their recipe when created in bulk"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        missing = {obj.recipe_id for obj in objs if obj.user_id is None}
+        if missing:
+            users = dict(
+                Recipe.objects
+                .filter(pk__in=missing)
+                .values_list('pk', 'user_id')
+            )
+            for obj in objs:
+                if obj.user_id is None:
+                    obj.user_id = users.get(obj.recipe_id)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class RecipeLink(UserScopedModel):
+    """Link of a recipe to a tag or an ingredient, stored with its user"""
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    # The user of the recipe, filled in when the link is created. Links are
+    # deleted with their recipe, before their user
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        related_name='+',
+        db_index=False,
+    )
+
+    # A queryset, as many to many managers create links through using()
+    objects = RecipeLinkQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = Recipe.objects.values_list(
+                'user_id', flat=True,
+            ).get(pk=self.recipe_id)
+        super().save(*args, **kwargs)
+
+
+class RecipeTag(RecipeLink):
+    """Tag of a recipe"""
+    tag = models.ForeignKey('Tag', on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_recipe_tags'
+        unique_together = [['recipe', 'tag']]
+
+
+class RecipeIngredient(RecipeLink):
+    """Ingredient of a recipe"""
+    ingredient = models.ForeignKey('Ingredient', on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = 'core_recipe_ingredients'
+        unique_together = [['recipe', 'ingredient']]
+
+
+class UploadSession(models.Model):
+    """Resumable upload of a recipe image, received in chunks.
+
+    offset counts the bytes received so far.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.id} ({self.offset}/{self.size})'
+
+
+class DeletionTask(models.Model):
+    """Deletion of a user or of recipes, purged in batches by core.deletion"""
+    USER = 'user'
+    RECIPES = 'recipes'
+    KIND_CHOICES = [(USER, 'User'), (RECIPES, 'Recipes')]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    # The user deleted, or owning the recipes. Cleared once a user is gone
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        db_index=True,
+    )
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    # Held by the run purging the task, renewed after each batch
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.kind} deletion {self.pk} ({self.status})'
+
+
+class Job(models.Model):
+    """Background job, run by python manage.py run_worker"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE = [QUEUED, RUNNING]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # At most one queued or running job has the same key
+    key = models.CharField(max_length=255, null=True, blank=True)
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+    )
+    # Higher priorities run first
+    priority = models.SmallIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # A running job whose lease expired is run again by another worker
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-priority', 'run_at', 'id'],
+                name='core_job_ready_idx',
+                condition=Q(status__in=['queued', 'running']),
+            ),
+            models.Index(
+                fields=['finished_at'],
+                name='core_job_finished_idx',
+                condition=Q(status__in=['done', 'failed']),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'],
+                name='core_job_active_key',
+                condition=Q(status__in=['queued', 'running']),
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} {self.pk} ({self.status})'
@@ -0,0 +1,240 @@
+"""
+Hash partitioning of the recipe tables by user, on PostgreSQL
+
+Every endpoint reads and writes the rows of the user making the request.
+With recipes, tags, ingredients and the links between them partitioned by
+a hash of user_id, the planner prunes a statement naming the user to one
+partition of each table, whose indexes stay as small as its share of the
+users. The tables keep their names, so the models are unchanged.
+
+PostgreSQL requires the partition key in every primary key, unique index
+and foreign key of a partitioned table: primary keys become (id, user_id),
+and foreign keys to a partitioned table name the user of the row as well,
+which is why links and upload sessions store it.
+"""
+import re
+
+from core.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+
+
+PARTITION_KEY = 'user_id'
+# Referenced tables first, their rows are copied before the links
+PARTITIONED_MODELS = [Recipe, Tag, Ingredient, RecipeTag, RecipeIngredient]
+UNIQUE_INDEX = re.compile(
+    r'^(?P<head>CREATE UNIQUE INDEX .* USING \w+ \()(?P<columns>[^()]*)\)$'
+)
+
+
+def partitioned_tables():
+    """Return the names of the tables partitioned by user"""
+    return [model._meta.db_table for model in PARTITIONED_MODELS]
+
+
+def describe(connection, tables):
+    """Return the layout of tables, what partition_sql() rebuilds.
+
+    That is, for each table, the sequences owned by its columns and its
+    indexes, and every foreign key from or to one of the tables.
+    """
+    layout = {}
+    with connection.cursor() as cursor:
+        for table in tables:
+            sequences = connection.introspection.get_sequences(cursor, table)
+            cursor.execute(
+                'SELECT index.relname, pg_get_indexdef(index.oid), '
+                'pg_index.indisunique '
+                'FROM pg_index '
+                'JOIN pg_class index ON index.oid = pg_index.indexrelid '
+                'WHERE pg_index.indrelid = %s::regclass '
+                'AND NOT pg_index.indisprimary '
+                'ORDER BY index.relname',
+                [table],
+            )
+            layout[table] = {
+                'sequences': [
+                    (sequence['name'], sequence['column'])
+                    for sequence in sequences
+                ],
+                'indexes': [
+                    {'name': name, 'definition': definition, 'unique': unique}
+                    for name, definition, unique in cursor.fetchall()
+                ],
+            }
+
+        cursor.execute(
+            'SELECT source.relname, constraint_.conname, column_.attname, '
+            'target.relname, pg_get_constraintdef(constraint_.oid) '
+            'FROM pg_constraint constraint_ '
+            'JOIN pg_class source ON source.oid = constraint_.conrelid '
+            'JOIN pg_class target ON target.oid = constraint_.confrelid '
+            'JOIN pg_attribute column_ '
+            'ON column_.attrelid = constraint_.conrelid '
+            'AND column_.attnum = constraint_.conkey[1] '
+            "WHERE constraint_.contype = 'f' "
+            'AND (source.relname = ANY(%s) OR target.relname = ANY(%s)) '
+            'ORDER BY source.relname, constraint_.conname',
+            [list(tables), list(tables)],
+        )
+        foreign_keys = [
+            {
+                'table': table,
+                'name': name,
+                'column': column,
+                'target': target,
+                'definition': definition,
+            }
+            for table, name, column, target, definition in cursor.fetchall()
+        ]
+
+    return layout, foreign_keys
+
+
+def partition_sql(layout, foreign_keys, partitions=16):
+    """Return the statements partitioning tables by a hash of their user.
+
+    layout and foreign_keys are those returned by describe(). Each table
+    is copied into a partitioned table, which then takes its name, its
+    sequences and its indexes. Foreign keys to a partitioned table name
+    the user as well. The statements are meant to run in one transaction.
+    """
+    if partitions < 1:
+        raise ValueError('Tables need at least one partition.')
+
+    statements = [
+        f'LOCK TABLE {", ".join(layout)} IN ACCESS EXCLUSIVE MODE',
+    ]
+    # Dropped first, the tables they reference are replaced
+    for foreign_key in foreign_keys:
+        statements.append(
+            f'ALTER TABLE {foreign_key["table"]} '
+            f'DROP CONSTRAINT {foreign_key["name"]}'
+        )
+
+    for table, description in layout.items():
+        new_table = f'{table}_partitioned'
+        statements.append(
+            f'CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS '
+            'INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+            f'PARTITION BY HASH ({PARTITION_KEY})'
+        )
+        for remainder in range(partitions):
+            statements.append(
+                f'CREATE TABLE {table}_p{remainder} '
+                f'PARTITION OF {new_table} '
+                f'FOR VALUES WITH (MODULUS {partitions}, '
+                f'REMAINDER {remainder})'
+            )
+        statements.append(f'INSERT INTO {new_table} SELECT * FROM {table}')
+        # Or the sequence is dropped with the table that owns it
+        for sequence, column in description['sequences']:
+            statements.append(
+                f'ALTER SEQUENCE {sequence} OWNED BY {new_table}.{column}'
+            )
+        statements += [
+            f'DROP TABLE {table}',
+            f'ALTER TABLE {new_table} RENAME TO {table}',
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey '
+            f'PRIMARY KEY (id, {PARTITION_KEY})',
+        ]
+        for index in description['indexes']:
+            statements.append(partitioned_index(index))
+
+    for foreign_key in foreign_keys:
+        statements.append(partitioned_foreign_key(foreign_key, layout))
+    statements += [f'ANALYZE {table}' for table in layout]
+
+    return statements
+
+
+def partitioned_index(index):
+    """Return the definition of an index of a partitioned table.
+
+    Unique indexes must include the partition key. A row of these tables
+    belongs to the user of the rows it is unique among, so adding the user
+    leaves the rows allowed unchanged.
+    """
+    if not index['unique']:
+        return index['definition']
+
+    match = UNIQUE_INDEX.match(index['definition'])
+    if match is None:
+        raise ValueError(
+            f'Cannot add the partition key to the unique index '
+            f'{index["name"]}: {index["definition"]}'
+        )
+    columns = [column.strip() for column in match['columns'].split(',')]
+    if PARTITION_KEY not in columns:
+        columns.append(PARTITION_KEY)
+    return f'{match["head"]}{", ".join(columns)})'
+
+
+def partitioned_foreign_key(foreign_key, layout):
+    """Return the statement adding a foreign key back.
+
+    Keys to a partitioned table reference its primary key, the id and the
+    user of the row.
+    """
+    table, name = foreign_key['table'], foreign_key['name']
+    if foreign_key['target'] not in layout:
+        return (
+            f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+            f'{foreign_key["definition"]}'
+        )
+
+    return (
+        f'ALTER TABLE {table} ADD CONSTRAINT {name} '
+        f'FOREIGN KEY ({foreign_key["column"]}, {PARTITION_KEY}) '
+        f'REFERENCES {foreign_key["target"]} (id, {PARTITION_KEY}) '
+        'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def partitions(connection, tables):
+    """Return the table each partition of tables belongs to"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname, parent.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'WHERE parent.relname = ANY(%s)',
+            [list(tables)],
+        )
+        return dict(cursor.fetchall())
+
+
+def is_partitioned(connection, table):
+    """Return if a table is partitioned"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = %s::regclass)',
+            [table],
+        )
+        return cursor.fetchone()[0]
+
+
+def scanned_partitions(plan, partitions):
+    """Return the partitions of each table an EXPLAIN (FORMAT JSON) reads.
+
+    partitions maps the name of each partition to its table, as returned
+    by partitions().
+    """
+    scanned = {}
+    nodes = [node['Plan'] for node in plan]
+    while nodes:
+        node = nodes.pop()
+        relation = node.get('Relation Name')
+        if relation in partitions:
+            scanned.setdefault(partitions[relation], set()).add(relation)
+        nodes.extend(node.get('Plans', []))
+
+    return scanned
+
+
+def unpruned(plan, partitions):
+    """Return the tables a plan reads more than one partition of"""
+    return {
+        table: sorted(read)
+        for table, read in scanned_partitions(plan, partitions).items()
+        if len(read) > 1
+    }
@@ -0,0 +1,114 @@
+"""
+On-demand profiling of live requests in the current worker process
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import re
+import threading
+
+from core.middleware import HybridMiddleware
+
+
+class ProfilingSession:
+    """Profile the next requests whose path matches a pattern"""
+
+    def __init__(self, pattern, requests):
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        self.remaining = requests
+        self.profiled = 0
+        self.stats = None
+        self.busy = False
+        self.lock = threading.Lock()
+
+    def claim(self, path):
+        """Reserve a profiling slot for a request, one request at a time"""
+        if not self.remaining or not self.regex.search(path):
+            return False
+
+        with self.lock:
+            if self.busy or not self.remaining:
+                return False
+            self.busy = True
+            self.remaining -= 1
+
+        return True
+
+    def add(self, profiler):
+        """Aggregate the stats of a finished profile"""
+        profiler.create_stats()
+        with self.lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profiler)
+            else:
+                self.stats.add(profiler)
+            self.profiled += 1
+            self.busy = False
+
+    def status(self):
+        """Return the state of the session"""
+        return {
+            'pid': os.getpid(),
+            'pattern': self.pattern,
+            'remaining': self.remaining,
+            'profiled': self.profiled,
+        }
+
+    def dump(self):
+        """Return the aggregated stats in the pstats file format"""
+        with self.lock:
+            return marshal.dumps(self.stats.stats)
+
+    def report(self, limit=50):
+        """Return the aggregated stats as text, slowest cumulative first"""
+        stream = io.StringIO()
+        with self.lock:
+            stats = pstats.Stats(stream=stream)
+            stats.add(self.stats)
+            stats.sort_stats('cumulative').print_stats(limit)
+
+        return stream.getvalue()
+
+
+_session = None
+
+
+def start(pattern, requests):
+    """Start profiling requests in this worker, replacing any session"""
+    global _session
+    _session = ProfilingSession(pattern, requests)
+    return _session
+
+
+def stop():
+    """Stop profiling in this worker and discard collected stats"""
+    global _session
+    _session = None
+
+
+def current_session():
+    """Return the profiling session of this worker, if any"""
+    return _session
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Profile requests claimed by the active profiling session"""
+
+    def sync_call(self, request):
+        session = _session
+        if session is None or not session.claim(request.path):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(self.get_response, request)
+        finally:
+            session.add(profiler)
+
+    async def async_call(self, request):
+        # cProfile only follows the current thread, async requests hop
+        # between the event loop and executor threads
+        return await self.get_response(request)
@@ -0,0 +1,65 @@
+"""
+Content addressed storage in an S3 compatible bucket
+
+Used when MEDIA_STORAGE is s3, it needs django-storages and boto3.
+"""
+import base64
+import mimetypes
+
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from django.conf import settings
+
+from core.storage import ContentAddressedMixin
+
+
+class S3ContentAddressedStorage(ContentAddressedMixin, S3Boto3Storage):
+    """Deduplicating storage in the AWS_STORAGE_BUCKET_NAME bucket.
+
+    Reads are served from short-lived signed URLs, or from
+    AWS_S3_CUSTOM_DOMAIN when a CDN is in front of the bucket.
+    """
+    # Names are content hashes, a file written again has the same bytes
+    file_overwrite = True
+
+    def touch(self, name):
+        # Copying an object onto itself renews its last modified time
+        key = self._normalize_name(clean_name(name))
+        self.connection.meta.client.copy_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            CopySource={'Bucket': self.bucket_name, 'Key': key},
+            MetadataDirective='REPLACE',
+            ContentType=(
+                mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            ),
+        )
+
+    def upload_url(self, name, digest, size, content_type):
+        """Return a presigned PUT of exactly this content to the bucket.
+
+        The checksum is part of the signature, so the bucket rejects any
+        other bytes under a content addressed name.
+        """
+        checksum = base64.b64encode(bytes.fromhex(digest)).decode()
+        url = self.connection.meta.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket_name,
+                'Key': self._normalize_name(clean_name(name)),
+                'ContentType': content_type,
+                'ContentLength': size,
+                'ChecksumSHA256': checksum,
+            },
+            ExpiresIn=settings.MEDIA_UPLOAD_URL_EXPIRES,
+            HttpMethod='PUT',
+        )
+        return {
+            'method': 'PUT',
+            'url': url,
+            'headers': {
+                'Content-Type': content_type,
+                'x-amz-checksum-sha256': checksum,
+            },
+        }
@@ -0,0 +1,73 @@
+"""
+Prebuilt OpenAPI schema
+
+Introspecting every view and serializer takes long enough that the schema
+is generated once, by the generate_schema command, and committed. Workers
+read it once and serve it from memory with an ETag.
+"""
+import hashlib
+import threading
+
+from django.conf import settings
+
+from core.metrics import record_cache
+
+
+CONTENT_TYPE = 'application/vnd.oai.openapi; charset=utf-8'
+# The schema only changes with a deploy, after which the ETag changes
+MAX_AGE = 24 * 60 * 60
+
+
+class Schema:
+    """Rendered schema and its ETag"""
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+def generate():
+    """Introspect the API and return the schema rendered as YAML"""
+    # Only imported when the schema is regenerated
+    from drf_spectacular.renderers import OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return OpenApiYamlRenderer().render(schema, renderer_context={})
+
+
+def write(content):
+    """Store a rendered schema as the prebuilt schema file"""
+    with open(settings.OPENAPI_SCHEMA_FILE, 'wb') as schema_file:
+        schema_file.write(content)
+
+
+_lock = threading.Lock()
+_schema = None
+
+
+def get_schema():
+    """Return the prebuilt schema, generating it if the file is missing"""
+    global _schema
+    if _schema is not None:
+        record_cache('openapi_schema', True)
+        return _schema
+
+    with _lock:
+        if _schema is None:
+            record_cache('openapi_schema', False)
+            try:
+                with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as schema_file:
+                    content = schema_file.read()
+            except FileNotFoundError:
+                content = generate()
+            _schema = Schema(content)
+
+    return _schema
+
+
+def clear():
+    """Forget the schema loaded in this process"""
+    global _schema
+    _schema = None
@@ -0,0 +1,32 @@
+"""
+Serializers for the operational APIs
+"""
+import re
+
+from django.utils.translation import gettext
+
+from rest_framework import serializers
+
+
+class ProfilingSessionSerializer(serializers.Serializer):
+    """Serializer for starting a profiling session"""
+    pattern = serializers.CharField(max_length=255)
+    requests = serializers.IntegerField(
+        min_value=1,
+        max_value=1000,
+        write_only=True,
+    )
+    pid = serializers.IntegerField(read_only=True)
+    remaining = serializers.IntegerField(read_only=True)
+    profiled = serializers.IntegerField(read_only=True)
+
+    def validate_pattern(self, value):
+        """Check the pattern is a valid regular expression"""
+        try:
+            re.compile(value)
+        except re.error as exc:
+            raise serializers.ValidationError(
+                gettext('Invalid regular expression: %s') % exc
+            )
+
+        return value
@@ -0,0 +1,167 @@
+"""
+Load shedding of low priority requests when a worker is overloaded
+"""
+import threading
+import time
+
+from prometheus_client import Counter, Histogram
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+from core.metrics import LATENCY_BUCKETS
+from core.middleware import HybridMiddleware
+
+
+LOW_PRIORITY_ACTIONS = ('list',)
+READ_METHODS = ('GET', 'HEAD')
+
+REQUESTS_SHED = Counter(
+    'api_requests_shed_total',
+    'Low priority requests rejected with a 503, by overload reason.',
+    ['reason'],
+)
+QUEUE_WAIT = Histogram(
+    'api_request_queue_seconds',
+    'Time requests waited between the proxy and a worker.',
+    buckets=(0,) + LATENCY_BUCKETS,
+)
+
+
+def low_priority(view):
+    """Mark a view as the first to be shed under overload"""
+    view.low_priority = True
+    return view
+
+
+def is_low_priority(request, view_func):
+    """Return True for reads that clients can retry later.
+
+    These are views marked with low_priority and the viewset actions in
+    LOW_PRIORITY_ACTIONS, the list polling of the API.
+    """
+    if request.method not in READ_METHODS:
+        return False
+    if getattr(view_func, 'low_priority', False):
+        return True
+
+    actions = getattr(view_func, 'actions', None) or {}
+    return actions.get('get') in LOW_PRIORITY_ACTIONS
+
+
+def queue_wait(request, now):
+    """Return the seconds since the proxy received a request, or None.
+
+    The start time comes from the X-Request-Start header, 't=<seconds>' as
+    set by nginx with $msec. Milli and microsecond timestamps sent by
+    other proxies are accepted too.
+    """
+    value = request.META.get('HTTP_X_REQUEST_START', '')
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+
+    while started > now * 100:
+        started /= 1000
+
+    return max(now - started, 0.0)
+
+
+class InFlight:
+    """Requests being handled by this worker"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """Count a request in and return the number in flight"""
+        with self._lock:
+            self.count += 1
+            return self.count
+
+    def leave(self):
+        """Count a finished request out"""
+        with self._lock:
+            self.count -= 1
+
+
+class LoadSheddingMiddleware(HybridMiddleware):
+    """Reject low priority reads early while the worker is overloaded.
+
+    A worker is overloaded when it handles more than SHED_MAX_IN_FLIGHT
+    requests at once, or when a request waited longer than
+    SHED_MAX_QUEUE_WAIT_MS in the listen queue behind the proxy. Shed
+    requests get a 503 with Retry-After before the view touches the
+    database, writes and authentication are always served.
+    """
+
+    def __init__(self, get_response):
+        self.max_in_flight = settings.SHED_MAX_IN_FLIGHT
+        self.max_queue_wait = settings.SHED_MAX_QUEUE_WAIT_MS / 1000
+        if not self.max_in_flight and not self.max_queue_wait:
+            raise MiddlewareNotUsed
+
+        super().__init__(get_response)
+        self.in_flight = InFlight()
+        if self.is_async:
+            # Avoid Django running the view hook in a thread
+            self.process_view = self.async_process_view
+
+    def sync_call(self, request):
+        self.admit(request)
+        try:
+            return self.get_response(request)
+        finally:
+            self.in_flight.leave()
+
+    async def async_call(self, request):
+        self.admit(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            self.in_flight.leave()
+
+    def admit(self, request):
+        """Record the load a request arrived under"""
+        request.in_flight = self.in_flight.enter()
+        request.queue_wait = queue_wait(request, time.time())
+        if request.queue_wait is not None:
+            QUEUE_WAIT.observe(request.queue_wait)
+
+    def overload_reason(self, request):
+        """Return why the worker is overloaded, or None"""
+        if self.max_in_flight and request.in_flight > self.max_in_flight:
+            return 'in_flight'
+        wait = request.queue_wait
+        if self.max_queue_wait and wait and wait > self.max_queue_wait:
+            return 'queue_wait'
+
+        return None
+
+    def shed(self, request, view_func):
+        """Return a 503 for a low priority request under overload"""
+        if not hasattr(request, 'in_flight'):
+            return None
+        reason = self.overload_reason(request)
+        if reason is None or not is_low_priority(request, view_func):
+            return None
+
+        REQUESTS_SHED.labels(reason).inc()
+        response = JsonResponse(
+            {'detail': 'Server overloaded, retry later.'},
+            status=503,
+        )
+        response['Retry-After'] = str(settings.SHED_RETRY_AFTER)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self.shed(request, view_func)
+
+    async def async_process_view(self, request, view_func, view_args,
+                                 view_kwargs):
+        return self.shed(request, view_func)
@@ -0,0 +1,151 @@
+"""
+Slow query log with EXPLAIN plans captured out of band
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+from core.metrics import view_name
+from core.middleware import HybridMiddleware
+
+
+logger = logging.getLogger('core.slow_queries')
+
+MAX_PARAMS_LENGTH = 1000
+
+
+class RateLimiter:
+    """Token bucket allowing a number of events per minute for each key"""
+
+    def __init__(self, per_minute, clock=time.monotonic):
+        self.per_minute = per_minute
+        self.clock = clock
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def allow(self, key):
+        """Take a token for key, return False when the bucket is empty"""
+        now = self.clock()
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (self.per_minute, now))
+            tokens = min(
+                self.per_minute,
+                tokens + (now - updated) * self.per_minute / 60,
+            )
+            allowed = tokens >= 1
+            self.buckets[key] = (tokens - 1 if allowed else tokens, now)
+
+        return allowed
+
+
+_limiter = None
+
+
+def limiter():
+    """Return the process wide limiter for slow query reports"""
+    global _limiter
+    rate = getattr(settings, 'SLOW_QUERY_LOG_RATE', 10)
+    if _limiter is None or _limiter.per_minute != rate:
+        _limiter = RateLimiter(rate)
+
+    return _limiter
+
+
+def explainable(sql):
+    """Return True when EXPLAIN ANALYZE can safely re-run the statement"""
+    return sql.lstrip().upper().startswith('SELECT')
+
+
+def capture_plan(sql, params, using, fields):
+    """Run EXPLAIN (ANALYZE, BUFFERS) on its own connection and log it"""
+    try:
+        with transaction.atomic(using=using):
+            with connections[using].cursor() as cursor:
+                cursor.execute('SET TRANSACTION READ ONLY')
+                cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+        logger.warning(
+            'Plan for slow query in %s:\n%s',
+            fields['view'],
+            plan,
+            extra=dict(fields, plan=plan),
+        )
+    except Exception:
+        logger.exception('Could not capture plan for slow query')
+    finally:
+        connections[using].close()
+
+
+class SlowQueryRecorder:
+    """Database execute wrapper reporting queries over the threshold"""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.report(sql, params, many, duration, context)
+
+    def report(self, sql, params, many, duration, context):
+        """Log a slow query and schedule the capture of its plan"""
+        view = view_name(self.request)
+        if not limiter().allow(view):
+            return
+
+        fields = {
+            'view': view,
+            'method': self.request.method,
+            'path': self.request.path,
+            'duration_ms': round(duration * 1000, 1),
+            'sql': sql,
+            'params': repr(params)[:MAX_PARAMS_LENGTH],
+        }
+        logger.warning(
+            'Slow query in %s (%.1f ms): %s',
+            view,
+            fields['duration_ms'],
+            sql,
+            extra=fields,
+        )
+
+        db = context['connection']
+        if (
+            getattr(settings, 'SLOW_QUERY_EXPLAIN', True)
+            and db.vendor == 'postgresql'
+            and not many
+            and explainable(sql)
+        ):
+            # The plan is captured on a separate connection from a separate
+            # thread so the request does not wait for the query to run again
+            threading.Thread(
+                target=capture_plan,
+                args=(sql, params, db.alias, fields),
+                daemon=True,
+            ).start()
+
+
+class SlowQueryMiddleware(HybridMiddleware):
+    """Report slow queries issued while handling requests, when enabled"""
+
+    def sync_call(self, request):
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 0)
+        if not threshold:
+            return self.get_response(request)
+
+        recorder = SlowQueryRecorder(request, threshold / 1000)
+        with connection.execute_wrapper(recorder):
+            return self.get_response(request)
+
+    async def async_call(self, request):
+        # Async views query from executor threads whose connections cannot
+        # be wrapped from here
+        return await self.get_response(request)
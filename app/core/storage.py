@@ -0,0 +1,234 @@
+"""
+Content addressed storage for uploaded media
+
+Files are named after the sha256 of their bytes, so identical uploads are
+written once and shared by every recipe using them. A file's references
+are the rows naming it, counted when needed rather than stored.
+
+Clients may upload directly to the storage: they ask for a short-lived
+signed URL for the hash of their file, upload to it, then confirm it with
+the token returned alongside the URL.
+"""
+import hashlib
+import os
+import re
+
+from prometheus_client import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count
+from django.urls import reverse
+
+
+HASH_CHUNK_SIZE = 64 * 1024
+UPLOAD_DIRECTORY = 'uploads/recipe'
+UPLOAD_SALT = 'core.storage.upload'
+CONFIRM_SALT = 'core.storage.confirm'
+# Content types accepted for direct uploads, the bytes never reach Pillow
+UPLOAD_EXTENSIONS = {
+    'image/gif': '.gif',
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+}
+UPLOAD_NAME = re.compile(
+    r'^uploads/recipe/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}'
+    r'\.(gif|jpg|png|webp)$'
+)
+
+MEDIA_UPLOADS = Counter(
+    'media_uploads_total',
+    'Uploaded files by result (stored or deduplicated).',
+    ['result'],
+)
+MEDIA_DEDUPLICATED_BYTES = Counter(
+    'media_deduplicated_bytes_total',
+    'Bytes of uploads that were not written as their content was stored.',
+)
+
+
+def content_hash(content):
+    """Return the sha256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """Return the content addressed name of a file in the same directory.
+
+    The first two pairs of hex digits shard the directory, so no directory
+    holds more than a few thousand files.
+    """
+    directory = os.path.dirname(name)
+    stem, extension = os.path.splitext(os.path.basename(name))
+    if stem == digest:
+        return name
+
+    extension = extension.lower()
+    return os.path.join(
+        directory, digest[:2], digest[2:4], f'{digest}{extension}',
+    )
+
+
+def upload_name(digest, content_type):
+    """Return the name a direct upload of an image is stored under"""
+    return hashed_name(
+        f'{UPLOAD_DIRECTORY}/upload{UPLOAD_EXTENSIONS[content_type]}',
+        digest,
+    )
+
+
+def sign_upload(name, digest, size, content_type):
+    """Return a token allowing one upload to the local storage"""
+    return signing.dumps(
+        {
+            'name': name,
+            'sha256': digest,
+            'size': size,
+            'content_type': content_type,
+        },
+        salt=UPLOAD_SALT,
+        compress=True,
+    )
+
+
+def load_upload(token):
+    """Return the upload a token allows, raising BadSignature if invalid"""
+    return signing.loads(
+        token,
+        salt=UPLOAD_SALT,
+        max_age=settings.MEDIA_UPLOAD_URL_EXPIRES,
+    )
+
+
+def sign_confirm(user_id, recipe_id, name, written_after=None):
+    """Return a token attaching a direct upload to one recipe of a user.
+
+    Knowing the hash of a file is no proof of having its bytes, so unless
+    the user's recipes already use the file, written_after, a Unix time,
+    requires it to be written, or rewritten, after the token was issued.
+    """
+    return signing.dumps(
+        {
+            'user': user_id,
+            'recipe': recipe_id,
+            'name': name,
+            'written_after': written_after,
+        },
+        salt=CONFIRM_SALT,
+        compress=True,
+    )
+
+
+def load_confirm(token, user_id, recipe_id):
+    """Return the confirmation of a token for a user's recipe.
+
+    Raises BadSignature if the token is invalid, expired, or was issued for
+    another user or recipe.
+    """
+    confirm = signing.loads(
+        token,
+        salt=CONFIRM_SALT,
+        max_age=settings.MEDIA_UPLOAD_CONFIRM_EXPIRES,
+    )
+    if (confirm['user'], confirm['recipe']) != (user_id, recipe_id):
+        raise signing.BadSignature('Token issued for another recipe.')
+    return confirm
+
+
+class ContentAddressedMixin:
+    """Store files under the hash of their content, once per content"""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            # Shows garbage collection the file is in use again
+            self.touch(name)
+            MEDIA_UPLOADS.labels('deduplicated').inc()
+            MEDIA_DEDUPLICATED_BYTES.inc(content.size)
+            return name
+
+        MEDIA_UPLOADS.labels('stored').inc()
+        return super().save(name, content, max_length=max_length)
+
+    def touch(self, name):
+        """Mark a stored file as just written"""
+
+    def references(self, name):
+        """Return how many recipes use a file"""
+        Recipe = apps.get_model('core', 'Recipe')
+        return Recipe.objects.filter(image=name).count()
+
+    def delete(self, name):
+        # The recipe deleting its image still references it, so a shared
+        # file is kept and left to garbage collection once unreferenced
+        if self.references(name):
+            return
+        super().delete(name)
+
+
+class ContentAddressedStorage(ContentAddressedMixin, FileSystemStorage):
+    """Deduplicating storage in MEDIA_ROOT"""
+
+    def touch(self, name):
+        os.utime(self.path(name))
+
+    def upload_url(self, name, digest, size, content_type):
+        """Return the request uploading a file directly to storage.
+
+        Stands in for an object store: the signed URL points at an API
+        endpoint writing the body to MEDIA_ROOT once its hash is checked.
+        """
+        token = sign_upload(name, digest, size, content_type)
+        return {
+            'method': 'PUT',
+            'url': reverse('recipe:direct-upload', args=[token]),
+            'headers': {'Content-Type': content_type},
+        }
+
+
+def dedup_stats(storage):
+    """Return the files, references and bytes saved by deduplication.
+
+    Streams the referenced names with their counts, so memory stays flat
+    with any number of files. Files missing from storage are counted apart.
+    """
+    Recipe = apps.get_model('core', 'Recipe')
+    stats = {
+        'files': 0,
+        'references': 0,
+        'missing': 0,
+        'stored_bytes': 0,
+        'referenced_bytes': 0,
+    }
+    names = (
+        Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        .values_list('image')
+        .annotate(references=Count('id'))
+        .order_by()
+    )
+    for name, references in names.iterator():
+        try:
+            size = storage.size(name)
+        except FileNotFoundError:
+            stats['missing'] += 1
+            continue
+        stats['files'] += 1
+        stats['references'] += references
+        stats['stored_bytes'] += size
+        stats['referenced_bytes'] += size * references
+
+    stats['saved_bytes'] = stats['referenced_bytes'] - stats['stored_bytes']
+    return stats
@@ -0,0 +1,59 @@
+"""
+Jobs run by python manage.py run_worker
+"""
+import datetime
+
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+
+from core import deletion, jobs
+from core.image_metadata import UnreadableImage, stored_image_metadata
+from core.models import DeletionTask, Recipe
+
+
+@jobs.job(lease=3600, max_attempts=10, priority=10)
+def process_deletion(task_id):
+    """Purge the rows of a deletion task, resuming an interrupted run"""
+    task = DeletionTask.objects.filter(pk=task_id).first()
+    if task is not None and task.status != DeletionTask.DONE:
+        deletion.run(task)
+
+
+@jobs.job(lease=600)
+def record_image_metadata(recipe_id, image):
+    """Read the metadata of a confirmed direct upload, detach non-images"""
+    # Skipped if the image was replaced in the meantime
+    recipe = Recipe.objects.filter(pk=recipe_id, image=image)
+    try:
+        metadata = stored_image_metadata(image)
+    except UnreadableImage:
+        recipe.update(image=None)
+        return
+    recipe.update(**metadata)
+
+
+@jobs.job(lease=3600, every=datetime.timedelta(days=1))
+def cleanup_uploads():
+    """Delete abandoned resumable uploads"""
+    call_command('cleanup_uploads')
+
+
+@jobs.job(lease=6 * 3600, every=datetime.timedelta(days=1))
+def gc_images():
+    """Delete stored images no recipe references"""
+    call_command('gc_images')
+
+
+@jobs.job(every=datetime.timedelta(days=1))
+def purge_jobs():
+    """Delete finished jobs older than JOB_RETENTION_DAYS"""
+    cutoff = timezone.now() - datetime.timedelta(
+        days=settings.JOB_RETENTION_DAYS,
+    )
+    jobs.finished_before(cutoff).delete()
+
+
+@jobs.job(lease=60)
+def noop():
+    """Do nothing, to measure the throughput of the queue"""
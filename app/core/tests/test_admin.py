@@ -1,12 +1,19 @@
 """
 Test for the DJANGO admin modifications
 """
+from decimal import Decimal
+from unittest import mock
 
-from django.test import TestCase
+from django.contrib import admin
+from django.core import checks
+from django.test import SimpleTestCase, TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core.changelist import EstimatedCountPaginator
+from core.models import Recipe, Tag
+
 
 class AdminSiteTest(TestCase):
     """Test for Djnago Admin"""
@@ -47,3 +54,178 @@ class AdminSiteTest(TestCase):
         result = self.client.get(url)
 
         self.assertEqual(result.status_code, 200)
+
+
+class ScalableAdminTests(TestCase):
+    """Test the admin pages of large tables"""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123456789',
+        )
+        self.client.force_login(self.admin_user)
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.admin_user,
+                title=f'Recipe {number}',
+                time_minutes=5,
+                price=Decimal('2.00'),
+            )
+            for number in range(5)
+        ]
+        recipe_admin = admin.site._registry[Recipe]
+        recipe_admin.list_per_page = 2
+        self.addCleanup(setattr, recipe_admin, 'list_per_page', 100)
+        self.url = reverse('admin:core_recipe_changelist')
+
+    def test_pages_follow_primary_key(self):
+        """Test pages continue after the last recipe shown"""
+        first = self.client.get(self.url)
+        second = self.client.get(self.url, {'after': self.recipes[3].id})
+
+        self.assertEqual(
+            list(first.context['cl'].result_list),
+            [self.recipes[4], self.recipes[3]],
+        )
+        self.assertContains(first, f'?after={self.recipes[3].id}')
+        self.assertEqual(
+            list(second.context['cl'].result_list),
+            [self.recipes[2], self.recipes[1]],
+        )
+        self.assertContains(second, '5 recipes')
+
+    def test_invalid_cursor(self):
+        """Test an invalid cursor is reported like an invalid filter"""
+        res = self.client.get(self.url, {'after': 'x'})
+
+        self.assertEqual(res.status_code, 302)
+        self.assertIn('e=1', res['Location'])
+
+    def test_other_ordering_paged_by_number(self):
+        """Test lists sorted by a column fall back to page numbers"""
+        res = self.client.get(self.url, {'o': '1'})
+
+        self.assertFalse(res.context['cl'].keyset)
+        self.assertEqual(len(res.context['cl'].result_list), 2)
+
+    def test_search_by_prefix(self):
+        """Test recipes are searched by the start of their title"""
+        Recipe.objects.create(
+            user=self.admin_user,
+            title='Soup',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+
+        res = self.client.get(self.url, {'q': 'sou'})
+        middle = self.client.get(self.url, {'q': 'oup'})
+
+        self.assertEqual(len(res.context['cl'].result_list), 1)
+        self.assertEqual(len(middle.context['cl'].result_list), 0)
+
+    def test_change_form_uses_autocomplete(self):
+        """Test related objects are picked with autocomplete widgets"""
+        Tag.objects.create(user=self.admin_user, name='Vegan')
+        url = reverse('admin:core_recipe_change', args=[self.recipes[0].id])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'admin-autocomplete')
+        self.assertNotContains(res, 'Vegan')
+
+    def test_recipe_user_read_only_once_added(self):
+        """Test the user of a recipe is only chosen when adding it"""
+        add = self.client.get(reverse('admin:core_recipe_add'))
+        change = self.client.get(
+            reverse('admin:core_recipe_change', args=[self.recipes[0].id]),
+        )
+
+        self.assertIn('user', add.context['adminform'].form.fields)
+        self.assertNotIn('user', change.context['adminform'].form.fields)
+
+    def test_other_users_tags_rejected(self):
+        """Test a recipe cannot be linked to the tag of another user"""
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123456789',
+        )
+        tag = Tag.objects.create(user=other, name='Vegan')
+        recipe = self.recipes[0]
+
+        res = self.client.post(
+            reverse('admin:core_recipe_change', args=[recipe.id]),
+            {
+                'title': recipe.title,
+                'time_minutes': recipe.time_minutes,
+                'price': recipe.price,
+                'tags': [tag.id],
+            },
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(
+            'Vegan belong to another user',
+            res.context['adminform'].form.errors['tags'][0],
+        )
+        self.assertFalse(recipe.tags.exists())
+
+    def test_autocomplete_tags(self):
+        """Test tags are looked up by the start of their name"""
+        Tag.objects.create(user=self.admin_user, name='Vegan')
+        Tag.objects.create(user=self.admin_user, name='Vegetarian')
+        Tag.objects.create(user=self.admin_user, name='Pegan')
+
+        res = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'veg',
+            'app_label': 'core',
+            'model_name': 'recipe',
+            'field_name': 'tags',
+        })
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            sorted(result['text'] for result in res.json()['results']),
+            ['Vegan', 'Vegetarian'],
+        )
+
+    def test_estimated_count(self):
+        """Test large counts come from the estimate, small ones are exact"""
+        queryset = Recipe.objects.order_by('-id')
+        estimate = 'core.changelist.estimated_count'
+
+        with mock.patch(estimate, return_value=10_000_000):
+            large = EstimatedCountPaginator(queryset, 100)
+            self.assertEqual(large.count, 10_000_000)
+        with mock.patch(estimate, return_value=10):
+            small = EstimatedCountPaginator(queryset, 100)
+            self.assertEqual(small.count, 5)
+
+        self.assertTrue(large.estimated)
+        self.assertFalse(small.estimated)
+
+
+class AdminChecksTests(SimpleTestCase):
+    """Test the system checks of the admin modules"""
+
+    def run_admin_checks(self):
+        return [
+            error.id
+            for error in checks.run_checks(tags=[checks.Tags.admin])
+            if not error.is_silenced()
+        ]
+
+    def test_admin_modules_checked(self):
+        """Test the checks cover the ModelAdmins app.urls discovers"""
+        admin.autodiscover()
+        recipe_admin = admin.site._registry[Recipe]
+
+        with mock.patch.object(
+            recipe_admin, 'autocomplete_fields', ['user', 'missing'],
+        ):
+            broken = self.run_admin_checks()
+
+        self.assertEqual(self.run_admin_checks(), [])
+        self.assertIn('admin.E037', broken)
@@ -0,0 +1,146 @@
+"""
+Test the micro-benchmark harness
+"""
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, SimpleTestCase
+
+from core import benchmarks
+from core.benchmarks import startup
+from core.models import Tag
+
+
+class CompareTests(SimpleTestCase):
+    """Test comparing results against a baseline"""
+
+    def test_regression_beyond_threshold_flagged(self):
+        """Test a median slower than the threshold is reported"""
+        baseline = {'bench[10]': {'median': 1.0}}
+        results = {'bench[10]': {'median': 1.5}}
+
+        regressions = benchmarks.compare(results, baseline, threshold=0.2)
+
+        self.assertEqual(len(regressions), 1)
+        self.assertEqual(regressions[0]['benchmark'], 'bench[10]')
+        self.assertAlmostEqual(regressions[0]['ratio'], 1.5)
+
+    def test_within_threshold_not_flagged(self):
+        """Test small slowdowns and new benchmarks are not reported"""
+        baseline = {'bench[10]': {'median': 1.0}}
+        results = {
+            'bench[10]': {'median': 1.1},
+            'new[10]': {'median': 5.0},
+        }
+
+        self.assertEqual(benchmarks.compare(results, baseline), [])
+
+    def test_over_budget_flagged(self):
+        """Test medians over the benchmark budget are reported"""
+        results = {
+            'slow[1]': {'median': 1.2, 'budget': 1.0},
+            'fast[1]': {'median': 0.8, 'budget': 1.0},
+            'free[1]': {'median': 9.0},
+        }
+
+        over = benchmarks.over_budget(results)
+
+        self.assertEqual(
+            over,
+            [{'benchmark': 'slow[1]', 'budget': 1.0, 'current': 1.2}],
+        )
+
+    def test_save_and_load_baseline(self):
+        """Test results round trip through a baseline file"""
+        results = {'bench[10]': {'median': 0.5, 'min': 0.4}}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'baseline.json')
+            benchmarks.save(results, path)
+
+            self.assertEqual(benchmarks.load(path), results)
+
+
+class RunTests(TestCase):
+    """Test running benchmarks"""
+
+    def test_rounds_are_isolated(self):
+        """Test writes made by setup and by each round are rolled back"""
+        seen = []
+
+        def setup(size):
+            user = get_user_model().objects.create_user('b@example.com')
+
+            def create_tags():
+                seen.append(Tag.objects.count())
+                Tag.objects.create(user=user, name='Bench')
+
+            return create_tags
+
+        bench = benchmarks.Benchmark('tags', setup, sizes=(1,))
+        result = benchmarks.run_benchmark(bench, 1, rounds=3)
+
+        self.assertEqual(result['rounds'], 3)
+        self.assertLessEqual(result['min'], result['median'])
+        self.assertEqual(seen, [0, 0, 0])
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_registered_benchmarks_run(self):
+        """Test every registered benchmark runs on a tiny dataset"""
+        selected = benchmarks.select()
+        skipped = []
+
+        def report(name, result):
+            if 'skipped' in result:
+                skipped.append(name)
+
+        results = benchmarks.run(selected, sizes=[2], rounds=1, report=report)
+
+        self.assertIn('recipe_serializer[2]', results)
+        self.assertIn('recipe_queryset_tags_ingredients[2]', results)
+        self.assertIn('get_or_create_tags[2]', results)
+        self.assertIn('user_serializer_validation[2]', results)
+        self.assertEqual(results['startup_import_wsgi[2]']['budget'], 0.8)
+        self.assertEqual(len(results) + len(skipped), len(selected))
+
+    def test_skipped_benchmark_reported(self):
+        """Test a benchmark that cannot run is reported, without timings"""
+        def setup(size):
+            raise benchmarks.SkipBenchmark('needs PostgreSQL')
+
+        reports = []
+        bench = benchmarks.Benchmark('skipped', setup, sizes=(1,))
+
+        results = benchmarks.run(
+            [bench],
+            report=lambda name, result: reports.append((name, result)),
+        )
+
+        self.assertEqual(results, {})
+        self.assertEqual(
+            reports,
+            [('skipped', {'size': 1, 'skipped': 'needs PostgreSQL'})],
+        )
+
+
+class StartupTests(SimpleTestCase):
+    """Test profiling the imports of a cold start"""
+
+    def test_import_profile(self):
+        """Test import times are grouped by package, slowest first"""
+        packages = startup.import_profile('wait_for_db')
+
+        names = [package for package, _ in packages]
+        self.assertIn('django.db', names)
+        self.assertNotIn('PIL', names)
+        self.assertNotIn('drf_spectacular.views', names)
+        times = [seconds for _, seconds in packages]
+        self.assertEqual(times, sorted(times, reverse=True))
+
+    def test_wsgi_imports_no_pillow(self):
+        """Test loading the app and its views leaves Pillow unimported"""
+        packages = startup.import_profile('wsgi', depth=1)
+
+        names = [package for package, _ in packages]
+        self.assertIn('rest_framework', names)
+        self.assertNotIn('PIL', names)
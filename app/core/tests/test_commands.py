@@ -2,34 +2,189 @@
 test custom Django management commands
 """
 
+import shutil
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
 
+from core.management.commands import boot, uwsgi_config
 
-@patch('core.management.commands.wait_for_db.Command.check')
+
+MB = 1024 * 1024
+
+
+@patch('core.management.commands.wait_for_db.Command.probe')
 class CommandTests(SimpleTestCase):
     """Test Commands"""
 
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_probe):
         """Test waiting for database if database is ready"""
-        patched_check.return_value = True
+        patched_probe.return_value = None
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', stdout=StringIO())
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with('default')
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
         """Test waiting for database when getting Operational Error"""
-        patched_check.side_effect = [Psycopg2OpError] * 2 + \
-            [OperationalError] * 3 + [True]
+        patched_probe.side_effect = [Psycopg2OpError] * 2 + \
+            [OperationalError] * 3 + [None]
+
+        call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(patched_probe.call_count, 6)
+        patched_probe.assert_called_with('default')
+
+    @patch('random.uniform', side_effect=lambda low, high: high)
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_uniform,
+                                 patched_probe):
+        """Test the delay doubles up to the maximum between attempts"""
+        patched_probe.side_effect = [OperationalError] * 8 + [None]
+
+        call_command('wait_for_db', stdout=StringIO())
+
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(delays, [0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 2, 2])
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_probe):
+        """Test giving up once the timeout has passed"""
+        patched_probe.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+        patched_probe.assert_called_once_with('default')
+
+
+class UwsgiConfigTests(SimpleTestCase):
+    """Test generating the uWSGI configuration"""
+
+    def test_size_workers_by_cpus(self):
+        """Test two workers per core plus one when memory allows"""
+        workers = uwsgi_config.size_workers(4, 8 * 1024 ** 3, 160 * MB, 0)
+
+        self.assertEqual(workers, 9)
+
+    def test_size_workers_by_memory(self):
+        """Test workers are capped by the memory left after the master"""
+        workers = uwsgi_config.size_workers(8, 1024 * MB, 160 * MB, 128 * MB)
+
+        self.assertEqual(workers, 5)
+
+    def test_size_workers_at_least_one(self):
+        """Test one worker is started even when memory is short"""
+        workers = uwsgi_config.size_workers(2, 100 * MB, 160 * MB, 128 * MB)
+
+        self.assertEqual(workers, 1)
+
+    @patch.dict('os.environ', {
+        'WORKER_PROCESSES': '8',
+        'WORKER_THREADS': '4',
+        'HARAKIRI_SECONDS': '15',
+        'LISTEN_QUEUE': '100000',
+    })
+    @patch('core.management.commands.uwsgi_config.somaxconn')
+    def test_config_from_environment(self, patched_somaxconn):
+        """Test overrides and capping the listen queue to the kernel"""
+        patched_somaxconn.return_value = 4096
+
+        config = dict(uwsgi_config.build_config())
+
+        self.assertEqual(config['processes'], 8)
+        self.assertEqual(config['threads'], 4)
+        self.assertEqual(config['harakiri'], 15)
+        self.assertEqual(config['listen'], 4096)
+        self.assertEqual(config['lazy-apps'], 'false')
+        self.assertEqual(config['cheaper'], 2)
+
+    @patch.dict('os.environ', {'WORKER_PROCESSES': '1'})
+    def test_no_cheaper_with_one_worker(self):
+        """Test adaptive scaling is off when there is a single worker"""
+        config = dict(uwsgi_config.build_config())
+
+        self.assertNotIn('cheaper', config)
+
+    def test_render_ini(self):
+        """Test writing the options as an ini file"""
+        ini = uwsgi_config.render([('master', 'true'), ('processes', 3)])
+
+        self.assertEqual(ini, '[uwsgi]\nmaster = true\nprocesses = 3\n')
+
+
+@patch('core.management.commands.wait_for_db.Command.probe')
+class BootTests(TestCase):
+    """Test the startup command"""
+
+    def setUp(self):
+        self.static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.static_root)
+        override = override_settings(STATIC_ROOT=self.static_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_static_hash_stable(self, patched_probe):
+        """Test the static files hash only changes with the files"""
+        self.assertEqual(boot.static_hash(), boot.static_hash())
+
+    @patch('core.management.commands.boot.call_command')
+    def test_collectstatic_skipped(self, patched_call, patched_probe):
+        """Test static files are collected once until they change"""
+        out = StringIO()
+        call_command('boot', stdout=out)
+        call_command('boot', stdout=out)
+
+        collects = [
+            call for call in patched_call.call_args_list
+            if call.args[0] == 'collectstatic'
+        ]
+        self.assertEqual(len(collects), 1)
+        self.assertIn('skipped, unchanged', out.getvalue())
+
+    @patch('core.management.commands.boot.static_hash')
+    @patch('core.management.commands.boot.call_command')
+    def test_collectstatic_after_change(self, patched_call, patched_hash,
+                                        patched_probe):
+        """Test static files are collected again when the hash differs"""
+        patched_hash.side_effect = ['first', 'second']
+
+        call_command('boot', stdout=StringIO())
+        call_command('boot', stdout=StringIO())
+
+        commands = [call.args[0] for call in patched_call.call_args_list]
+        self.assertEqual(commands.count('collectstatic'), 2)
+
+    @patch('core.management.commands.boot.call_command')
+    def test_migrate_skipped_when_applied(self, patched_call, patched_probe):
+        """Test migrate is skipped when there is nothing to apply"""
+        out = StringIO()
+
+        call_command('boot', stdout=out)
+
+        commands = [call.args[0] for call in patched_call.call_args_list]
+        self.assertNotIn('migrate', commands)
+        self.assertIn('skipped, nothing to apply', out.getvalue())
+        self.assertIn('total', out.getvalue())
+
+    @patch('core.management.commands.boot.call_command')
+    def test_force_runs_every_step(self, patched_call, patched_probe):
+        """Test --force runs the steps even when nothing changed"""
+        call_command('boot', stdout=StringIO())
+        patched_call.reset_mock()
 
-        call_command('wait_for_db')
+        call_command('boot', force=True, stdout=StringIO())
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        commands = [call.args[0] for call in patched_call.call_args_list]
+        self.assertEqual(
+            commands,
+            ['wait_for_db', 'collectstatic', 'migrate', 'createcachetable'],
+        )
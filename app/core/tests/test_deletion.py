@@ -0,0 +1,166 @@
+"""
+Tests for deleting users and recipes in background batches
+"""
+from decimal import Decimal
+from io import StringIO
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core import deletion
+from core.models import DeletionTask, Ingredient, Recipe, Tag
+
+
+def create_recipe(user, **params):
+    """Create and return a recipe with a tag and an ingredient"""
+    recipe = Recipe.objects.create(
+        user=user,
+        title='Recipe',
+        time_minutes=5,
+        price=Decimal('2.00'),
+        **params,
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name='Tag'))
+    recipe.ingredients.add(Ingredient.objects.create(user=user, name='Salt'))
+    return recipe
+
+
+class DeletionTests(TestCase):
+    """Test queuing and running deletion tasks"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'deleted@example.com',
+            'testpass123',
+        )
+        self.other = get_user_model().objects.create_user(
+            'kept@example.com',
+            'testpass123',
+        )
+        self.recipes = [create_recipe(self.user) for _ in range(5)]
+        self.kept = create_recipe(self.other)
+
+    def process_deletions(self, **options):
+        out = StringIO()
+        call_command('process_deletions', stdout=out, stderr=out, **options)
+        return out.getvalue()
+
+    def test_user_purged_in_batches(self):
+        """Test a deleted user's data is purged, batch by batch"""
+        Token.objects.create(user=self.user)
+        task = deletion.delete_user(self.user)
+
+        out = self.process_deletions(batch_size=2)
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertEqual(task.total, 15)
+        self.assertEqual(task.deleted, 15)
+        self.assertIsNone(task.user)
+        self.assertIsNotNone(task.finished_at)
+        self.assertIn('deleted 15 of 15 rows', out)
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertEqual(Recipe.objects.get(), self.kept)
+        self.assertEqual(Tag.objects.get().user, self.other)
+        self.assertEqual(self.kept.tags.count(), 1)
+        self.assertEqual(self.kept.ingredients.count(), 1)
+
+    def test_bounded_batches(self):
+        """Test no batch deletes more rows than the batch size"""
+        task = deletion.delete_user(self.user)
+        delete_rows = deletion.delete_rows
+        batches = []
+
+        def record_batch(queryset):
+            batches.append(queryset.count())
+            return delete_rows(queryset)
+
+        with mock.patch.object(deletion, 'delete_rows', record_batch):
+            deletion.run(task, batch_size=2)
+
+        # Recipes, tags and ingredients, five of each
+        self.assertEqual(batches, [2, 2, 1] * 3)
+
+    def test_failed_run_resumes(self):
+        """Test a run stopping halfway records the error and resumes"""
+        task = deletion.delete_user(self.user)
+        delete_rows = deletion.delete_rows
+        calls = []
+
+        def fail_second_batch(queryset):
+            calls.append(queryset)
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return delete_rows(queryset)
+
+        with mock.patch.object(deletion, 'delete_rows', fail_second_batch):
+            out = self.process_deletions(batch_size=2)
+
+        task.refresh_from_db()
+        self.assertIn('connection lost', out)
+        self.assertEqual(task.status, DeletionTask.FAILED)
+        self.assertEqual(task.deleted, 2)
+
+        self.process_deletions(batch_size=2)
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertEqual(task.deleted, 15)
+        self.assertEqual(task.error, '')
+
+    def test_recipes_purged(self):
+        """Test only the recipes of a bulk deletion are deleted"""
+        ids = [recipe.id for recipe in self.recipes[:3]] + [self.kept.id]
+        task = deletion.delete_recipes(self.user, ids)
+
+        self.process_deletions()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertEqual(task.deleted, 3)
+        self.assertEqual(
+            Recipe.objects.filter(user=self.user).count(),
+            2,
+        )
+        self.assertTrue(Recipe.objects.filter(pk=self.kept.pk).exists())
+        self.assertTrue(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+
+    def test_leased_task_skipped(self):
+        """Test a task leased to another run is not purged again"""
+        task = deletion.delete_user(self.user)
+        DeletionTask.objects.filter(pk=task.pk).update(
+            locked_until=timezone.now() + datetime.timedelta(minutes=5),
+        )
+
+        out = self.process_deletions()
+        with self.assertRaises(deletion.TaskLeased):
+            deletion.run(task)
+
+        task.refresh_from_db()
+        self.assertEqual(out, '')
+        self.assertEqual(task.status, DeletionTask.PENDING)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 5)
+
+    def test_expired_lease_claimed(self):
+        """Test a task whose run died is run again once its lease expires"""
+        task = deletion.delete_user(self.user)
+        DeletionTask.objects.filter(pk=task.pk).update(
+            status=DeletionTask.RUNNING,
+            locked_until=timezone.now() - datetime.timedelta(seconds=1),
+        )
+
+        self.process_deletions()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertIsNone(task.locked_until)
@@ -0,0 +1,41 @@
+"""
+Tests for the password hashers
+"""
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    check_password,
+    make_password,
+)
+from django.test import SimpleTestCase, override_settings
+
+from core.hashers import TunablePBKDF2PasswordHasher
+
+
+class TunablePBKDF2Tests(SimpleTestCase):
+    """Test tuning the PBKDF2 work factor"""
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_iterations_from_settings(self):
+        """Test passwords are hashed with the configured iterations"""
+        encoded = make_password('testpass123')
+
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(check_password('testpass123', encoded))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=0)
+    def test_default_iterations(self):
+        """Test Django's iterations are used when not configured"""
+        self.assertEqual(
+            TunablePBKDF2PasswordHasher().iterations,
+            PBKDF2PasswordHasher.iterations,
+        )
+
+    def test_existing_hashes_upgraded(self):
+        """Test a hash made with another work factor is flagged for update"""
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            encoded = make_password('testpass123')
+
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            hasher = TunablePBKDF2PasswordHasher()
+            self.assertTrue(hasher.verify('testpass123', encoded))
+            self.assertTrue(hasher.must_update(encoded))
@@ -0,0 +1,115 @@
+"""
+Tests for recipe image metadata
+"""
+import io
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.image_metadata import blurhash, dominant_color, image_metadata
+from core.models import Recipe
+
+
+def image_file(image, format='PNG'):
+    """Return an image saved in format as a File"""
+    content = io.BytesIO()
+    image.save(content, format=format)
+    content.seek(0)
+    return File(content, name=f'image.{format.lower()}')
+
+
+class ImageMetadataTests(SimpleTestCase):
+    """Test computing the metadata of images"""
+
+    def test_blurhash(self):
+        """Test the placeholder is the BlurHash of the image"""
+        image = Image.new('RGB', (24, 32))
+        image.putdata([
+            ((x * 10) % 256, (y * 8) % 256, 200 - x * 5)
+            for y in range(32)
+            for x in range(24)
+        ])
+
+        self.assertEqual(
+            blurhash(image, 3, 4),
+            'TxF?Rz75w#l}ahjugJfjfQnma}ju',
+        )
+
+    def test_dominant_color(self):
+        """Test the colour covering most of the image is dominant"""
+        image = Image.new('RGB', (10, 10), (0, 0, 255))
+        image.paste((255, 0, 0), (0, 0, 4, 10))
+
+        self.assertEqual(dominant_color(image), '#0000ff')
+
+    def test_image_metadata(self):
+        """Test the metadata of a large JPEG image"""
+        content = image_file(Image.new('RGB', (1200, 800), 'white'), 'JPEG')
+
+        metadata = image_metadata(content)
+
+        self.assertEqual(metadata['image_width'], 1200)
+        self.assertEqual(metadata['image_height'], 800)
+        self.assertEqual(metadata['image_size'], content.size)
+        self.assertEqual(metadata['image_color'], '#ffffff')
+        self.assertEqual(len(metadata['image_placeholder']), 28)
+        self.assertEqual(content.tell(), 0)
+
+
+class BackfillImageMetadataTests(TestCase):
+    """Test the backfill_image_metadata command"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'backfill@example.com',
+            'testpass123',
+        )
+
+    def create_recipe(self, image=None):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Backfill',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        if image is not None:
+            recipe.image.save('image.png', image)
+        return recipe
+
+    def test_backfill(self):
+        """Test metadata is recorded for images without it"""
+        image = image_file(Image.new('RGB', (30, 20), 'red'))
+        first = self.create_recipe(image)
+        shared = self.create_recipe(image)
+        without_image = self.create_recipe()
+        broken = self.create_recipe(ContentFile(b'not an image'))
+        default_storage.delete(broken.image.name)
+        out = StringIO()
+
+        call_command('backfill_image_metadata', batch_size=1, stdout=out,
+                     stderr=StringIO())
+
+        for recipe in (first, shared):
+            recipe.refresh_from_db()
+            self.assertEqual(recipe.image_width, 30)
+            self.assertEqual(recipe.image_height, 20)
+            self.assertEqual(recipe.image_color, '#ff0000')
+        without_image.refresh_from_db()
+        self.assertIsNone(without_image.image_width)
+        self.assertIn('metadata of 2 images, 1 could not be read',
+                      out.getvalue())
@@ -0,0 +1,99 @@
+"""
+Test per-request performance instrumentation
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.instrumentation import RequestTimings
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RequestTimingsTests(SimpleTestCase):
+    """Test formatting collected timings"""
+
+    def test_server_timing_header(self):
+        """Test timings are formatted as a Server-Timing header"""
+        timings = RequestTimings()
+        timings.add('auth', 0.0021)
+        timings.add('db', 0.004)
+        timings.query_count = 3
+
+        self.assertEqual(
+            timings.server_timing(),
+            'auth;dur=2.1, db;dur=4.0;desc="3 queries"',
+        )
+
+    def test_log_fields(self):
+        """Test timings are flattened into log fields"""
+        timings = RequestTimings()
+        timings.add('render', 0.0015)
+        timings.add('render', 0.0015)
+
+        self.assertEqual(
+            timings.log_fields(),
+            {'render_ms': 3.0, 'db_queries': 0},
+        )
+
+
+class ServerTimingMiddlewareTests(TestCase):
+    """Test the Server-Timing middleware on API requests"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'timing@example.com',
+            'testpass123',
+        )
+        Recipe.objects.create(
+            user=self.user,
+            title='Timed recipe',
+            time_minutes=5,
+            price=Decimal('1.50'),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(
+        PERFORMANCE_SAMPLE_RATE=1,
+        PERFORMANCE_SERVER_TIMING=True,
+    )
+    def test_sampled_request_reports_phases(self):
+        """Test every phase of a sampled request is reported"""
+        with self.assertLogs('core.performance', level='INFO') as logs:
+            res = self.client.get(RECIPES_URL)
+
+        header = res['Server-Timing']
+        for phase in ['auth', 'queryset', 'serialize', 'render', 'total']:
+            self.assertIn(f'{phase};dur=', header)
+        self.assertIn('queries"', header)
+        self.assertEqual(logs.records[0].status, 200)
+        self.assertGreater(logs.records[0].db_queries, 0)
+
+    @override_settings(
+        PERFORMANCE_SAMPLE_RATE=1,
+        PERFORMANCE_SERVER_TIMING=False,
+    )
+    def test_header_is_opt_in(self):
+        """Test sampled requests are logged without the header by default"""
+        with self.assertLogs('core.performance', level='INFO'):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(
+        PERFORMANCE_SAMPLE_RATE=0,
+        PERFORMANCE_SERVER_TIMING=True,
+    )
+    def test_unsampled_request_not_instrumented(self):
+        """Test requests are not instrumented when sampling is off"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(res.data[0]['title'], 'Timed recipe')
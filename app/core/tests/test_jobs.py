@@ -0,0 +1,244 @@
+"""
+Tests for the background job queue
+"""
+import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import deletion, jobs, tasks
+from core.models import DeletionTask, Job
+
+
+CALLS = []
+
+
+def record(value=None):
+    CALLS.append(value)
+
+
+def fail():
+    raise RuntimeError('boom')
+
+
+def periodic():
+    CALLS.append('periodic')
+
+
+@override_settings(
+    JOB_RETRY_BASE_DELAY_SECONDS=10,
+    JOB_RETRY_MAX_DELAY_SECONDS=60,
+)
+class JobQueueTests(TestCase):
+    """Test queuing, claiming and running jobs"""
+
+    def setUp(self):
+        CALLS.clear()
+        # Loaded first, or the jobs of core.tasks are dropped with these
+        jobs.load_jobs()
+        registered = mock.patch.dict(jobs.JOB_TYPES)
+        registered.start()
+        self.addCleanup(registered.stop)
+        jobs.job('test_record')(record)
+        jobs.job('test_fail', max_attempts=2)(fail)
+        jobs.job('test_periodic', every=datetime.timedelta(hours=1))(periodic)
+
+    def run_worker(self, *args):
+        out = StringIO()
+        call_command(
+            'run_worker', '--burst', '--concurrency', '1', *args, stdout=out,
+        )
+        return out.getvalue()
+
+    def test_enqueue_unknown_job(self):
+        """Test queuing a job no function is registered for fails"""
+        with self.assertRaises(jobs.UnknownJob):
+            jobs.enqueue('missing')
+
+    def test_claim_by_priority_then_age(self):
+        """Test the ready job of highest priority, then oldest, runs first"""
+        old = jobs.enqueue('test_record', value=1)
+        urgent = jobs.enqueue('test_record', priority=5, value=2)
+        jobs.enqueue('test_record', value=3)
+
+        self.assertEqual(jobs.claim().pk, urgent.pk)
+        self.assertEqual(jobs.claim().pk, old.pk)
+
+    def test_scheduled_job_waits(self):
+        """Test a job queued with a delay is not claimed before it is due"""
+        job = jobs.enqueue(
+            'test_record', delay=datetime.timedelta(minutes=5),
+        )
+
+        self.assertIsNone(jobs.claim())
+        later = timezone.now() + datetime.timedelta(minutes=6)
+        self.assertEqual(jobs.claim(now=later).pk, job.pk)
+
+    def test_claim_leases_job(self):
+        """Test a claimed job is running, leased and not claimed again"""
+        job = jobs.enqueue('test_record')
+
+        claimed = jobs.claim()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.locked_until, timezone.now())
+        self.assertEqual(claimed.attempts, 1)
+        self.assertIsNone(jobs.claim())
+
+    def test_expired_lease_runs_again(self):
+        """Test a job whose worker died is claimed again after its lease"""
+        job = jobs.enqueue('test_record')
+        jobs.claim()
+
+        later = timezone.now() + datetime.timedelta(seconds=301)
+        again = jobs.claim(now=later)
+
+        self.assertEqual(again.pk, job.pk)
+        self.assertEqual(again.attempts, 2)
+
+    def test_execute_success(self):
+        """Test a job that returns is done"""
+        job = jobs.enqueue('test_record', value='hello')
+
+        self.assertTrue(jobs.execute(jobs.claim()))
+
+        job.refresh_from_db()
+        self.assertEqual(CALLS, ['hello'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIsNone(job.locked_until)
+
+    @mock.patch('core.jobs.random.uniform', return_value=1)
+    def test_failure_retried_with_backoff(self, uniform):
+        """Test a failed job is queued again later, then fails for good"""
+        job = jobs.enqueue('test_fail')
+
+        start = timezone.now()
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertFalse(jobs.execute(jobs.claim()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreaterEqual(
+            job.run_at, start + datetime.timedelta(seconds=10),
+        )
+        self.assertIsNone(jobs.claim())
+
+        later = timezone.now() + datetime.timedelta(seconds=11)
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.execute(jobs.claim(now=later))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    @mock.patch('core.jobs.random.uniform', return_value=1)
+    def test_retry_delay_doubles_up_to_max(self, uniform):
+        """Test the delay between attempts doubles, up to the maximum"""
+        delays = [
+            jobs.retry_delay(attempts).total_seconds()
+            for attempts in range(1, 6)
+        ]
+
+        self.assertEqual(delays, [10, 20, 40, 60, 60])
+
+    def test_outcome_of_stale_attempt_ignored(self):
+        """Test a run whose lease expired does not overwrite the next one"""
+        job = jobs.enqueue('test_record')
+        stale = jobs.claim()
+        later = timezone.now() + datetime.timedelta(seconds=301)
+        jobs.claim(now=later)
+
+        jobs.execute(stale)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.RUNNING)
+        self.assertEqual(job.attempts, 2)
+
+    def test_key_deduplicates_active_jobs(self):
+        """Test a job with the key of a queued job is not queued again"""
+        first = jobs.enqueue('test_record', key='once')
+        second = jobs.enqueue('test_record', key='once')
+        self.assertEqual(first.pk, second.pk)
+
+        jobs.execute(jobs.claim())
+        third = jobs.enqueue('test_record', key='once')
+        self.assertNotEqual(third.pk, first.pk)
+
+    def test_periodic_job_rescheduled(self):
+        """Test a periodic job queues its next run when it finishes"""
+        periodic_only = mock.patch.dict(jobs.JOB_TYPES, {
+            'test_periodic': jobs.JOB_TYPES['test_periodic'],
+        }, clear=True)
+        periodic_only.start()
+        self.addCleanup(periodic_only.stop)
+
+        jobs.ensure_periodic()
+        jobs.ensure_periodic()
+        self.assertEqual(
+            Job.objects.filter(name='test_periodic').count(), 1,
+        )
+
+        while jobs.run_next() is not None:
+            pass
+
+        self.assertIn('periodic', CALLS)
+        queued = Job.objects.get(name='test_periodic', status=Job.QUEUED)
+        self.assertGreater(
+            queued.run_at,
+            timezone.now() + datetime.timedelta(minutes=59),
+        )
+
+    def test_run_worker_burst(self):
+        """Test the worker runs the ready jobs, then reports and exits"""
+        for value in range(3):
+            jobs.enqueue('test_record', value=value)
+
+        out = self.run_worker()
+
+        self.assertEqual(sorted(CALLS), [0, 1, 2])
+        self.assertIn('Ran 3 jobs', out)
+        self.assertFalse(Job.objects.filter(name='test_periodic').exists())
+
+    def test_purge_jobs(self):
+        """Test finished jobs past the retention are deleted"""
+        old = jobs.enqueue('test_record')
+        recent = jobs.enqueue('test_record')
+        queued = jobs.enqueue('test_record')
+        Job.objects.filter(pk=old.pk).update(
+            status=Job.DONE,
+            finished_at=timezone.now() - datetime.timedelta(days=30),
+        )
+        Job.objects.filter(pk=recent.pk).update(
+            status=Job.DONE,
+            finished_at=timezone.now(),
+        )
+
+        tasks.purge_jobs()
+
+        remaining = set(Job.objects.values_list('pk', flat=True))
+        self.assertNotIn(old.pk, remaining)
+        self.assertIn(recent.pk, remaining)
+        self.assertIn(queued.pk, remaining)
+
+    def test_deletion_queues_job(self):
+        """Test deleting a user queues the job purging their data"""
+        user = get_user_model().objects.create_user(
+            'deleted@example.com',
+            'testpass123',
+        )
+
+        task = deletion.delete_user(user)
+        job = Job.objects.get(name='process_deletion')
+        self.assertEqual(job.kwargs, {'task_id': task.pk})
+
+        self.run_worker()
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, DeletionTask.DONE)
+        self.assertFalse(get_user_model().objects.filter(pk=user.pk).exists())
@@ -0,0 +1,147 @@
+"""
+Tests for garbage collecting unreferenced media
+"""
+import datetime
+import os
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import media_gc
+from core.models import Recipe
+
+
+DAY = 24 * 60 * 60
+
+
+class MergeJoinTests(SimpleTestCase):
+    """Test listing and merging names in byte order"""
+
+    def test_unreferenced(self):
+        """Test names missing from the references are yielded"""
+        stored = ['a', 'b', 'c', 'e', 'f']
+        referenced = ['0', 'b', 'd', 'e', 'z']
+
+        self.assertEqual(
+            list(media_gc.unreferenced(stored, referenced)),
+            ['a', 'c', 'f'],
+        )
+
+    def test_stored_names_sorted(self):
+        """Test files are listed in the byte order of their full names"""
+        with tempfile.TemporaryDirectory() as media_root:
+            for name in ('a/b.jpg', 'a-b.jpg', 'a.jpg', 'b/c/d.jpg', 'a/a'):
+                path = os.path.join(media_root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, 'w').close()
+
+            with override_settings(MEDIA_ROOT=media_root):
+                names = list(media_gc.stored_names(default_storage))
+
+        self.assertEqual(names, sorted(names))
+        self.assertEqual(len(names), 5)
+
+    def test_missing_directory(self):
+        """Test an empty storage has no names"""
+        with override_settings(MEDIA_ROOT='/nonexistent-media'):
+            self.assertEqual(
+                list(media_gc.stored_names(default_storage, 'uploads')),
+                [],
+            )
+
+
+class GcImagesCommandTests(TestCase):
+    """Test the gc_images command"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        user = get_user_model().objects.create_user(
+            'gc@example.com',
+            'testpass123',
+        )
+        self.recipe = Recipe.objects.create(
+            user=user,
+            title='Kept',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        self.recipe.image.save('kept.jpg', ContentFile(b'kept'))
+        self.orphan = default_storage.save(
+            'uploads/recipe/orphan.jpg',
+            ContentFile(b'orphan'),
+        )
+        self.recent = default_storage.save(
+            'uploads/recipe/recent.jpg',
+            ContentFile(b'recent'),
+        )
+        for name in (self.recipe.image.name, self.orphan):
+            old = time.time() - 2 * DAY
+            os.utime(default_storage.path(name), (old, old))
+
+    def gc_images(self, **options):
+        out = StringIO()
+        call_command('gc_images', stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_deletes_nothing(self):
+        """Test a dry run reports old orphans only"""
+        out = self.gc_images(dry_run=True)
+
+        self.assertIn(f'would delete {self.orphan}', out)
+        self.assertNotIn(self.recent, out)
+        self.assertNotIn(self.recipe.image.name, out)
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_orphans_deleted(self):
+        """Test old orphans are deleted, referenced and recent files kept"""
+        out = self.gc_images(batch_size=1)
+
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertTrue(default_storage.exists(self.recent))
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+        self.assertIn('3 files, 2 unreferenced, 1 within', out)
+        self.assertIn('Deleted 1 files', out)
+
+    def test_replaced_image_collected(self):
+        """Test the image a recipe no longer uses is collected"""
+        old_name = self.recipe.image.name
+        self.recipe.image.save('new.jpg', ContentFile(b'new'))
+
+        self.gc_images(grace_hours=0)
+
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertTrue(default_storage.exists(self.recipe.image.name))
+
+    def test_deduplicated_upload_not_collected(self):
+        """Test an orphan uploaded again is in use within the grace period"""
+        self.recipe.image.save('again.jpg', ContentFile(b'orphan'))
+
+        self.gc_images()
+
+        self.assertEqual(self.recipe.image.name, self.orphan)
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_orphan_touched_after_found_kept(self):
+        """Test an orphan reused after the pass found it is not deleted"""
+        collection = media_gc.Collection(
+            default_storage,
+            grace=datetime.timedelta(days=1),
+        )
+        (name, size, _), = collection.orphans()
+
+        default_storage.touch(name)
+
+        self.assertFalse(collection.delete(name, size))
+        self.assertTrue(default_storage.exists(self.orphan))
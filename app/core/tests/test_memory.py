@@ -0,0 +1,101 @@
+"""
+Test per-worker memory accounting
+"""
+import os
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import memory
+
+
+MEMORY_URL = reverse('memory')
+MEMORY_SNAPSHOT_URL = reverse('memory-snapshot')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class MemoryAPITests(TestCase):
+    """Test the memory endpoints"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def tearDown(self):
+        memory.stop_tracing()
+
+    def test_staff_required(self):
+        """Test regular users cannot read memory accounting"""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.get(MEMORY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(MEMORY_SOFT_LIMIT_MB=512, MEMORY_HARD_LIMIT_MB=0)
+    def test_watermarks_recorded(self):
+        """Test requests record the worker's resident memory"""
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(MEMORY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['pid'], os.getpid())
+        self.assertGreater(res.data['rss'], 0)
+        self.assertGreater(res.data['peak_rss'], 0)
+        self.assertGreater(res.data['high_watermark'], 0)
+        self.assertEqual(res.data['soft_limit'], 512 * 1024 * 1024)
+        self.assertIsNone(res.data['hard_limit'])
+
+    def test_allocation_snapshot(self):
+        """Test snapshots start tracing and report allocation sites"""
+        res = self.client.post(MEMORY_SNAPSHOT_URL, {'limit': 5})
+        self.assertTrue(tracemalloc.is_tracing())
+        self.client.get(RECIPES_URL)
+
+        res = self.client.post(MEMORY_SNAPSHOT_URL, {'limit': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(res.data['sites']), 5)
+        site = res.data['sites'][0]
+        self.assertIn('location', site)
+        self.assertIn('size_diff', site)
+
+    def test_stop_tracing(self):
+        """Test tracing can be turned off again"""
+        self.client.post(MEMORY_SNAPSHOT_URL)
+
+        res = self.client.delete(MEMORY_SNAPSHOT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+class MemoryWatermarkMiddlewareTests(TestCase):
+    """Test crossing the soft limit"""
+
+    @override_settings(MEMORY_SOFT_LIMIT_MB=1)
+    def test_soft_limit_logged_once(self):
+        """Test the first request over the soft limit is logged"""
+        memory.watermarks.soft_limit_logged = False
+        client = APIClient()
+
+        with self.assertLogs('core.memory', level='WARNING') as logs:
+            client.get(RECIPES_URL)
+            client.get(RECIPES_URL)
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].path, RECIPES_URL)
@@ -0,0 +1,136 @@
+"""
+Test the Prometheus metrics
+"""
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, RequestFactory
+from django.urls import reverse, resolve
+
+from rest_framework.test import APIClient
+
+from core import metrics
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def resolved_request(method, path):
+    """Return a request carrying the resolver match of its path"""
+    request = getattr(RequestFactory(), method)(path)
+    request.resolver_match = resolve(path)
+    return request
+
+
+class ViewNameTests(TestCase):
+    """Test labelling requests with the view that handled them"""
+
+    def test_viewset_action(self):
+        """Test viewset requests are labelled with class and action"""
+        request = resolved_request('get', RECIPES_URL)
+
+        self.assertEqual(metrics.view_name(request), 'RecipeViewSet.list')
+
+    def test_extra_action(self):
+        """Test extra viewset actions are labelled with their name"""
+        url = reverse('recipe:recipe-upload-image', args=[1])
+        request = resolved_request('post', url)
+
+        self.assertEqual(
+            metrics.view_name(request),
+            'RecipeViewSet.upload_image',
+        )
+
+    def test_api_view(self):
+        """Test plain API views are labelled with their class"""
+        request = resolved_request('post', reverse('user:token'))
+
+        self.assertEqual(metrics.view_name(request), 'CreateTokenView')
+
+    def test_unresolved(self):
+        """Test requests that did not resolve share one label"""
+        request = RequestFactory().get('/missing/')
+
+        self.assertEqual(metrics.view_name(request), 'unresolved')
+
+
+class MetricsEndpointTests(TestCase):
+    """Test the metrics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_request_metrics_exposed(self):
+        """Test latency, status and query metrics are recorded per view"""
+        user = get_user_model().objects.create_user(
+            'metrics@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(user)
+        self.client.get(RECIPES_URL)
+        metrics.record_cache('schema', hit=True)
+
+        res = self.client.get(METRICS_URL)
+        content = res.content.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            'api_request_duration_seconds_bucket{le="0.005",'
+            'method="GET",view="RecipeViewSet.list"}',
+            content,
+        )
+        self.assertIn(
+            'api_responses_total{method="GET",status="200",'
+            'view="RecipeViewSet.list"}',
+            content,
+        )
+        self.assertIn(
+            'api_request_db_queries_count{view="RecipeViewSet.list"}',
+            content,
+        )
+        self.assertIn('api_requests_in_flight', content)
+        self.assertIn(
+            'cache_requests_total{cache="schema",result="hit"}',
+            content,
+        )
+
+    def test_metrics_read_only(self):
+        """Test the metrics endpoint only answers GET"""
+        res = self.client.post(METRICS_URL)
+
+        self.assertEqual(res.status_code, 405)
+
+
+class SweepDeadProcessesTests(TestCase):
+    """Test dropping the live gauges of killed workers"""
+
+    def test_killed_worker_gauges_removed(self):
+        """Test live gauges of missing PIDs are removed and others kept"""
+        live = os.getpid()
+        dead = 999999999
+        names = [
+            f'gauge_liveall_{dead}.db',
+            f'gauge_livesum_{dead}.db',
+            f'gauge_all_{dead}.db',
+            f'gauge_liveall_{live}.db',
+        ]
+
+        def kill(pid, signal):
+            if pid == dead:
+                raise ProcessLookupError
+
+        with tempfile.TemporaryDirectory() as path:
+            for name in names:
+                open(os.path.join(path, name), 'w').close()
+
+            with patch('core.metrics.os.kill', side_effect=kill):
+                metrics.sweep_dead_processes(path)
+
+            self.assertEqual(
+                sorted(os.listdir(path)),
+                [f'gauge_all_{dead}.db', f'gauge_liveall_{live}.db'],
+            )
@@ -0,0 +1,168 @@
+"""
+Test running browser middleware only outside the token API routes
+"""
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from core.checks import check_scoped_middleware
+from core.middleware import HybridMiddleware, RouteScopedMiddleware
+
+
+def view(request):
+    """Record the attributes browser middleware add to the request"""
+    response = HttpResponse()
+    response.has_session = hasattr(request, 'session')
+    response.has_user = hasattr(request, 'user')
+    return response
+
+
+async def async_view(request):
+    return view(request)
+
+
+class HybridMiddlewareTests(SimpleTestCase):
+    """Test the base of middleware running on both request stacks"""
+
+    def test_passes_requests_on_by_default(self):
+        """Test both stacks hand the request to the next handler"""
+        request = RequestFactory().get('/')
+
+        res = HybridMiddleware(view)(request)
+        async_res = asyncio.run(HybridMiddleware(async_view)(request))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(async_res.status_code, 200)
+
+
+class RouteScopedMiddlewareTests(SimpleTestCase):
+    """Test skipping the scoped middleware on lean routes"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = RouteScopedMiddleware(view)
+
+    def test_lean_route_skips_middleware(self):
+        """Test API routes get no session, user or frame options"""
+        request = self.factory.get('/api/recipe/recipes/')
+
+        res = self.middleware(request)
+
+        self.assertFalse(res.has_session)
+        self.assertFalse(res.has_user)
+        self.assertNotIn('X-Frame-Options', res)
+        self.assertIsNone(
+            self.middleware.process_view(request, view, (), {})
+        )
+
+    def test_other_routes_run_middleware(self):
+        """Test other routes go through the full chain"""
+        request = self.factory.get('/admin/')
+
+        res = self.middleware(request)
+
+        self.assertTrue(res.has_session)
+        self.assertTrue(res.has_user)
+        self.assertEqual(res['X-Frame-Options'], 'DENY')
+
+    def test_csrf_view_hook_runs_outside_lean_routes(self):
+        """Test the CSRF check of the view hooks is applied"""
+        request = self.factory.post('/admin/login/')
+        self.middleware(request)
+
+        res = self.middleware.process_view(request, view, (), {})
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_csrf_skipped_on_lean_routes(self):
+        """Test no CSRF check runs on lean routes"""
+        request = self.factory.post('/api/user/token/')
+
+        self.assertIsNone(
+            self.middleware.process_view(request, view, (), {})
+        )
+
+    def test_async_lean_route(self):
+        """Test the async chain skips the middleware and view hooks"""
+        middleware = RouteScopedMiddleware(async_view)
+        request = self.factory.get('/api/recipe/tags/')
+
+        res = asyncio.run(middleware(request))
+        hook = asyncio.run(middleware.process_view(request, view, (), {}))
+
+        self.assertFalse(res.has_session)
+        self.assertIsNone(hook)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware.process_view))
+
+    @override_settings(SCOPED_MIDDLEWARE=[])
+    def test_admin_middleware_check(self):
+        """Test the admin middleware are required somewhere"""
+        errors = check_scoped_middleware(None)
+
+        self.assertEqual(
+            [error.id for error in errors],
+            ['core.E001', 'core.E002', 'core.E003'],
+        )
+
+
+class AdminWithScopedMiddlewareTests(TestCase):
+    """Test the admin works unchanged through the scoped middleware"""
+
+    def setUp(self):
+        self.password = 'testpass123456789'
+        self.admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password=self.password,
+        )
+        self.client = Client(enforce_csrf_checks=True)
+
+    def test_login_with_csrf_token(self):
+        """Test logging in to the admin through its login form"""
+        url = reverse('admin:login')
+        form = self.client.get(url)
+        token = form.cookies['csrftoken'].value
+
+        res = self.client.post(url, {
+            'username': self.admin_user.email,
+            'password': self.password,
+            'csrfmiddlewaretoken': token,
+            'next': reverse('admin:index'),
+        })
+
+        self.assertRedirects(res, reverse('admin:index'))
+        self.assertEqual(form['X-Frame-Options'], 'DENY')
+
+    def test_login_without_csrf_token_rejected(self):
+        """Test the admin still rejects posts without a CSRF token"""
+        res = self.client.post(reverse('admin:login'), {
+            'username': self.admin_user.email,
+            'password': self.password,
+        })
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_messages_shown(self):
+        """Test admin actions still report through the messages framework"""
+        self.client = Client()
+        self.client.force_login(self.admin_user)
+        user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+
+        res = self.client.post(
+            reverse('admin:core_user_delete', args=[user.id]),
+            {'post': 'yes'},
+            follow=True,
+        )
+
+        self.assertContains(res, 'was deleted successfully')
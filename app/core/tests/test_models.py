@@ -5,7 +5,9 @@ from unittest.mock import patch
 
 from decimal import Decimal
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
 from core import models
@@ -101,3 +103,53 @@ class ModelTest(TestCase):
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+    def test_links_store_recipe_user(self):
+        """Test links to tags and ingredients get the user of their recipe"""
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Sample recipe name',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        tag = models.Tag.objects.create(user=user, name='Tag')
+        ingredient = models.Ingredient.objects.create(user=user, name='Salt')
+
+        recipe.tags.add(tag)
+        models.RecipeIngredient.objects.bulk_create([
+            models.RecipeIngredient(recipe=recipe, ingredient=ingredient),
+        ])
+        saved = models.RecipeTag(
+            recipe=recipe,
+            tag=models.Tag.objects.create(user=user, name='Other'),
+        )
+        saved.save()
+
+        self.assertEqual(
+            set(models.RecipeTag.objects.values_list('user', flat=True)),
+            {user.id},
+        )
+        self.assertEqual(
+            models.RecipeIngredient.objects.get(recipe=recipe).user,
+            user,
+        )
+
+    def test_update_names_stored_user(self):
+        """Test saving a row updates it by its id and the user it had"""
+        user = create_user()
+        tag = models.Tag.objects.create(user=user, name='Tag')
+        tag = models.Tag.objects.get(pk=tag.pk)
+        other = create_user('other@example.com')
+
+        tag.user = other
+        with CaptureQueriesContext(connection) as queries:
+            tag.save()
+
+        update, = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('UPDATE')
+        ]
+        self.assertIn(f'"user_id" = {user.id}', update.split('WHERE')[1])
+        tag.refresh_from_db()
+        self.assertEqual(tag.user, other)
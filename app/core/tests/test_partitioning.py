@@ -0,0 +1,195 @@
+"""
+Tests for partitioning the recipe tables by user
+"""
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+
+from core import partitioning
+from core.management.commands.partition_tables import Command, EXPLAINED
+
+
+LAYOUT = {
+    'core_recipe': {
+        'sequences': [('core_recipe_id_seq', 'id')],
+        'indexes': [{
+            'name': 'core_recipe_user_id_idx',
+            'definition': 'CREATE INDEX core_recipe_user_id_idx '
+                          'ON public.core_recipe USING btree (user_id)',
+            'unique': False,
+        }],
+    },
+    'core_recipe_tags': {
+        'sequences': [('core_recipe_tags_id_seq', 'id')],
+        'indexes': [{
+            'name': 'core_recipe_tags_uniq',
+            'definition': 'CREATE UNIQUE INDEX core_recipe_tags_uniq '
+                          'ON public.core_recipe_tags '
+                          'USING btree (recipe_id, tag_id)',
+            'unique': True,
+        }],
+    },
+}
+FOREIGN_KEYS = [
+    {
+        'table': 'core_recipe',
+        'name': 'core_recipe_user_id_fk',
+        'column': 'user_id',
+        'target': 'core_user',
+        'definition': 'FOREIGN KEY (user_id) REFERENCES core_user(id) '
+                      'DEFERRABLE INITIALLY DEFERRED',
+    },
+    {
+        'table': 'core_recipe_tags',
+        'name': 'core_recipe_tags_recipe_id_fk',
+        'column': 'recipe_id',
+        'target': 'core_recipe',
+        'definition': 'FOREIGN KEY (recipe_id) REFERENCES core_recipe(id) '
+                      'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED',
+    },
+]
+
+
+def scan(relation):
+    """Return the plan node of a scan of a relation"""
+    return {'Node Type': 'Index Scan', 'Relation Name': relation}
+
+
+class PartitionSqlTests(SimpleTestCase):
+    """Test the SQL partitioning tables"""
+
+    def test_tables_copied_into_hash_partitions(self):
+        """Test each table is replaced by one partitioned by user"""
+        statements = partitioning.partition_sql(
+            LAYOUT, FOREIGN_KEYS, partitions=4,
+        )
+
+        self.assertIn(
+            'CREATE TABLE core_recipe_partitioned (LIKE core_recipe '
+            'INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) '
+            'PARTITION BY HASH (user_id)',
+            statements,
+        )
+        self.assertIn(
+            'CREATE TABLE core_recipe_p3 PARTITION OF core_recipe_partitioned '
+            'FOR VALUES WITH (MODULUS 4, REMAINDER 3)',
+            statements,
+        )
+        self.assertNotIn('core_recipe_p4', ' '.join(statements))
+        self.assertLess(
+            statements.index(
+                'ALTER SEQUENCE core_recipe_id_seq '
+                'OWNED BY core_recipe_partitioned.id'
+            ),
+            statements.index('DROP TABLE core_recipe'),
+        )
+        self.assertIn(
+            'ALTER TABLE core_recipe ADD CONSTRAINT core_recipe_pkey '
+            'PRIMARY KEY (id, user_id)',
+            statements,
+        )
+        self.assertIn(LAYOUT['core_recipe']['indexes'][0]['definition'],
+                      statements)
+
+    def test_unique_index_includes_user(self):
+        """Test unique indexes add the user, which they must include"""
+        statements = partitioning.partition_sql(LAYOUT, FOREIGN_KEYS)
+
+        self.assertIn(
+            'CREATE UNIQUE INDEX core_recipe_tags_uniq '
+            'ON public.core_recipe_tags USING btree (recipe_id, tag_id, '
+            'user_id)',
+            statements,
+        )
+
+    def test_unsupported_unique_index_rejected(self):
+        """Test a unique index the user cannot be added to fails"""
+        index = {
+            'name': 'partial',
+            'definition': 'CREATE UNIQUE INDEX partial ON public.core_tag '
+                          'USING btree (name) WHERE (id > 0)',
+            'unique': True,
+        }
+
+        with self.assertRaises(ValueError):
+            partitioning.partitioned_index(index)
+
+    def test_foreign_keys_name_user(self):
+        """Test keys to partitioned tables reference the id and the user"""
+        statements = partitioning.partition_sql(LAYOUT, FOREIGN_KEYS)
+
+        self.assertEqual(
+            statements[1],
+            'ALTER TABLE core_recipe DROP CONSTRAINT core_recipe_user_id_fk',
+        )
+        self.assertIn(
+            'ALTER TABLE core_recipe ADD CONSTRAINT core_recipe_user_id_fk '
+            'FOREIGN KEY (user_id) REFERENCES core_user(id) '
+            'DEFERRABLE INITIALLY DEFERRED',
+            statements,
+        )
+        self.assertIn(
+            'ALTER TABLE core_recipe_tags ADD CONSTRAINT '
+            'core_recipe_tags_recipe_id_fk FOREIGN KEY (recipe_id, user_id) '
+            'REFERENCES core_recipe (id, user_id) ON DELETE CASCADE '
+            'DEFERRABLE INITIALLY DEFERRED',
+            statements,
+        )
+
+    def test_unpruned_plans_reported(self):
+        """Test tables read from more than one partition are reported"""
+        owners = {
+            'core_recipe_p0': 'core_recipe',
+            'core_recipe_p1': 'core_recipe',
+            'core_tag_p0': 'core_tag',
+            'core_tag_p1': 'core_tag',
+        }
+        pruned = [{'Plan': {
+            'Node Type': 'Nested Loop',
+            'Plans': [scan('core_recipe_p1'), scan('core_tag_p1')],
+        }}]
+        appended = [{'Plan': {
+            'Node Type': 'Hash Join',
+            'Plans': [
+                scan('core_tag_p1'),
+                {
+                    'Node Type': 'Append',
+                    'Plans': [scan('core_recipe_p0'), scan('core_recipe_p1')],
+                },
+            ],
+        }}]
+
+        self.assertEqual(partitioning.unpruned(pruned, owners), {})
+        self.assertEqual(
+            partitioning.unpruned(appended, owners),
+            {'core_recipe': ['core_recipe_p0', 'core_recipe_p1']},
+        )
+
+
+class PartitionCommandTests(TestCase):
+    """Test the partition_tables command"""
+
+    def test_needs_postgresql(self):
+        """Test partitioning fails on other databases"""
+        with self.assertRaises(CommandError):
+            call_command('partition_tables', '--check')
+
+    def test_endpoint_statements_name_user(self):
+        """Test the checked endpoints succeed, naming the user of each row.
+
+        Reading a single partition takes the user of every partitioned
+        table a statement reads, deletes cascade in the database instead.
+        """
+        tables = partitioning.partitioned_tables()
+        endpoints = dict(Command().endpoint_queries())
+
+        self.assertIn('RecipeViewSet.partial_update', endpoints)
+        for endpoint, queries in endpoints.items():
+            for sql in queries:
+                if not sql.startswith(EXPLAINED[:2]):
+                    continue
+                for table in tables:
+                    if f'"{table}"' in sql:
+                        self.assertIn(
+                            f'"{table}"."user_id"', sql, f'{endpoint}: {sql}',
+                        )
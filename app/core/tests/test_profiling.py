@@ -0,0 +1,127 @@
+"""
+Test on-demand profiling of live requests
+"""
+import marshal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import profiling
+
+
+PROFILER_URL = reverse('profiler')
+PROFILER_STATS_URL = reverse('profiler-stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class PublicProfilerAPITests(TestCase):
+    """Test the profiler is restricted to staff"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def tearDown(self):
+        profiling.stop()
+
+    def test_auth_required(self):
+        """Test anonymous users cannot start profiling"""
+        res = self.client.post(PROFILER_URL, {'pattern': '.', 'requests': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(profiling.current_session())
+
+    def test_staff_required(self):
+        """Test regular users cannot start profiling"""
+        user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.post(PROFILER_URL, {'pattern': '.', 'requests': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIsNone(profiling.current_session())
+
+
+class PrivateProfilerAPITests(TestCase):
+    """Test profiling requests as a staff user"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(
+            'admin@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        profiling.stop()
+
+    def test_profile_matching_requests(self):
+        """Test only the next N matching requests are profiled"""
+        res = self.client.post(
+            PROFILER_URL,
+            {'pattern': '^/api/recipe/recipes/', 'requests': 2},
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['remaining'], 2)
+
+        self.client.get(TAGS_URL)
+        for _ in range(3):
+            self.client.get(RECIPES_URL)
+
+        res = self.client.get(PROFILER_URL)
+        self.assertEqual(res.data['profiled'], 2)
+        self.assertEqual(res.data['remaining'], 0)
+
+    def test_download_pstats(self):
+        """Test aggregated stats download in the pstats format"""
+        self.client.post(PROFILER_URL, {'pattern': 'recipes', 'requests': 1})
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(PROFILER_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('.pstats', res['Content-Disposition'])
+        stats = marshal.loads(res.content)
+        functions = {func for _, _, func in stats}
+        self.assertIn('get_queryset', functions)
+
+    def test_download_text_report(self):
+        """Test aggregated stats as a text report"""
+        self.client.post(PROFILER_URL, {'pattern': 'recipes', 'requests': 1})
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(PROFILER_STATS_URL, {'output': 'text'})
+
+        self.assertContains(res, 'cumulative')
+
+    def test_stats_unavailable_before_profiling(self):
+        """Test there is nothing to download before requests are profiled"""
+        self.client.post(PROFILER_URL, {'pattern': 'recipes', 'requests': 1})
+
+        res = self.client.get(PROFILER_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_pattern_rejected(self):
+        """Test an invalid regular expression is rejected"""
+        res = self.client.post(PROFILER_URL, {'pattern': '(', 'requests': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIsNone(profiling.current_session())
+
+    def test_stop_profiling(self):
+        """Test stopping discards the session"""
+        self.client.post(PROFILER_URL, {'pattern': '.', 'requests': 5})
+
+        res = self.client.delete(PROFILER_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertIsNone(profiling.current_session())
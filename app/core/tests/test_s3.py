@@ -0,0 +1,61 @@
+"""
+Tests for the S3 compatible content addressed storage
+"""
+import hashlib
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import SimpleTestCase, override_settings
+
+from core.s3 import S3ContentAddressedStorage
+from core.storage import upload_name
+
+
+DIGEST = hashlib.sha256(b'image').hexdigest()
+
+
+@override_settings(
+    AWS_STORAGE_BUCKET_NAME='media',
+    AWS_S3_ENDPOINT_URL='http://minio:9000',
+    AWS_S3_REGION_NAME='us-east-1',
+    AWS_ACCESS_KEY_ID='key',
+    AWS_SECRET_ACCESS_KEY='secret',
+)
+class S3ContentAddressedStorageTests(SimpleTestCase):
+    """Test signing uploads and reads, without contacting the bucket"""
+
+    def setUp(self):
+        self.storage = S3ContentAddressedStorage()
+        self.name = upload_name(DIGEST, 'image/png')
+
+    def test_upload_url_signs_checksum(self):
+        """Test presigned uploads are bound to the content hash"""
+        upload = self.storage.upload_url(self.name, DIGEST, 5, 'image/png')
+        url = urlsplit(upload['url'])
+        signed_headers = parse_qs(url.query)['X-Amz-SignedHeaders'][0]
+
+        self.assertEqual(upload['method'], 'PUT')
+        self.assertEqual(url.netloc, 'minio:9000')
+        self.assertEqual(url.path, f'/media/{self.name}')
+        self.assertIn('x-amz-checksum-sha256', signed_headers)
+        self.assertIn('content-type', signed_headers)
+        self.assertEqual(
+            upload['headers']['x-amz-checksum-sha256'],
+            'YQXWzHavQAMl6U1YjOURvlv9u3O0N9xR7KQ5F9ekPj0=',
+        )
+
+    def test_reads_signed(self):
+        """Test image URLs are short-lived signed URLs"""
+        url = urlsplit(self.storage.url(self.name))
+
+        self.assertIn('X-Amz-Signature', parse_qs(url.query))
+        self.assertIn('X-Amz-Expires', parse_qs(url.query))
+
+    @override_settings(AWS_S3_CUSTOM_DOMAIN='cdn.example.com')
+    def test_reads_from_cdn(self):
+        """Test a CDN domain is used for reads when configured"""
+        storage = S3ContentAddressedStorage()
+
+        self.assertEqual(
+            storage.url(self.name),
+            f'https://cdn.example.com/{self.name}',
+        )
@@ -0,0 +1,106 @@
+"""
+Tests for the prebuilt OpenAPI schema
+"""
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+from core.metrics import CACHE_REQUESTS
+
+
+SCHEMA_URL = reverse('api-schema')
+DOCS_URL = reverse('api-docs')
+
+
+def cache_count(result):
+    """Return the schema cache lookups counted with a result"""
+    return CACHE_REQUESTS.labels('openapi_schema', result)._value.get()
+
+
+class PrebuiltSchemaTests(SimpleTestCase):
+    """Test generating and serving the prebuilt schema"""
+
+    def setUp(self):
+        schema.clear()
+        self.addCleanup(schema.clear)
+
+    def test_committed_schema_is_current(self):
+        """Test openapi.yml matches the API, regenerate it if this fails"""
+        with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as schema_file:
+            committed = schema_file.read()
+
+        self.assertEqual(
+            committed.decode(),
+            schema.generate().decode(),
+            'Run python manage.py generate_schema',
+        )
+
+    def test_schema_served_with_etag(self):
+        """Test the schema is served with an ETag and long cache headers"""
+        res = self.client.get(SCHEMA_URL)
+
+        with open(settings.OPENAPI_SCHEMA_FILE, 'rb') as schema_file:
+            self.assertEqual(res.content, schema_file.read())
+        self.assertTrue(res['Content-Type'].startswith(
+            'application/vnd.oai.openapi'
+        ))
+        self.assertTrue(res['ETag'])
+        self.assertIn('max-age=86400', res['Cache-Control'])
+        self.assertIn('public', res['Cache-Control'])
+
+    def test_not_modified(self):
+        """Test a matching If-None-Match gets an empty 304"""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_schema_loaded_once(self):
+        """Test later requests are served from memory"""
+        hits = cache_count('hit')
+        misses = cache_count('miss')
+
+        self.client.get(SCHEMA_URL)
+        self.client.get(SCHEMA_URL)
+
+        self.assertEqual(cache_count('miss'), misses + 1)
+        self.assertEqual(cache_count('hit'), hits + 1)
+
+    def test_generated_when_file_missing(self):
+        """Test the schema is generated on first request without a file"""
+        missing = os.path.join(tempfile.gettempdir(), 'missing-openapi.yml')
+
+        with override_settings(OPENAPI_SCHEMA_FILE=missing):
+            res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.content.startswith(b'openapi:'))
+
+    def test_docs_reference_schema(self):
+        """Test the Swagger UI loads the prebuilt schema"""
+        res = self.client.get(DOCS_URL)
+
+        self.assertContains(res, SCHEMA_URL)
+
+    def test_check_command(self):
+        """Test generate_schema --check fails on a stale schema"""
+        with tempfile.NamedTemporaryFile(suffix='.yml') as stale:
+            stale.write(b'openapi: 3.0.3\n')
+            stale.flush()
+
+            with override_settings(OPENAPI_SCHEMA_FILE=stale.name):
+                with self.assertRaises(CommandError):
+                    call_command('generate_schema', check=True)
+
+                call_command('generate_schema', stdout=StringIO())
+                call_command('generate_schema', check=True, stdout=StringIO())
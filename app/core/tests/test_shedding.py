@@ -0,0 +1,192 @@
+"""
+Test shedding low priority requests under overload
+"""
+import asyncio
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import shedding
+from core.models import Tag
+from core.views import api_docs, openapi_schema
+from recipe import views as recipe_views
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+recipe_list = recipe_views.RecipeViewSet.as_view({'get': 'list'})
+recipe_detail = recipe_views.RecipeViewSet.as_view({'get': 'retrieve'})
+
+
+def view(request):
+    return HttpResponse()
+
+
+def waited(seconds):
+    """Return the X-Request-Start header of a request queued for seconds"""
+    return {'HTTP_X_REQUEST_START': f't={time.time() - seconds:.3f}'}
+
+
+@override_settings(SHED_MAX_IN_FLIGHT=2, SHED_MAX_QUEUE_WAIT_MS=500)
+class LoadSheddingMiddlewareTests(SimpleTestCase):
+    """Test the overload checks of the middleware"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = shedding.LoadSheddingMiddleware(view)
+
+    def admitted(self, request):
+        self.middleware.admit(request)
+        self.addCleanup(self.middleware.in_flight.leave)
+        return request
+
+    def test_queue_wait_parsed(self):
+        """Test nginx, millisecond and microsecond timestamps are read"""
+        request = self.factory.get('/', HTTP_X_REQUEST_START='t=99.5')
+
+        self.assertEqual(shedding.queue_wait(request, 100.0), 0.5)
+        request.META['HTTP_X_REQUEST_START'] = '99500'
+        self.assertEqual(shedding.queue_wait(request, 100.0), 0.5)
+        request.META['HTTP_X_REQUEST_START'] = '99500000'
+        self.assertEqual(shedding.queue_wait(request, 100.0), 0.5)
+        request.META['HTTP_X_REQUEST_START'] = 'bad'
+        self.assertIsNone(shedding.queue_wait(request, 100.0))
+
+    def test_low_priority_shed_after_queue_wait(self):
+        """Test list polling waiting too long gets a 503"""
+        request = self.admitted(self.factory.get('/', **waited(1)))
+
+        res = self.middleware.process_view(request, recipe_list, (), {})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '2')
+
+    def test_schema_and_docs_shed(self):
+        """Test the schema and docs are low priority"""
+        request = self.admitted(self.factory.get('/', **waited(1)))
+
+        for low_priority_view in (openapi_schema, api_docs):
+            res = self.middleware.process_view(
+                request, low_priority_view, (), {},
+            )
+            self.assertEqual(res.status_code, 503)
+
+    def test_other_requests_served(self):
+        """Test details and writes are served under overload"""
+        read = self.admitted(self.factory.get('/', **waited(1)))
+        write = self.admitted(self.factory.post('/', **waited(1)))
+        post_list = recipe_views.RecipeViewSet.as_view(
+            {'get': 'list', 'post': 'create'},
+        )
+
+        self.assertIsNone(
+            self.middleware.process_view(read, recipe_detail, (), {})
+        )
+        self.assertIsNone(
+            self.middleware.process_view(write, post_list, (), {})
+        )
+
+    def test_shed_over_in_flight_limit(self):
+        """Test reads are shed beyond the requests in flight limit"""
+        first = self.admitted(self.factory.get('/'))
+        second = self.admitted(self.factory.get('/'))
+        third = self.admitted(self.factory.get('/'))
+
+        self.assertIsNone(
+            self.middleware.process_view(second, recipe_list, (), {})
+        )
+        self.assertEqual(
+            self.middleware.process_view(third, recipe_list, (), {})
+            .status_code,
+            503,
+        )
+        self.assertEqual(first.in_flight, 1)
+
+    def test_in_flight_released(self):
+        """Test finished requests leave the in flight count"""
+        self.middleware(self.factory.get('/'))
+
+        self.assertEqual(self.middleware.in_flight.count, 0)
+
+    def test_async_view_hook(self):
+        """Test the async stack gets a coroutine view hook"""
+        async def async_view(request):
+            return view(request)
+
+        middleware = shedding.LoadSheddingMiddleware(async_view)
+        request = self.factory.get('/', **waited(1))
+        middleware.admit(request)
+
+        res = asyncio.run(
+            middleware.process_view(request, recipe_list, (), {})
+        )
+
+        self.assertEqual(res.status_code, 503)
+
+    @override_settings(SHED_MAX_IN_FLIGHT=0, SHED_MAX_QUEUE_WAIT_MS=0)
+    def test_disabled(self):
+        """Test the middleware is left out without limits"""
+        with self.assertRaises(MiddlewareNotUsed):
+            shedding.LoadSheddingMiddleware(view)
+
+
+@override_settings(SHED_MAX_QUEUE_WAIT_MS=500)
+class OverloadedApiTests(TestCase):
+    """Test the API under overload through the full middleware stack"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'shed@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_shed(self):
+        """Test list polling is shed"""
+        res = self.client.get(RECIPES_URL, **waited(2))
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', res)
+
+    def test_writes_and_auth_served(self):
+        """Test writes and logins keep working"""
+        created = self.client.post(
+            RECIPES_URL,
+            {'title': 'Kept', 'time_minutes': 5, 'price': '2.00'},
+            **waited(2),
+        )
+        tag = Tag.objects.create(user=self.user, name='Kept')
+        updated = self.client.patch(
+            reverse('recipe:tag-detail', args=[tag.id]),
+            {'name': 'Updated'},
+            **waited(2),
+        )
+        login = APIClient().post(
+            TOKEN_URL,
+            {'email': 'shed@example.com', 'password': 'testpass123'},
+            **waited(2),
+        )
+
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(updated.status_code, status.HTTP_200_OK)
+        self.assertEqual(login.status_code, status.HTTP_200_OK)
+
+    def test_served_without_wait(self):
+        """Test lists are served when requests are not queued"""
+        res = self.client.get(RECIPES_URL, **waited(0))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
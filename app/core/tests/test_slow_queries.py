@@ -0,0 +1,103 @@
+"""
+Test the slow query log
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import slow_queries
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RateLimiterTests(SimpleTestCase):
+    """Test rate limiting slow query reports"""
+
+    def test_bucket_empties_and_refills(self):
+        """Test reports are limited per key and refill over time"""
+        now = [0]
+        limiter = slow_queries.RateLimiter(2, clock=lambda: now[0])
+
+        self.assertTrue(limiter.allow('RecipeViewSet.list'))
+        self.assertTrue(limiter.allow('RecipeViewSet.list'))
+        self.assertFalse(limiter.allow('RecipeViewSet.list'))
+        self.assertTrue(limiter.allow('TagViewSet.list'))
+
+        now[0] = 30
+        self.assertTrue(limiter.allow('RecipeViewSet.list'))
+        self.assertFalse(limiter.allow('RecipeViewSet.list'))
+
+    def test_only_selects_are_explained(self):
+        """Test EXPLAIN ANALYZE is never used to re-run writes"""
+        self.assertTrue(slow_queries.explainable(' SELECT 1'))
+        self.assertFalse(slow_queries.explainable('DELETE FROM core_tag'))
+
+
+@patch('core.slow_queries._limiter', None)
+class SlowQueryMiddlewareTests(TestCase):
+    """Test slow queries of API requests are reported"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'slow@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    def test_slow_query_logged_with_view(self):
+        """Test queries over the threshold are logged with their view"""
+        with self.assertLogs('core.slow_queries', level='WARNING') as logs:
+            self.client.get(RECIPES_URL, {'tags': '1,2'})
+
+        # The rate limit counter in the database cache is queried first
+        record = next(
+            record for record in logs.records if 'core_recipe' in record.sql
+        )
+        self.assertEqual(record.view, 'RecipeViewSet.list')
+        self.assertIn('core_recipe', record.sql)
+        self.assertEqual(record.method, 'GET')
+        self.assertIn('1', record.params)
+
+    @override_settings(
+        SLOW_QUERY_THRESHOLD_MS=0.000001,
+        SLOW_QUERY_LOG_RATE=1,
+    )
+    def test_reports_rate_limited(self):
+        """Test a view cannot report more than its rate"""
+        with self.assertLogs('core.slow_queries', level='WARNING') as logs:
+            self.client.get(RECIPES_URL)
+            self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(logs.records), 1)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    @patch('core.slow_queries.SlowQueryRecorder.report')
+    def test_disabled_by_default(self, patched_report):
+        """Test nothing is recorded without a threshold"""
+        self.client.get(RECIPES_URL)
+
+        patched_report.assert_not_called()
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0.000001)
+    @patch('core.slow_queries.threading.Thread')
+    def test_plan_captured_out_of_band_on_postgres(self, patched_thread):
+        """Test plans are captured from a separate thread on PostgreSQL"""
+        with patch.object(
+            connections['default'],
+            'vendor',
+            'postgresql',
+        ), self.assertLogs('core.slow_queries', level='WARNING'):
+            self.client.get(RECIPES_URL)
+
+        patched_thread.assert_called()
+        kwargs = patched_thread.call_args.kwargs
+        self.assertEqual(kwargs['target'], slow_queries.capture_plan)
+        self.assertTrue(kwargs['daemon'])
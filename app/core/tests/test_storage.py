@@ -0,0 +1,113 @@
+"""
+Tests for the content addressed media storage
+"""
+import hashlib
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import Recipe
+from core.storage import MEDIA_DEDUPLICATED_BYTES, dedup_stats
+
+
+CONTENT = b'recipe image bytes'
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+class ContentAddressedStorageTests(TestCase):
+    """Test storing uploads once per content"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.user = get_user_model().objects.create_user(
+            'storage@example.com',
+            'testpass123',
+        )
+
+    def create_recipe(self, content=CONTENT, filename='photo.JPG'):
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Stored',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        recipe.image.save(filename, ContentFile(content))
+        return recipe
+
+    def test_named_after_content(self):
+        """Test files are stored under their sha256 in sharded folders"""
+        recipe = self.create_recipe()
+
+        self.assertEqual(
+            recipe.image.name,
+            f'uploads/recipe/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.jpg',
+        )
+        with recipe.image.open('rb') as image_file:
+            self.assertEqual(image_file.read(), CONTENT)
+
+    def test_identical_uploads_shared(self):
+        """Test the same bytes are written once for several recipes"""
+        saved = MEDIA_DEDUPLICATED_BYTES._value.get()
+        first = self.create_recipe()
+        second = self.create_recipe(filename='copy.jpg')
+        other = self.create_recipe(content=b'other bytes')
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertEqual(
+            MEDIA_DEDUPLICATED_BYTES._value.get(),
+            saved + len(CONTENT),
+        )
+
+    def test_shared_file_kept_on_delete(self):
+        """Test deleting one recipe's image keeps the file of the others"""
+        first = self.create_recipe()
+        second = self.create_recipe()
+
+        first.image.delete()
+
+        self.assertTrue(default_storage.exists(second.image.name))
+        second.refresh_from_db()
+        with second.image.open('rb') as image_file:
+            self.assertEqual(image_file.read(), CONTENT)
+
+    def test_unreferenced_file_deleted(self):
+        """Test files no recipe uses can be deleted"""
+        name = default_storage.save('uploads/recipe/x.jpg', ContentFile(b'x'))
+
+        default_storage.delete(name)
+
+        self.assertFalse(default_storage.exists(name))
+
+    def test_dedup_stats(self):
+        """Test the stats count the bytes saved by sharing files"""
+        for _ in range(3):
+            self.create_recipe()
+        self.create_recipe(content=b'other')
+
+        stats = dedup_stats(default_storage)
+
+        self.assertEqual(stats['files'], 2)
+        self.assertEqual(stats['references'], 4)
+        self.assertEqual(stats['stored_bytes'], len(CONTENT) + 5)
+        self.assertEqual(stats['saved_bytes'], 2 * len(CONTENT))
+
+    def test_media_stats_command(self):
+        """Test the command reports the saved bytes"""
+        self.create_recipe()
+        out = StringIO()
+
+        call_command('media_stats', stdout=out)
+
+        self.assertIn('1 files referenced 1 times', out.getvalue())
+        self.assertIn('saved_bytes', out.getvalue())
@@ -0,0 +1,136 @@
+"""
+Tests for resumable upload sessions
+"""
+import datetime
+import os
+import tempfile
+import uuid
+from decimal import Decimal
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.http import UnreadablePostError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import uploads
+from core.models import Recipe, UploadSession
+
+
+class DroppedStream(BytesIO):
+    """Request body whose connection drops after the first read"""
+
+    def read(self, size=-1):
+        if self.tell():
+            raise UnreadablePostError('connection reset')
+        return super().read(size)
+
+
+class UploadSessionTests(TestCase):
+    """Test appending chunks and cleaning up abandoned sessions"""
+
+    def setUp(self):
+        session_root = tempfile.TemporaryDirectory()
+        self.addCleanup(session_root.cleanup)
+        session_settings = override_settings(
+            MEDIA_UPLOAD_SESSION_ROOT=session_root.name,
+        )
+        session_settings.enable()
+        self.addCleanup(session_settings.disable)
+        self.root = session_root.name
+
+        user = get_user_model().objects.create_user(
+            'sessions@example.com',
+            'testpass123',
+        )
+        self.recipe = Recipe.objects.create(
+            user=user,
+            title='Sessions',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        self.session = UploadSession.objects.create(
+            user=user,
+            recipe=self.recipe,
+            size=100,
+        )
+        uploads.start(self.session)
+
+    def test_dropped_connection_keeps_received_bytes(self):
+        """Test the bytes read before a dropped connection are kept"""
+        offset = uploads.append(self.session, 0, DroppedStream(b'x' * 100))
+
+        self.assertGreater(offset, 0)
+        self.assertLessEqual(offset, 100)
+        self.assertEqual(os.path.getsize(uploads.session_path(self.session)), offset)
+
+    def test_append_overwrites_unrecorded_bytes(self):
+        """Test a chunk replaces bytes written past the recorded offset"""
+        with open(uploads.session_path(self.session), 'wb') as part:
+            part.write(b'garbage')
+
+        offset = uploads.append(self.session, 0, BytesIO(b'chunk'))
+
+        self.assertEqual(offset, 5)
+        with open(uploads.session_path(self.session), 'rb') as part:
+            self.assertEqual(part.read(), b'chunk')
+
+    def test_concurrent_chunk_not_written(self):
+        """Test a chunk whose offset moved while it arrived is rejected"""
+        session = self.session
+
+        class RacedStream(BytesIO):
+            def read(self, size=-1):
+                UploadSession.objects.filter(pk=session.pk).update(offset=3)
+                return super().read(size)
+
+        with open(uploads.session_path(session), 'wb') as part:
+            part.write(b'won')
+
+        with self.assertRaises(uploads.OffsetMismatch) as raised:
+            uploads.append(session, 0, RacedStream(b'lost'))
+
+        self.assertEqual(raised.exception.offset, 3)
+        with open(uploads.session_path(session), 'rb') as part:
+            self.assertEqual(part.read(), b'won')
+
+    def cleanup_uploads(self, **options):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('cleanup_uploads', stdout=out, **options)
+        return out.getvalue()
+
+    def test_expired_sessions_deleted(self):
+        """Test sessions idle past the expiry are deleted with their files"""
+        idle = timezone.now() - datetime.timedelta(hours=25)
+        UploadSession.objects.filter(pk=self.session.pk).update(
+            updated_at=idle,
+        )
+
+        out = self.cleanup_uploads()
+
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(uploads.session_path(self.session)))
+        self.assertIn('Deleted 1 expired upload sessions', out)
+
+    def test_active_sessions_kept(self):
+        """Test sessions that recently received chunks are kept"""
+        self.cleanup_uploads()
+
+        self.assertTrue(UploadSession.objects.exists())
+        self.assertTrue(os.path.exists(uploads.session_path(self.session)))
+
+    def test_stray_files_deleted(self):
+        """Test old files of sessions deleted with their recipe go too"""
+        stray = os.path.join(self.root, f'{uuid.uuid4()}.part')
+        open(stray, 'wb').close()
+        old = (timezone.now() - datetime.timedelta(hours=25)).timestamp()
+        os.utime(stray, (old, old))
+        os.utime(uploads.session_path(self.session), (old, old))
+
+        out = self.cleanup_uploads()
+
+        self.assertFalse(os.path.exists(stray))
+        self.assertTrue(os.path.exists(uploads.session_path(self.session)))
+        self.assertIn('1 stray files', out)
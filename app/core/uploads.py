@@ -0,0 +1,205 @@
+"""
+Resumable uploads of recipe images
+
+A client creates a session for the size of its file and sends the file in
+chunks, each starting at the offset received so far. After a dropped
+connection it asks for the offset and resumes from there instead of sending
+the whole file again. Once every byte arrived the session is finalized: the
+file is stored like any other upload and attached to the recipe.
+
+The chunks of a session go to a file under MEDIA_UPLOAD_SESSION_ROOT, which
+every replica serving the API must share, as the chunks of one session may
+reach different replicas.
+"""
+import os
+import shutil
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils import timezone
+
+from core.image_metadata import METADATA_FIELDS, image_metadata
+from core.models import UploadSession
+from core.storage import HASH_CHUNK_SIZE, UPLOAD_EXTENSIONS
+
+
+class OffsetMismatch(Exception):
+    """A chunk does not start where the received bytes end"""
+
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.offset = offset
+
+
+class IncompleteUpload(Exception):
+    """A session is finalized before all of its bytes were received"""
+
+
+class InvalidImage(Exception):
+    """The received file is not an image in an accepted format"""
+
+
+def session_path(session):
+    """Return the path of the file the chunks of a session are appended to"""
+    return os.path.join(
+        settings.MEDIA_UPLOAD_SESSION_ROOT,
+        f'{session.id}.part',
+    )
+
+
+def start(session):
+    """Create the empty file the chunks of a new session are appended to"""
+    os.makedirs(settings.MEDIA_UPLOAD_SESSION_ROOT, exist_ok=True)
+    open(session_path(session), 'wb').close()
+
+
+def append(session, offset, stream):
+    """Append a chunk read from stream at offset, return the new offset.
+
+    The chunk is read from the client into a temporary file first, so no
+    row is locked while it arrives. The offset then only advances if no
+    other chunk moved it meanwhile, and the chunk is copied into the session
+    file while that update holds the row. Nothing past the session size is
+    read, and the bytes received before a dropped connection are kept.
+    """
+    session = UploadSession.objects.get(pk=session.pk)
+    if offset != session.offset:
+        raise OffsetMismatch(session.offset)
+
+    with tempfile.TemporaryFile(dir=settings.MEDIA_UPLOAD_SESSION_ROOT) as chunk:
+        received = 0
+        while stream is not None and offset + received < session.size:
+            try:
+                data = stream.read(
+                    min(HASH_CHUNK_SIZE, session.size - offset - received)
+                )
+            except UnreadablePostError:
+                break
+            if not data:
+                break
+            chunk.write(data)
+            received += len(data)
+
+        with transaction.atomic():
+            advanced = UploadSession.objects.filter(
+                pk=session.pk,
+                offset=offset,
+            ).update(offset=offset + received, updated_at=timezone.now())
+            if not advanced:
+                raise OffsetMismatch(
+                    UploadSession.objects.get(pk=session.pk).offset
+                )
+
+            chunk.seek(0)
+            with open(session_path(session), 'r+b') as part:
+                # Drops bytes written by a chunk whose offset was never saved
+                part.seek(offset)
+                part.truncate()
+                shutil.copyfileobj(chunk, part, HASH_CHUNK_SIZE)
+
+    return offset + received
+
+
+def image_extension(content):
+    """Return the extension of an image in an accepted format"""
+    # Only imported where images are processed
+    from PIL import Image
+
+    try:
+        image = Image.open(content)
+        image.verify()
+    except Exception as exc:
+        raise InvalidImage from exc
+    finally:
+        content.seek(0)
+
+    extension = UPLOAD_EXTENSIONS.get(Image.MIME.get(image.format))
+    if extension is None:
+        raise InvalidImage
+    return extension
+
+
+def finalize(session):
+    """Store the received file and attach it to the recipe, return it.
+
+    The recipe is updated and the session deleted in one transaction. If it
+    rolls back the stored file is unreferenced and garbage collected.
+    """
+    with transaction.atomic():
+        session = (
+            UploadSession.objects
+            .select_for_update()
+            .select_related('recipe')
+            .get(pk=session.pk)
+        )
+        if session.offset != session.size:
+            raise IncompleteUpload
+
+        recipe = session.recipe
+        with open(session_path(session), 'rb') as part:
+            extension = image_extension(part)
+            content = File(part)
+            for field, value in image_metadata(content).items():
+                setattr(recipe, field, value)
+            recipe.image.save(f'upload{extension}', content, save=False)
+        recipe.save(update_fields=['image', *METADATA_FIELDS])
+        discard(session)
+
+    return recipe
+
+
+def discard(session):
+    """Delete a session, and its file once the deletion is committed"""
+    path = session_path(session)
+    session.delete()
+    transaction.on_commit(lambda: remove(path))
+
+
+def remove(path):
+    """Delete a session file if it still exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def expired(expiry, now=None):
+    """Return the sessions idle for longer than expiry"""
+    now = now or timezone.now()
+    return UploadSession.objects.filter(updated_at__lt=now - expiry)
+
+
+def stray_files(expiry, now=None):
+    """Return the paths of old session files without a session"""
+    cutoff = ((now or timezone.now()) - expiry).timestamp()
+    try:
+        entries = os.scandir(settings.MEDIA_UPLOAD_SESSION_ROOT)
+    except FileNotFoundError:
+        return []
+
+    with entries:
+        old = {
+            entry.name[:-len('.part')]: entry.path
+            for entry in entries
+            if entry.name.endswith('.part')
+            and entry.stat().st_mtime < cutoff
+        }
+    sessions = UploadSession.objects.filter(
+        pk__in=[pk for pk in old if is_uuid(pk)],
+    ).values_list('pk', flat=True)
+    for pk in sessions:
+        del old[str(pk)]
+    return list(old.values())
+
+
+def is_uuid(value):
+    """Return whether a file name stem is a session id"""
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,159 @@
+"""
+Operational views
+"""
+import functools
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_GET
+
+from drf_spectacular.utils import OpenApiTypes, extend_schema
+
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import memory
+from core import metrics as core_metrics
+from core import profiling
+from core import schema as core_schema
+from core.shedding import low_priority
+from core.serializers import ProfilingSessionSerializer
+
+
+@require_GET
+def metrics(request):
+    """Expose Prometheus metrics aggregated across worker processes"""
+    content, content_type = core_metrics.exposition()
+    return HttpResponse(content, content_type=content_type)
+
+
+@functools.lru_cache(maxsize=None)
+def swagger_view():
+    """Return the Swagger UI view, importing drf_spectacular on first use"""
+    from drf_spectacular.views import SpectacularSwaggerView
+
+    return SpectacularSwaggerView.as_view(url_name='api-schema')
+
+
+@low_priority
+def api_docs(request, *args, **kwargs):
+    """Serve the Swagger UI for the prebuilt schema"""
+    return swagger_view()(request, *args, **kwargs)
+
+
+@low_priority
+@require_GET
+def openapi_schema(request):
+    """Serve the prebuilt OpenAPI schema, revalidated with its ETag"""
+    prebuilt = core_schema.get_schema()
+    response = get_conditional_response(request, etag=prebuilt.etag)
+    if response is None:
+        response = HttpResponse(
+            prebuilt.content,
+            content_type=core_schema.CONTENT_TYPE,
+        )
+    response['ETag'] = prebuilt.etag
+    patch_cache_control(
+        response,
+        public=True,
+        max_age=core_schema.MAX_AGE,
+    )
+    return response
+
+
+class ProfilerView(APIView):
+    """Profile the next requests matching a pattern in this worker"""
+    serializer_class = ProfilingSessionSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Return the profiling session of this worker"""
+        session = profiling.current_session()
+        if session is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        return Response(self.serializer_class(session.status()).data)
+
+    def post(self, request):
+        """Start profiling, replacing any previous session"""
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = profiling.start(**serializer.validated_data)
+
+        return Response(
+            self.serializer_class(session.status()).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    def delete(self, request):
+        """Stop profiling and discard the collected stats"""
+        profiling.stop()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ProfilerStatsView(APIView):
+    """Download the aggregated stats of the profiling session"""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.BINARY)
+    def get(self, request):
+        """Return stats as a pstats file, or as text with ?output=text"""
+        session = profiling.current_session()
+        if session is None or not session.profiled:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        if request.query_params.get('output') == 'text':
+            return HttpResponse(session.report(), content_type='text/plain')
+
+        response = HttpResponse(
+            session.dump(),
+            content_type='application/octet-stream',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="worker-{session.status()["pid"]}.pstats"'
+        )
+        return response
+
+
+class MemoryView(APIView):
+    """Memory watermarks and limits of this worker"""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        """Return the memory status of this worker"""
+        return Response(memory.watermarks.status())
+
+
+class MemorySnapshotView(APIView):
+    """Python heap allocation sites of this worker, traced on demand"""
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(request=OpenApiTypes.OBJECT, responses=OpenApiTypes.OBJECT)
+    def post(self, request):
+        """Take a snapshot and return the top allocation sites"""
+        try:
+            limit = int(request.data.get('limit', 25))
+        except (TypeError, ValueError):
+            return Response(
+                {'limit': ['A valid integer is required.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({
+            'pid': memory.watermarks.status()['pid'],
+            'sites': memory.allocation_sites(limit=max(limit, 1)),
+        })
+
+    @extend_schema(responses=None)
+    def delete(self, request):
+        """Stop tracing allocations"""
+        memory.stop_tracing()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,132 @@
+"""
+Async views for the read-heavy recipe APIs, used by the ASGI deployment
+"""
+from asgiref.sync import sync_to_async
+
+from django.db import close_old_connections
+from django.http import Http404, JsonResponse
+
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipe import views
+
+
+def load(viewset, action, request, kwargs):
+    """Authenticate, query and serialize a read action of a viewset.
+
+    Everything touching the database runs here, in one hop to a thread of
+    the pool, while the event loop stays free for other connections. The
+    thread closes its connection once past CONN_MAX_AGE or broken, as a
+    request thread would. Returns the data and the rate limit headers.
+    """
+    try:
+        return read(viewset, action, request, kwargs)
+    finally:
+        close_old_connections()
+
+
+def read(viewset, action, request, kwargs):
+    """Run a read action of a viewset, return its data and headers"""
+    view = viewset(
+        request=None,
+        action=action,
+        args=(),
+        kwargs=kwargs,
+        format_kwarg=None,
+    )
+    drf_request = Request(
+        request,
+        authenticators=view.get_authenticators(),
+    )
+    view.request = drf_request
+    view.perform_authentication(drf_request)
+    view.check_permissions(drf_request)
+    view.check_throttles(drf_request)
+
+    if action == 'list':
+        instance = view.get_queryset()
+        many = True
+    else:
+        instance = view.get_object()
+        many = False
+
+    data = view.get_serializer(instance, many=many).data
+    return data, getattr(drf_request, 'rate_limit', {})
+
+
+def error_response(exc):
+    """Return the JSON response DRF would return for an exception"""
+    if isinstance(exc, Http404):
+        exc = exceptions.NotFound()
+
+    response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+    if isinstance(
+        exc,
+        (exceptions.NotAuthenticated, exceptions.AuthenticationFailed),
+    ):
+        response.status_code = 401
+        response['WWW-Authenticate'] = 'Token'
+    if isinstance(exc, exceptions.Throttled) and exc.wait is not None:
+        response['Retry-After'] = str(exc.wait)
+
+    return response
+
+
+def async_read_view(viewset, actions):
+    """Build a view serving GET asynchronously and the rest with DRF"""
+    drf_view = viewset.as_view(actions)
+    sync_view = sync_to_async(drf_view)
+    read_action = actions['get']
+
+    async def view(request, **kwargs):
+        if request.method != 'GET':
+            return await sync_view(request, **kwargs)
+
+        try:
+            # Reads run concurrently, not on the single thread shared by
+            # thread sensitive calls
+            data, headers = await sync_to_async(
+                load, thread_sensitive=False,
+            )(
+                viewset, read_action, request, kwargs,
+            )
+        except (exceptions.APIException, Http404) as exc:
+            return error_response(exc)
+
+        response = JsonResponse(
+            data,
+            encoder=JSONEncoder,
+            safe=False,
+            json_dumps_params={'separators': (',', ':')},
+        )
+        for header, value in headers.items():
+            response[header] = value
+
+        return response
+
+    view.__name__ = f'{viewset.__name__}_{read_action}'
+    view.cls = viewset
+    view.actions = actions
+    view.initkwargs = drf_view.initkwargs
+    # DRF views are exempt, token authentication needs no CSRF protection
+    view.csrf_exempt = True
+    return view
+
+
+recipe_list = async_read_view(
+    views.RecipeViewSet,
+    {'get': 'list', 'post': 'create'},
+)
+recipe_detail = async_read_view(
+    views.RecipeViewSet,
+    {
+        'get': 'retrieve',
+        'put': 'update',
+        'patch': 'partial_update',
+        'delete': 'destroy',
+    },
+)
+tag_list = async_read_view(views.TagViewSet, {'get': 'list'})
+ingredient_list = async_read_view(views.IngredientViewSet, {'get': 'list'})
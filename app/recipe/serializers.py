@@ -1,8 +1,50 @@
 """Serializes for recipe APIs"""
 
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+
 from rest_framework import serializers
 
-from core.models import Recipe, Tag, Ingredient
+from core import jobs
+from core.image_metadata import (
+    METADATA_FIELDS,
+    image_metadata,
+    known_image_metadata,
+)
+from core.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    Tag,
+    UploadSession,
+)
+from core.storage import UPLOAD_EXTENSIONS, load_confirm
+
+
+def validate_upload_size(value):
+    """Check an image is within the upload limit"""
+    if value > settings.MEDIA_UPLOAD_MAX_BYTES:
+        raise serializers.ValidationError(
+            f'Images are limited to {settings.MEDIA_UPLOAD_MAX_BYTES} bytes.'
+        )
+    return value
+
+
+class LinkedListSerializer(serializers.ListSerializer):
+    """Tags or ingredients of a recipe, from its prefetched links if any.
+
+    recipe.views.link_prefetches names the user of the links, which the
+    prefetch of a many to many field cannot.
+    """
+
+    def get_attribute(self, instance):
+        model_name = self.child.Meta.model._meta.model_name
+        links = getattr(instance, f'{model_name}_links', None)
+        if links is None:
+            return super().get_attribute(instance)
+        return [getattr(link, model_name) for link in links]
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -12,6 +54,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         model = Ingredient
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = LinkedListSerializer
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -21,6 +64,7 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ['name', 'id']
         read_only_fields = ['id']
+        list_serializer_class = LinkedListSerializer
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -30,28 +74,42 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients']
-        read_only_fields = ['id']
+        fields = [
+            'id', 'title', 'time_minutes', 'price', 'link', 'tags',
+            'ingredients', *METADATA_FIELDS,
+        ]
+        read_only_fields = ['id', *METADATA_FIELDS]
 
     def _get_or_create_tags(self, tags, recipe):
         """"Handle getting or creating tags as needed"""
         auth_user = self.context['request'].user
+        links = []
         for tag in tags:
             tag_obj, created = Tag.objects.get_or_create(
                 user=auth_user,
                 **tag,
             )
-            recipe.tags.add(tag_obj)
+            links.append(
+                RecipeTag(recipe=recipe, tag=tag_obj, user_id=recipe.user_id)
+            )
+        # Links already there are kept, like recipe.tags.add() does
+        RecipeTag.objects.bulk_create(links, ignore_conflicts=True)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating ingredients as needed"""
         auth_user = self.context['request'].user
+        links = []
         for ingredient in ingredients:
             ingredient_obj, created = Ingredient.objects.get_or_create(
                 user=auth_user,
                 **ingredient,
             )
-            recipe.ingredients.add(ingredient_obj)
+            links.append(RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredient_obj,
+                user_id=recipe.user_id,
+            ))
+        RecipeIngredient.objects.bulk_create(links, ignore_conflicts=True)
 
     def create(self, validated_data):
         tags = validated_data.pop('tags', [])
@@ -66,12 +124,20 @@ class RecipeSerializer(serializers.ModelSerializer):
         """Update a recipe"""
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
+        # The links are deleted by user and recipe, not by recipe alone like
+        # recipe.tags.clear(), to read one partition of a partitioned table
         if ingredients is not None:
-            instance.ingredients.clear()
+            RecipeIngredient.objects.filter(
+                recipe=instance,
+                user_id=instance.user_id,
+            ).delete()
             self._get_or_create_ingredients(ingredients, instance)
 
         if tags is not None:
-            instance.tags.clear()
+            RecipeTag.objects.filter(
+                recipe=instance,
+                user_id=instance.user_id,
+            ).delete()
             self._get_or_create_tags(tags, instance)
 
         for attr, value in validated_data.items():
@@ -96,3 +162,139 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required': 'True'}}
+
+    def update(self, instance, validated_data):
+        """Attach the image with its metadata"""
+        for field, value in image_metadata(validated_data['image']).items():
+            setattr(instance, field, value)
+        return super().update(instance, validated_data)
+
+
+class RecipeImageNameSerializer(serializers.ModelSerializer):
+    """Serializer for confirming an image uploaded directly to storage.
+
+    The confirm token upload-url returned names the file, for the user and
+    the recipe it was issued to: a name alone would let anyone knowing the
+    hash of an image attach it, then read it. The image is not read here,
+    unless another recipe has its metadata a job reads it and detaches the
+    file if it is not an image.
+    """
+    confirm = serializers.CharField(write_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = ['id', 'confirm', 'image']
+        read_only_fields = ['id', 'image']
+
+    def validate_confirm(self, value):
+        """Check the token and that the upload reached the storage"""
+        try:
+            confirm = load_confirm(
+                value,
+                self.context['request'].user.pk,
+                self.instance.pk,
+            )
+        except signing.BadSignature:
+            raise serializers.ValidationError(
+                'Invalid or expired confirmation, request an upload URL '
+                'again.'
+            )
+
+        name = confirm['name']
+        written_after = confirm['written_after']
+        uploaded = default_storage.exists(name) and (
+            written_after is None
+            or default_storage.get_modified_time(name).timestamp()
+            >= written_after
+        )
+        if not uploaded:
+            raise serializers.ValidationError(
+                'Nothing was uploaded under this name.'
+            )
+        return name
+
+    def validate(self, attrs):
+        """Copy the metadata of the image if it is known already"""
+        attrs['name'] = attrs.pop('confirm')
+        attrs['metadata'] = known_image_metadata(attrs['name'])
+        return attrs
+
+    def update(self, instance, validated_data):
+        name = validated_data['name']
+        metadata = validated_data['metadata']
+        instance.image = name
+        for field in METADATA_FIELDS:
+            if metadata is None:
+                # Left empty until the job reads the image
+                value = instance._meta.get_field(field).get_default()
+            else:
+                value = metadata[field]
+            setattr(instance, field, value)
+        instance.save(update_fields=['image', *METADATA_FIELDS])
+        if metadata is None:
+            jobs.enqueue(
+                'record_image_metadata',
+                recipe_id=instance.pk,
+                image=name,
+            )
+        return instance
+
+
+class RecipeUploadUrlSerializer(serializers.Serializer):
+    """Serializer for requesting a direct upload of an image"""
+    sha256 = serializers.RegexField(r'^[0-9a-f]{64}$')
+    size = serializers.IntegerField(min_value=1)
+    content_type = serializers.ChoiceField(choices=sorted(UPLOAD_EXTENSIONS))
+
+    def validate_size(self, value):
+        """Check the image is within the upload limit"""
+        return validate_upload_size(value)
+
+
+class UploadRequestSerializer(serializers.Serializer):
+    """Serializer for the request a client sends to upload a file"""
+    method = serializers.CharField()
+    url = serializers.URLField()
+    headers = serializers.DictField(child=serializers.CharField())
+
+
+class RecipeUploadSerializer(serializers.Serializer):
+    """Serializer for a granted direct upload.
+
+    upload is null when the user's recipes already use the file, which
+    can be confirmed right away. confirm is the token attaching it to the
+    recipe with upload-image.
+    """
+    name = serializers.CharField()
+    exists = serializers.BooleanField()
+    upload = UploadRequestSerializer(allow_null=True)
+    confirm = serializers.CharField()
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for deleting many recipes at once"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=1000,
+    )
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for resumable uploads of recipe images"""
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'recipe', 'size', 'offset', 'created_at']
+        read_only_fields = ['id', 'offset', 'created_at']
+        extra_kwargs = {'size': {'min_value': 1}}
+
+    def validate_recipe(self, value):
+        """Check the recipe belongs to the user"""
+        if value.user != self.context['request'].user:
+            raise serializers.ValidationError('Recipe not found.')
+        return value
+
+    def validate_size(self, value):
+        """Check the image is within the upload limit"""
+        return validate_upload_size(value)
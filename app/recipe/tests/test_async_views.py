@@ -0,0 +1,134 @@
+"""
+Test the async read views used by the ASGI deployment
+"""
+import json
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncRequestFactory, TransactionTestCase
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, Tag
+from recipe import async_views
+from recipe.serializers import (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    TagSerializer,
+)
+
+
+def create_recipe(user, **kwargs):
+    """Create and return a sample recipe"""
+    defaults = {
+        'title': 'Async recipe',
+        'time_minutes': 12,
+        'price': Decimal('4.20'),
+    }
+    defaults.update(kwargs)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class AsyncReadViewsTests(TransactionTestCase):
+    """Test serving reads from async views.
+
+    Reads run on threads of their own, which only see committed rows.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'async@example.com',
+            'testpass123',
+        )
+        self.other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = create_recipe(self.user)
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Fast'))
+        self.other_recipe = create_recipe(self.other_user)
+        self.factory = AsyncRequestFactory()
+        self.auth = {'authorization': f'Token {self.token.key}'}
+
+        self.expected_list = json.loads(json.dumps(
+            RecipeSerializer([self.recipe], many=True).data
+        ))
+        self.expected_detail = json.loads(json.dumps(
+            RecipeDetailSerializer(self.recipe).data
+        ))
+        self.expected_tags = json.loads(json.dumps(
+            TagSerializer(Tag.objects.filter(user=self.user), many=True).data
+        ))
+
+    async def test_recipe_list(self):
+        """Test listing only the user's recipes"""
+        request = self.factory.get('/api/recipe/recipes/', **self.auth)
+
+        res = await async_views.recipe_list(request)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(res.content), self.expected_list)
+
+    async def test_recipe_detail(self):
+        """Test retrieving a recipe"""
+        request = self.factory.get('/api/recipe/recipes/', **self.auth)
+
+        res = await async_views.recipe_detail(request, pk=self.recipe.id)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(res.content), self.expected_detail)
+
+    async def test_other_users_recipe_not_found(self):
+        """Test another user's recipe is not found"""
+        request = self.factory.get('/api/recipe/recipes/', **self.auth)
+
+        res = await async_views.recipe_detail(
+            request,
+            pk=self.other_recipe.id,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_tag_list(self):
+        """Test listing tags"""
+        request = self.factory.get('/api/recipe/tags/', **self.auth)
+
+        res = await async_views.tag_list(request)
+
+        self.assertEqual(json.loads(res.content), self.expected_tags)
+
+    async def test_auth_required(self):
+        """Test reads require a token"""
+        request = self.factory.get('/api/recipe/recipes/')
+
+        res = await async_views.recipe_list(request)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    async def test_invalid_token_rejected(self):
+        """Test an invalid token is rejected"""
+        request = self.factory.get(
+            '/api/recipe/recipes/',
+            authorization='Token invalid',
+        )
+
+        res = await async_views.recipe_list(request)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_writes_handled_by_viewset(self):
+        """Test methods other than GET are handed to the viewset"""
+        request = self.factory.post(
+            '/api/recipe/recipes/',
+            {'title': 'Created', 'time_minutes': 3, 'price': '1.00'},
+            content_type='application/json',
+            **self.auth,
+        )
+
+        res = await async_views.recipe_list(request)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['title'], 'Created')
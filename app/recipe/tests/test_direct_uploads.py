@@ -0,0 +1,307 @@
+"""
+Tests for uploading recipe images directly to storage
+"""
+import hashlib
+import io
+import os
+import tempfile
+import time
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job, Recipe
+from core.storage import sign_confirm, upload_name
+
+
+def jpeg_bytes():
+    """Return the bytes of a small JPEG image"""
+    content = io.BytesIO()
+    Image.new('RGB', (20, 10), 'blue').save(content, format='JPEG')
+    return content.getvalue()
+
+
+CONTENT = jpeg_bytes()
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+def upload_url_url(recipe_id):
+    """Create and return the URL requesting a direct upload"""
+    return reverse('recipe:recipe-upload-url', args=[recipe_id])
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+class DirectUploadTests(TestCase):
+    """Test requesting, sending and confirming direct uploads"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media_settings = override_settings(MEDIA_ROOT=media_root.name)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'direct@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Direct',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+
+    def request_upload(self, content=CONTENT, **kwargs):
+        payload = {
+            'sha256': hashlib.sha256(content).hexdigest(),
+            'size': len(content),
+            'content_type': 'image/jpeg',
+        }
+        payload.update(kwargs)
+        return self.client.post(
+            upload_url_url(self.recipe.id),
+            payload,
+            format='json',
+        )
+
+    def confirm(self, token, recipe=None):
+        return self.client.post(
+            image_upload_url((recipe or self.recipe).id),
+            {'confirm': token},
+            format='json',
+        )
+
+    def run_jobs(self):
+        while jobs.run_next() is not None:
+            pass
+
+    def put(self, url, content):
+        return APIClient().put(
+            urlsplit(url).path,
+            content,
+            content_type='image/jpeg',
+        )
+
+    def test_upload_and_confirm(self):
+        """Test an image is uploaded to the signed URL then confirmed"""
+        granted = self.request_upload()
+        upload = granted.data['upload']
+
+        stored = self.put(upload['url'], CONTENT)
+        confirmed = self.confirm(granted.data['confirm'])
+
+        self.assertEqual(granted.status_code, status.HTTP_200_OK)
+        self.assertFalse(granted.data['exists'])
+        self.assertEqual(upload['method'], 'PUT')
+        self.assertTrue(upload['url'].startswith('http://testserver/'))
+        self.assertEqual(stored.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(stored.data['name'], granted.data['name'])
+        self.assertEqual(confirmed.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.image.name,
+            upload_name(DIGEST, 'image/jpeg'),
+        )
+        with self.recipe.image.open('rb') as image_file:
+            self.assertEqual(image_file.read(), CONTENT)
+        self.assertEqual(confirmed.data['id'], self.recipe.id)
+        # Read by a job, the request never reads the stored image
+        self.assertIsNone(self.recipe.image_width)
+
+        self.run_jobs()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_width, 20)
+        self.assertEqual(self.recipe.image_height, 10)
+        self.assertEqual(self.recipe.image_size, len(CONTENT))
+
+    def test_confirmed_non_image_detached(self):
+        """Test uploads that are not images are detached by the job"""
+        content = b'\xff\xd8\xff not an image'
+        granted = self.request_upload(content)
+        self.put(granted.data['upload']['url'], content)
+
+        res = self.confirm(granted.data['confirm'])
+        self.run_jobs()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_own_content_needs_no_upload(self):
+        """Test no upload is granted for bytes the user's recipes use"""
+        granted = self.request_upload()
+        self.put(granted.data['upload']['url'], CONTENT)
+        self.confirm(granted.data['confirm'])
+        path = default_storage.path(granted.data['name'])
+        os.utime(path, (0, 0))
+
+        res = self.request_upload()
+        confirmed = self.confirm(res.data['confirm'])
+
+        self.assertTrue(res.data['exists'])
+        self.assertIsNone(res.data['upload'])
+        self.assertGreater(os.path.getmtime(path), time.time() - 60)
+        self.assertEqual(confirmed.status_code, status.HTTP_200_OK)
+
+    def test_known_metadata_copied(self):
+        """Test the metadata of an image a recipe has is copied at once"""
+        granted = self.request_upload()
+        self.put(granted.data['upload']['url'], CONTENT)
+        self.confirm(granted.data['confirm'])
+        self.run_jobs()
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Same image',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+
+        self.confirm(self.request_upload().data['confirm'])
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_width, 20)
+        self.assertFalse(Job.objects.filter(status=Job.QUEUED).exists())
+
+    def test_other_users_content_uploaded_again(self):
+        """Test the hash of another user's image does not attach it"""
+        name = default_storage.save('uploads/recipe/other.jpg', io.BytesIO(
+            CONTENT,
+        ))
+        os.utime(default_storage.path(name), (0, 0))
+
+        granted = self.request_upload()
+        skipped = self.confirm(granted.data['confirm'])
+        self.put(granted.data['upload']['url'], CONTENT)
+        uploaded = self.confirm(granted.data['confirm'])
+
+        self.assertEqual(granted.data['name'], name)
+        self.assertFalse(granted.data['exists'])
+        self.assertEqual(skipped.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(uploaded.status_code, status.HTTP_200_OK)
+
+    def test_other_bytes_rejected(self):
+        """Test a body not matching the signed hash is not stored"""
+        url = self.request_upload().data['upload']['url']
+
+        res = self.put(url, CONTENT[:-1] + b'!')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(
+            default_storage.exists(upload_name(DIGEST, 'image/jpeg'))
+        )
+
+    def test_larger_body_rejected(self):
+        """Test a body over the signed size is refused"""
+        url = self.request_upload().data['upload']['url']
+
+        res = self.put(url, CONTENT * 2)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_token_rejected(self):
+        """Test uploads need a valid signed URL"""
+        url = self.request_upload().data['upload']['url']
+
+        res = self.put(url.replace('/uploads/', '/uploads/x'), CONTENT)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_expired_token_rejected(self):
+        """Test signed URLs expire"""
+        url = self.request_upload().data['upload']['url']
+
+        with override_settings(MEDIA_UPLOAD_URL_EXPIRES=-1):
+            res = self.put(url, CONTENT)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(MEDIA_UPLOAD_MAX_BYTES=4)
+    def test_size_limited(self):
+        """Test uploads over the size limit are not granted"""
+        res = self.request_upload()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('size', res.data)
+
+    def test_confirm_requires_upload(self):
+        """Test an upload must reach the storage before it is confirmed"""
+        res = self.confirm(self.request_upload().data['confirm'])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_confirm_bound_to_recipe(self):
+        """Test a confirmation only attaches to the recipe it was issued to"""
+        granted = self.request_upload()
+        self.put(granted.data['upload']['url'], CONTENT)
+        other_recipe = Recipe.objects.create(
+            user=self.user,
+            title='Other',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+
+        moved = self.confirm(granted.data['confirm'], other_recipe)
+        forged = self.confirm(sign_confirm(
+            self.user.id + 1, self.recipe.id, granted.data['name'],
+        ))
+        garbled = self.confirm('not-a-token')
+
+        for res in (moved, forged, garbled):
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('confirm', res.data)
+
+    @override_settings(MEDIA_UPLOAD_CONFIRM_EXPIRES=-1)
+    def test_confirm_expires(self):
+        """Test confirmations expire"""
+        granted = self.request_upload()
+        self.put(granted.data['upload']['url'], CONTENT)
+
+        res = self.confirm(granted.data['confirm'])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_recipe(self):
+        """Test uploads are only granted for the user's recipes"""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.recipe.user = other
+        self.recipe.save()
+
+        res = self.request_upload()
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(MEDIA_STORAGE='s3')
+    def test_object_storage_reads_redirected(self):
+        """Test images in object storage are read from storage URLs"""
+        self.put(self.request_upload().data['upload']['url'], CONTENT)
+        name = upload_name(DIGEST, 'image/jpeg')
+        self.recipe.image = name
+        self.recipe.save()
+
+        res = self.client.get(reverse('recipe:recipe-image', args=[name]))
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(res['Location'], default_storage.url(name))
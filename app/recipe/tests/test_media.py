@@ -0,0 +1,109 @@
+"""
+Tests for serving recipe images to their owner
+"""
+import tempfile
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+def image_url(name):
+    """Create and return the URL of a recipe image"""
+    return reverse('recipe:recipe-image', args=[name])
+
+
+def jpeg_file():
+    """Return a temporary file holding a small JPEG"""
+    image_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+    Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+    image_file.seek(0)
+    return image_file
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeImageViewTests(TestCase):
+    """Test the protected media endpoint"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'owner@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Pictured',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        with jpeg_file() as image_file:
+            self.client.post(
+                reverse('recipe:recipe-upload-image', args=[self.recipe.id]),
+                {'image': image_file},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+        self.addCleanup(self.recipe.image.delete)
+
+    def test_upload_returns_protected_url(self):
+        """Test recipe image URLs point at the media endpoint"""
+        res = self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]),
+        )
+
+        self.assertEqual(
+            urlsplit(res.data['image']).path,
+            image_url(self.recipe.image.name),
+        )
+
+    def test_owner_redirected_to_nginx(self):
+        """Test the owner gets an empty response nginx fills in"""
+        res = self.client.get(image_url(self.recipe.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['X-Accel-Redirect'],
+            f'/protected-media/{self.recipe.image.name}',
+        )
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res.content, b'')
+
+    def test_other_user_not_found(self):
+        """Test images of other users' recipes are not served"""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(image_url(self.recipe.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('X-Accel-Redirect', res)
+
+    def test_auth_required(self):
+        """Test anonymous requests are rejected"""
+        res = APIClient().get(image_url(self.recipe.image.name))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='')
+    def test_streamed_without_nginx(self):
+        """Test the file is streamed with immutable caching without nginx"""
+        res = self.client.get(image_url(self.recipe.image.name))
+
+        with self.recipe.image.open('rb') as image_file:
+            self.assertEqual(b''.join(res.streaming_content), image_file.read())
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('private', res['Cache-Control'])
@@ -213,6 +213,34 @@ class PrivateRecipeAPITest(TestCase):
         self.assertEqual(result.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
 
+    def test_bulk_delete_recipes(self):
+        """Test recipes deleted in bulk are hidden until purged"""
+        recipes = [create_recipe(user=self.user) for _ in range(3)]
+        other_user = create_user(email='user3@user3.pl', password='0987654321')
+        other_recipe = create_recipe(user=other_user)
+        ids = [recipes[0].id, recipes[1].id, other_recipe.id]
+
+        result = self.client.post(
+            reverse('recipe:recipe-bulk-delete'),
+            {'ids': ids},
+            format='json',
+        )
+        listed = self.client.get(RECIPES_URL)
+        progress = self.client.get(
+            reverse('recipe:deletiontask-detail', args=[result.data['id']]),
+        )
+
+        self.assertEqual(result.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(result.data['total'], 2)
+        self.assertEqual([r['id'] for r in listed.data], [recipes[2].id])
+        self.assertEqual(
+            self.client.get(detail_recipe(recipes[0].id)).status_code,
+            status.HTTP_404_NOT_FOUND,
+        )
+        self.assertEqual(progress.data['status'], 'pending')
+        other_recipe.refresh_from_db()
+        self.assertIsNone(other_recipe.deletion)
+
     def test_recipe_other_users_recipe_error(self):
         """test trying to delete another users  recipe -  gives ERROR"""
         new_user = create_user(email='user2@user2.pl', password='0987654321')
@@ -298,6 +326,10 @@ class PrivateRecipeAPITest(TestCase):
         self.assertEqual(result.status_code, status.HTTP_200_OK)
         self.assertIn(tag_lunch, recipe.tags.all())
         self.assertNotIn(tag_dinner, recipe.tags.all())
+        self.assertEqual(
+            [tag['name'] for tag in result.data['tags']],
+            ['lunch'],
+        )
 
     def test_clear_recipe_tags(self):
         """"test clearing a recipe tags"""
@@ -476,6 +508,24 @@ class ImageUploadTest(TestCase):
             self.assertIn('image', result.data)
             self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_records_metadata(self):
+        """Test the image metadata is recorded and listed with the recipe"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new('RGB', (40, 30), 'white')
+            img.save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(url, {'image': image_file}, format='multipart')
+
+        res = self.client.get(RECIPES_URL)
+
+        recipe = res.data[0]
+        self.assertEqual(recipe['image_width'], 40)
+        self.assertEqual(recipe['image_height'], 30)
+        self.assertGreater(recipe['image_size'], 0)
+        self.assertEqual(recipe['image_color'], '#ffffff')
+        self.assertEqual(len(recipe['image_placeholder']), 28)
+
     def test_upload_image_bad_request(self):
         """Test uploading invalid image"""
         url = image_upload_url(self.recipe.id)
@@ -0,0 +1,225 @@
+"""
+Tests for the per user rate limits of the recipe APIs
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    AsyncRequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.checks import check_atomic_cache
+from core.models import Recipe
+from recipe import async_views
+from recipe.throttles import ActionRateThrottle
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+RATES = {
+    'api_read': '2/min',
+    'api_write': '1/min',
+    'api_upload': '1/min',
+}
+NOW = 6000.0
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL"""
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+@patch.object(ActionRateThrottle, 'THROTTLE_RATES', RATES)
+@patch.object(ActionRateThrottle, 'timer', return_value=NOW)
+class ActionRateThrottleTests(TestCase):
+    """Test the read, write and upload budgets of each user"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_payload(self):
+        return {'title': 'Limited', 'time_minutes': 5, 'price': '2.00'}
+
+    def test_reads_limited(self, timer):
+        """Test reads over the budget get a 429 with Retry-After"""
+        first = self.client.get(RECIPES_URL)
+        second = self.client.get(RECIPES_URL)
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['RateLimit-Limit'], '2')
+        self.assertEqual(first['RateLimit-Remaining'], '1')
+        self.assertEqual(first['RateLimit-Reset'], '60')
+        self.assertEqual(first['RateLimit-Policy'], '2;w=60')
+        self.assertEqual(second['RateLimit-Remaining'], '0')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '60')
+        self.assertEqual(res['RateLimit-Remaining'], '0')
+
+    def test_budgets_are_separate(self, timer):
+        """Test reads, writes and uploads are counted apart"""
+        recipe = Recipe.objects.create(
+            user=self.user,
+            title='Upload',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        for _ in range(3):
+            self.client.get(RECIPES_URL)
+
+        created = self.client.post(RECIPES_URL, self.create_payload())
+        upload = self.client.post(
+            image_upload_url(recipe.id),
+            {'image': 'notimage'},
+            format='multipart',
+        )
+        write = self.client.post(RECIPES_URL, self.create_payload())
+
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(upload.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(upload['RateLimit-Limit'], '1')
+        self.assertEqual(
+            write.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    def test_users_limited_separately(self, timer):
+        """Test one user's requests leave other users' budgets alone"""
+        for _ in range(3):
+            self.client.get(TAGS_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+
+        res = client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['RateLimit-Remaining'], '1')
+
+    def test_budget_restored_next_window(self, timer):
+        """Test a new window starts with the full budget"""
+        for _ in range(3):
+            self.client.get(RECIPES_URL)
+        timer.return_value = NOW + 60
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['RateLimit-Remaining'], '1')
+
+    def test_one_cache_call_per_request(self, timer):
+        """Test a request within a started window only increments"""
+        self.client.get(RECIPES_URL)
+
+        with patch.object(cache, 'add') as add, \
+                patch.object(cache, 'incr', return_value=2) as incr:
+            self.client.get(RECIPES_URL)
+
+        incr.assert_called_once()
+        add.assert_not_called()
+
+    def test_long_window_keeps_expiry(self, timer):
+        """Test increments keep the expiry of windows over five minutes"""
+        hourly = patch.object(
+            ActionRateThrottle, 'THROTTLE_RATES', {'api_read': '2/hour'},
+        )
+        with hourly, patch.object(cache, 'touch', wraps=cache.touch) as touch:
+            for _ in range(3):
+                res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # The database cache rewrites counters with its default timeout
+        touch.assert_called_with(touch.call_args[0][0], 1200)
+
+    def test_counter_lookups_recorded(self, timer):
+        """Test the hit ratio counts a window's first request as a miss"""
+        with patch('recipe.throttles.record_cache') as record_cache:
+            self.client.get(RECIPES_URL)
+            self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            [call.kwargs['hit'] for call in record_cache.call_args_list],
+            [False, True],
+        )
+        record_cache.assert_called_with('throttle_api_read', hit=True)
+
+    def test_unauthenticated_not_counted(self, timer):
+        """Test anonymous requests are rejected before throttling"""
+        self.client.force_authenticate(None)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('RateLimit-Limit', res)
+
+
+@patch.object(ActionRateThrottle, 'THROTTLE_RATES', RATES)
+@patch.object(ActionRateThrottle, 'timer', return_value=NOW)
+class AsyncActionRateThrottleTests(TransactionTestCase):
+    """Test the async read views, whose threads only see committed rows"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+
+    async def test_async_reads_limited(self, timer):
+        """Test the async read views share the read budget"""
+        factory = AsyncRequestFactory()
+        auth = {'authorization': f'Token {self.token.key}'}
+
+        first = await async_views.recipe_list(
+            factory.get(RECIPES_URL, **auth),
+        )
+        await async_views.recipe_list(factory.get(RECIPES_URL, **auth))
+        res = await async_views.recipe_list(factory.get(RECIPES_URL, **auth))
+
+        self.assertEqual(first['RateLimit-Remaining'], '1')
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res['Retry-After'], '60')
+
+
+class AtomicCacheCheckTests(SimpleTestCase):
+    """Test the deployment check of the cache the throttles count in"""
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache',
+    }})
+    def test_database_cache_warned(self):
+        """Test a cache incrementing with a read and a write is reported"""
+        warnings = check_atomic_cache(None)
+
+        self.assertEqual([warning.id for warning in warnings], ['core.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_atomic_cache_accepted(self):
+        """Test a cache with its own atomic increment passes"""
+        self.assertEqual(check_atomic_cache(None), [])
@@ -0,0 +1,221 @@
+"""
+Tests for resumable uploads of recipe images
+"""
+import io
+import os
+import tempfile
+from decimal import Decimal
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import uploads
+from core.models import Recipe, UploadSession
+
+
+SESSIONS_URL = reverse('recipe:uploadsession-list')
+CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+
+
+def session_url(session_id):
+    """Create and return the URL of an upload session"""
+    return reverse('recipe:uploadsession-detail', args=[session_id])
+
+
+def finalize_url(session_id):
+    """Create and return the URL finalizing an upload session"""
+    return reverse('recipe:uploadsession-finalize', args=[session_id])
+
+
+def png_bytes():
+    """Return the bytes of a small PNG image"""
+    content = io.BytesIO()
+    Image.new('RGB', (10, 10), 'red').save(content, format='PNG')
+    return content.getvalue()
+
+
+class UploadSessionTests(TestCase):
+    """Test uploading recipe images in resumable chunks"""
+
+    def setUp(self):
+        for name in ('MEDIA_ROOT', 'MEDIA_UPLOAD_SESSION_ROOT'):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            directory_settings = override_settings(**{name: directory.name})
+            directory_settings.enable()
+            self.addCleanup(directory_settings.disable)
+
+        self.user = get_user_model().objects.create_user(
+            'resumable@example.com',
+            'testpass123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Resumable',
+            time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        self.content = png_bytes()
+
+    def create_session(self, size=None):
+        return self.client.post(
+            SESSIONS_URL,
+            {'recipe': self.recipe.id, 'size': size or len(self.content)},
+            format='json',
+        )
+
+    def send(self, session_id, offset, chunk, **extra):
+        extra.setdefault('content_type', CHUNK_CONTENT_TYPE)
+        return self.client.patch(
+            session_url(session_id),
+            chunk,
+            HTTP_UPLOAD_OFFSET=str(offset),
+            **extra,
+        )
+
+    def test_resumable_upload(self):
+        """Test an image sent in chunks is attached when finalized"""
+        created = self.create_session()
+        session_id = created.data['id']
+        middle = len(self.content) // 2
+
+        first = self.send(session_id, 0, self.content[:middle])
+        progress = self.client.head(session_url(session_id))
+        second = self.send(session_id, middle, self.content[middle:])
+        finalized = self.client.post(finalize_url(session_id))
+
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(created['Location'], session_url(session_id))
+        self.assertEqual(created['Upload-Offset'], '0')
+        self.assertEqual(first.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(progress['Upload-Offset'], str(middle))
+        self.assertEqual(progress['Cache-Control'], 'no-store')
+        self.assertEqual(second['Upload-Offset'], str(len(self.content)))
+        self.assertEqual(finalized.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.png'))
+        self.assertEqual(self.recipe.image_width, 10)
+        self.assertEqual(self.recipe.image_color, '#ff0000')
+        with self.recipe.image.open('rb') as image_file:
+            self.assertEqual(image_file.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_offset_mismatch(self):
+        """Test a chunk not continuing the received bytes is refused"""
+        session_id = self.create_session().data['id']
+        self.send(session_id, 0, self.content[:10])
+
+        res = self.send(session_id, 0, self.content[:10])
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res['Upload-Offset'], '10')
+
+    def test_chunk_past_length(self):
+        """Test a chunk ending past the upload length is refused"""
+        session_id = self.create_session(size=4).data['id']
+
+        res = self.send(session_id, 0, self.content[:10])
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+        self.assertEqual(res['Upload-Offset'], '0')
+
+    def test_chunk_content_type(self):
+        """Test chunks must be sent as offset octet streams"""
+        session_id = self.create_session().data['id']
+
+        res = self.send(
+            session_id, 0, self.content,
+            content_type='application/octet-stream',
+        )
+
+        self.assertEqual(
+            res.status_code,
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        )
+
+    def test_finalize_incomplete(self):
+        """Test a session cannot be finalized before all bytes arrived"""
+        session_id = self.create_session().data['id']
+        self.send(session_id, 0, self.content[:10])
+
+        res = self.client.post(finalize_url(session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_finalize_not_an_image(self):
+        """Test bytes that are not an image are not attached"""
+        session_id = self.create_session(size=9).data['id']
+        self.send(session_id, 0, b'not image')
+
+        res = self.client.post(finalize_url(session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    @override_settings(MEDIA_UPLOAD_MAX_BYTES=4)
+    def test_size_limited(self):
+        """Test sessions over the size limit are not created"""
+        res = self.create_session()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('size', res.data)
+
+    def test_other_users_recipe(self):
+        """Test sessions are only created for the user's recipes"""
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        self.recipe.user = other
+        self.recipe.save()
+
+        res = self.create_session()
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('recipe', res.data)
+
+    def test_other_users_session(self):
+        """Test sessions are private to the user who created them"""
+        session_id = self.create_session().data['id']
+        other = APIClient()
+        other.force_authenticate(get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        ))
+
+        res = other.patch(
+            session_url(session_id),
+            self.content,
+            content_type=CHUNK_CONTENT_TYPE,
+            HTTP_UPLOAD_OFFSET='0',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_abandon_session(self):
+        """Test deleting a session deletes its received chunks"""
+        session_id = self.create_session().data['id']
+        self.send(session_id, 0, self.content[:10])
+        path = uploads.session_path(
+            UploadSession.objects.get(pk=session_id),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.delete(session_url(session_id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,111 @@
+"""
+Per user rate limits for the recipe API endpoints
+"""
+import math
+
+from django.core.cache.backends.base import BaseCache
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.metrics import record_cache
+
+
+def atomic_increments(cache):
+    """Return if a cache increments counters in one atomic operation.
+
+    BaseCache.incr reads then writes the value, with the default timeout,
+    as the database and file caches do.
+    """
+    # Bound through the cache proxy, the method of the backend in use
+    return getattr(cache.incr, '__func__', None) is not BaseCache.incr
+
+
+class ActionRateThrottle(SimpleRateThrottle):
+    """Limit the requests of one user to each budget of a viewset.
+
+    Reads, writes and custom actions named in view.throttle_budgets each
+    get the rate of 'api_<budget>' in DEFAULT_THROTTLE_RATES. A counter per
+    user and budget is kept in the shared cache for fixed windows of the
+    rate's duration, so checking a request costs a single cache increment.
+    """
+    cache_format = 'throttle_api_%(scope)s_%(ident)s_%(window)s'
+
+    def __init__(self):
+        # The rate depends on the action, it is resolved in allow_request
+        pass
+
+    def get_budget(self, request, view):
+        """Return the budget a request is counted against"""
+        budgets = getattr(view, 'throttle_budgets', {})
+        action = getattr(view, 'action', None)
+        if action in budgets:
+            return budgets[action]
+
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def increment(self, key, timeout):
+        """Count a request in a window and return the window's count.
+
+        The key expires with the window, timeout seconds from now.
+        """
+        try:
+            count = self.cache.incr(key)
+        except ValueError:
+            # First request of the window
+            record_cache(f'throttle_{self.scope}', hit=False)
+            if self.cache.add(key, 1, timeout):
+                return 1
+            count = self.cache.incr(key)
+        else:
+            record_cache(f'throttle_{self.scope}', hit=True)
+
+        if not atomic_increments(self.cache):
+            # Its write set the default timeout, shorter than long windows
+            self.cache.touch(key, timeout)
+        return count
+
+    def allow_request(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return True
+
+        self.scope = f'api_{self.get_budget(request, view)}'
+        if self.scope not in self.THROTTLE_RATES:
+            return True
+
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        now = self.timer()
+        window = int(now // self.duration)
+        self.reset = (window + 1) * self.duration - now
+
+        count = self.increment(self.cache_format % {
+            'scope': self.scope,
+            'ident': request.user.pk,
+            'window': window,
+        }, math.ceil(self.reset))
+        request.rate_limit = {
+            'RateLimit-Limit': str(self.num_requests),
+            'RateLimit-Remaining': str(max(self.num_requests - count, 0)),
+            'RateLimit-Reset': str(max(int(self.reset + 0.5), 1)),
+            'RateLimit-Policy': f'{self.num_requests};w={self.duration}',
+        }
+        return count <= self.num_requests
+
+    def wait(self):
+        return self.reset
+
+
+class RateLimitHeadersMixin:
+    """Add the rate limit headers of the throttled budget to responses"""
+    throttle_classes = [ActionRateThrottle]
+    throttle_budgets = {}
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        for header, value in getattr(request, 'rate_limit', {}).items():
+            response[header] = value
+
+        return response
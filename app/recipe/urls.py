@@ -1,7 +1,9 @@
 """"URL mappings for the recipe app"""
 
+from django.conf import settings
 from django.urls import (
     path,
+    re_path,
     include
 )
 
@@ -16,9 +18,33 @@ router.register('recipes', views.RecipeViewSet)
 # - > Recipe view has auto generated URL, which depends on functionality in viewset
 router.register('tags', views.TagViewSet)
 router.register('ingredients', views.IngredientViewSet)
+router.register('upload-sessions', views.UploadSessionViewSet)
+router.register('deletions', views.DeletionTaskViewSet)
 
 app_name = "recipe"
 
 urlpatterns = [
     path('', include(router.urls)),
+    path(
+        'media/<path:name>',
+        views.RecipeImageView.as_view(),
+        name='recipe-image',
+    ),
+    path(
+        'uploads/<str:token>/',
+        views.DirectUploadView.as_view(),
+        name='direct-upload',
+    ),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    # Matched before the router, the async views hand anything but GET
+    # back to the viewsets
+    from recipe import async_views
+
+    urlpatterns = [
+        path('recipes/', async_views.recipe_list),
+        re_path(r'^recipes/(?P<pk>[0-9]+)/$', async_views.recipe_detail),
+        path('tags/', async_views.tag_list),
+        path('ingredients/', async_views.ingredient_list),
+    ] + urlpatterns
@@ -1,4 +1,7 @@
 """Views for the recipe APIs"""
+import mimetypes
+import tempfile
+import time
 
 from drf_spectacular.utils import (
     extend_schema_view,
@@ -7,6 +10,20 @@ from drf_spectacular.utils import (
     OpenApiTypes,
 )
 
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import Prefetch
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+)
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+
 from rest_framework import (
     viewsets,
     mixins,
@@ -17,14 +34,57 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
 
+from core import deletion, uploads
+from core.instrumentation import InstrumentedViewMixin, timed
 from core.models import (
+    DeletionTask,
     Recipe,
+    RecipeIngredient,
+    RecipeTag,
     Tag,
     Ingredient,
+    UploadSession,
+)
+from core.storage import (
+    HASH_CHUNK_SIZE,
+    content_hash,
+    load_upload,
+    sign_confirm,
+    upload_name,
 )
 from recipe import serializers
+from recipe.throttles import RateLimitHeadersMixin
+from user.serializers import DeletionTaskSerializer
+
+
+def link_prefetches(user):
+    """Return the prefetches of the tags and ingredients of a user's recipes.
+
+    They are read through the links, naming the user of the links and of
+    the tags or ingredients, so each table is read from a single partition
+    when partitioned by user. See serializers.LinkedListSerializer.
+    """
+    return [
+        Prefetch(
+            'recipetag_set',
+            queryset=RecipeTag.objects.filter(
+                user=user,
+                tag__user=user,
+            ).select_related('tag'),
+            to_attr='tag_links',
+        ),
+        Prefetch(
+            'recipeingredient_set',
+            queryset=RecipeIngredient.objects.filter(
+                user=user,
+                ingredient__user=user,
+            ).select_related('ingredient'),
+            to_attr='ingredient_links',
+        ),
+    ]
 
 
 @extend_schema_view(
@@ -43,33 +103,49 @@ from recipe import serializers
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(RateLimitHeadersMixin,
+                    InstrumentedViewMixin,
+                    viewsets.ModelViewSet):
     """"View for manage recipe APIs"""
 
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_budgets = {'upload_image': 'upload', 'upload_url': 'upload'}
+    # Actions whose responses nest the tags and ingredients of recipes
+    nested_actions = {'list', 'retrieve', 'update', 'partial_update'}
 
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    @timed('queryset')
     def get_queryset(self):
         """"Retrieve recipes for authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        user = self.request.user
         queryset = self.queryset
 
         if tags:
             tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = queryset.filter(
+                recipetag__tag__in=tag_ids,
+                recipetag__user=user,
+            )
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = queryset.filter(
+                recipeingredient__ingredient__in=ingredient_ids,
+                recipeingredient__user=user,
+            )
+        if self.action in self.nested_actions:
+            queryset = queryset.prefetch_related(*link_prefetches(user))
 
         return queryset.filter(
-            user=self.request.user
+            user=user,
+            deletion__isnull=True,
         ).order_by('-id').distinct()
 
     def get_serializer_class(self):
@@ -78,17 +154,53 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'upload_url':
+            return serializers.RecipeUploadUrlSerializer
+        elif self.action == 'bulk_delete':
+            return serializers.RecipeBulkDeleteSerializer
 
         return self.serializer_class
 
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
+        self.reload(serializer)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        self.reload(serializer)
+
+    def perform_destroy(self, instance):
+        # One DELETE naming the user, the links are deleted with the recipe
+        deletion.delete_rows(
+            Recipe.objects.filter(pk=instance.pk, user=self.request.user)
+        )
 
+    def reload(self, serializer):
+        """Read a saved recipe back with its tags and ingredients"""
+        serializer.instance = Recipe.objects.prefetch_related(
+            *link_prefetches(self.request.user),
+        ).get(pk=serializer.instance.pk, user=self.request.user)
+
+    @extend_schema(
+        request={
+            'multipart/form-data': serializers.RecipeImageSerializer,
+            'application/json': serializers.RecipeImageNameSerializer,
+        },
+        responses=serializers.RecipeImageSerializer,
+    )
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
+        """Upload an image, or confirm the name of a direct upload"""
         recipe = self.get_object()
-        serializer = self.get_serializer(recipe, data=request.data)
+        if 'confirm' in request.data and 'image' not in request.data:
+            serializer = serializers.RecipeImageNameSerializer(
+                recipe,
+                data=request.data,
+                context=self.get_serializer_context(),
+            )
+        else:
+            serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
@@ -96,6 +208,64 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(responses=serializers.RecipeUploadSerializer)
+    @action(methods=['POST'], detail=True, url_path='upload-url')
+    def upload_url(self, request, pk=None):
+        """Return a short-lived URL uploading an image straight to storage.
+
+        The file is named after its hash, attach it by sending the returned
+        confirm token to upload-image once uploaded. Nothing needs
+        uploading when the user's recipes already use the same bytes.
+        """
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        data = serializer.validated_data
+        name = upload_name(data['sha256'], data['content_type'])
+        owned = Recipe.objects.filter(user=request.user, image=name).exists()
+        if owned and default_storage.exists(name):
+            # Restarts the grace period of garbage collection, which must
+            # not delete the file before it is confirmed
+            default_storage.touch(name)
+            upload = written_after = None
+        else:
+            # Files of other users are uploaded again, proving the client
+            # has their bytes, the storage keeps a single copy
+            written_after = int(time.time())
+            upload = default_storage.upload_url(
+                name, data['sha256'], data['size'], data['content_type'],
+            )
+            upload['url'] = request.build_absolute_uri(upload['url'])
+
+        return Response({
+            'name': name,
+            'exists': upload is None,
+            'upload': upload,
+            'confirm': sign_confirm(
+                request.user.pk, recipe.pk, name, written_after,
+            ),
+        })
+
+    @extend_schema(responses={202: DeletionTaskSerializer})
+    @action(methods=['POST'], detail=False, url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """Delete recipes in the background, they are hidden right away"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        task = deletion.delete_recipes(
+            request.user,
+            serializer.validated_data['ids'],
+        )
+        return Response(
+            DeletionTaskSerializer(task).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -108,7 +278,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseRecipeViewSet(mixins.DestroyModelMixin,
+class BaseRecipeViewSet(RateLimitHeadersMixin,
+                        InstrumentedViewMixin,
+                        mixins.DestroyModelMixin,
                         mixins.UpdateModelMixin,
                         mixins.ListModelMixin,
                         viewsets.GenericViewSet,
@@ -116,27 +288,300 @@ class BaseRecipeViewSet(mixins.DestroyModelMixin,
     """Base class for recipe attributes """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # Query name of the links of the attribute to recipes
+    link_name = None
 
+    @timed('queryset')
     def get_queryset(self):
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(
+                **{f'{self.link_name}__user': self.request.user}
+            )
 
         return queryset.filter(
             user=self.request.user
         ).order_by('-name').distinct()
 
+    def perform_destroy(self, instance):
+        # One DELETE naming the user, the links are deleted with the row
+        deletion.delete_rows(
+            self.queryset.filter(pk=instance.pk, user=self.request.user)
+        )
+
 
 class TagViewSet(BaseRecipeViewSet):
     """Manage tags in database"""
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    link_name = 'recipetag'
 
 
 class IngredientViewSet(BaseRecipeViewSet):
     """Manage ingredients in the database"""
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    link_name = 'recipeingredient'
+
+
+class RecipeImageView(APIView):
+    """Serve a recipe image to the owner of the recipe.
+
+    The file itself is sent by nginx: the response only carries an
+    X-Accel-Redirect to the internal location under
+    MEDIA_ACCEL_REDIRECT_PREFIX. Without the prefix, as under runserver,
+    the file is streamed by Django.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    # Upload names are unique and never rewritten
+    max_age = 365 * 24 * 60 * 60
+
+    @extend_schema(responses={200: OpenApiTypes.BINARY})
+    def get(self, request, name):
+        """Return the image if it belongs to one of the user's recipes"""
+        if not Recipe.objects.filter(user=request.user, image=name).exists():
+            raise Http404
+
+        if settings.MEDIA_STORAGE == 's3':
+            # Served by the bucket or its CDN from a signed URL
+            return HttpResponseRedirect(default_storage.url(name))
+
+        content_type = mimetypes.guess_type(name)[0]
+        prefix = settings.MEDIA_ACCEL_REDIRECT_PREFIX
+        if prefix:
+            # nginx adds the cache headers of its internal location
+            response = HttpResponse(
+                content_type=content_type or 'application/octet-stream',
+            )
+            response['X-Accel-Redirect'] = prefix + name
+            return response
+
+        try:
+            response = FileResponse(
+                default_storage.open(name),
+                content_type=content_type,
+            )
+        except FileNotFoundError:
+            raise Http404
+
+        patch_cache_control(
+            response,
+            private=True,
+            max_age=self.max_age,
+            immutable=True,
+        )
+        return response
+
+
+class DirectUploadView(APIView):
+    """Receive a file PUT to a signed upload URL of the local storage.
+
+    The token in the URL is the authorization, as with the presigned URLs
+    of an object store. The body is stored only if it has the size and
+    hash the URL was signed for.
+    """
+    authentication_classes = []
+    permission_classes = []
+    # The body is read raw, not parsed
+    parser_classes = []
+    # Bodies up to this size are kept in memory while hashed
+    max_memory_size = 1024 * 1024
+
+    @extend_schema(
+        request={'application/octet-stream': OpenApiTypes.BINARY},
+        responses={201: OpenApiTypes.OBJECT},
+    )
+    def put(self, request, token):
+        """Store the body under the name the URL was signed for"""
+        try:
+            upload = load_upload(token)
+        except signing.BadSignature:
+            return Response(
+                {'detail': 'Invalid or expired upload URL.'},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        with tempfile.SpooledTemporaryFile(self.max_memory_size) as body:
+            # Reading stops past the signed size, larger bodies are refused
+            received = 0
+            stream = request.stream
+            while stream is not None and received <= upload['size']:
+                chunk = stream.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                body.write(chunk)
+
+            content = File(body, name=upload['name'])
+            matches = (
+                received == upload['size']
+                and content_hash(content) == upload['sha256']
+            )
+            if not matches:
+                return Response(
+                    {'detail': 'The body does not match the upload URL.'},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            name = default_storage.save(upload['name'], content)
+
+        return Response({'name': name}, status=status.HTTP_201_CREATED)
+
+
+class DeletionTaskViewSet(RateLimitHeadersMixin,
+                          InstrumentedViewMixin,
+                          mixins.RetrieveModelMixin,
+                          viewsets.GenericViewSet):
+    """Progress of the user's bulk recipe deletions"""
+    serializer_class = DeletionTaskSerializer
+    queryset = DeletionTask.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Retrieve deletions for authenticated user"""
+        return self.queryset.filter(user=self.request.user)
+
+
+def upload_headers(session):
+    """Return the headers describing the progress of an upload session"""
+    return {
+        'Upload-Offset': str(session.offset),
+        'Upload-Length': str(session.size),
+        'Cache-Control': 'no-store',
+    }
+
+
+class UploadSessionViewSet(RateLimitHeadersMixin,
+                           InstrumentedViewMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """Resumable uploads of recipe images, in the manner of tus.
+
+    Create a session for the size of the image, PATCH its bytes in chunks
+    at the offset received so far, then finalize it to attach the image to
+    the recipe. After a dropped connection, HEAD the session for its offset
+    and resume from there.
+    """
+    serializer_class = serializers.UploadSessionSerializer
+    queryset = UploadSession.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_budgets = {'create': 'upload', 'finalize': 'upload'}
+    chunk_content_type = 'application/offset+octet-stream'
+
+    def get_queryset(self):
+        """Retrieve upload sessions for authenticated user"""
+        return self.queryset.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        """Start a session for an image of the given size"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save(user=request.user)
+        uploads.start(session)
+
+        headers = upload_headers(session)
+        headers['Location'] = reverse(
+            'recipe:uploadsession-detail',
+            args=[session.id],
+        )
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED,
+            headers=headers,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return the session, its offset is the number of bytes received"""
+        session = self.get_object()
+        return Response(
+            self.get_serializer(session).data,
+            headers=upload_headers(session),
+        )
+
+    @extend_schema(
+        request={'application/offset+octet-stream': OpenApiTypes.BINARY},
+        parameters=[
+            OpenApiParameter(
+                'Upload-Offset',
+                OpenApiTypes.INT,
+                OpenApiParameter.HEADER,
+                required=True,
+                description='Bytes received before this chunk',
+            ),
+        ],
+        responses={204: None},
+    )
+    def partial_update(self, request, pk=None):
+        """Append a chunk of the image at the offset received so far"""
+        session = self.get_object()
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type != self.chunk_content_type:
+            return Response(
+                {'detail': f'Chunks are sent as {self.chunk_content_type}.'},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response(
+                {'detail': 'Upload-Offset is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if offset + length > session.size:
+            return Response(
+                {'detail': 'The chunk ends past the upload length.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                headers=upload_headers(session),
+            )
+
+        try:
+            session.offset = uploads.append(session, offset, request.stream)
+        except uploads.OffsetMismatch as exc:
+            session.offset = exc.offset
+            return Response(
+                {'detail': f'The upload continues at offset {exc.offset}.'},
+                status=status.HTTP_409_CONFLICT,
+                headers=upload_headers(session),
+            )
+
+        return Response(
+            status=status.HTTP_204_NO_CONTENT,
+            headers=upload_headers(session),
+        )
+
+    @extend_schema(request=None, responses=serializers.RecipeImageSerializer)
+    @action(methods=['POST'], detail=True)
+    def finalize(self, request, pk=None):
+        """Attach the received image to the recipe and end the session"""
+        session = self.get_object()
+        try:
+            recipe = uploads.finalize(session)
+        except uploads.IncompleteUpload:
+            return Response(
+                {'detail': 'Not all bytes of the upload were received.'},
+                status=status.HTTP_409_CONFLICT,
+                headers=upload_headers(session),
+            )
+        except uploads.InvalidImage:
+            return Response(
+                {'detail': 'The upload is not an image in an accepted '
+                           'format.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = serializers.RecipeImageSerializer(
+            recipe,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    def perform_destroy(self, instance):
+        """Abandon the session and delete its chunks"""
+        uploads.discard(instance)
@@ -11,6 +11,8 @@ from django.utils.translation import gettext
 
 from rest_framework import serializers
 
+from core.models import DeletionTask
+
 
 class UserSerializer(serializers.ModelSerializer):
     """serializer for the user object"""
@@ -59,3 +61,15 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class DeletionTaskSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of a queued deletion"""
+
+    class Meta:
+        model = DeletionTask
+        fields = [
+            'id', 'kind', 'status', 'total', 'deleted', 'created_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
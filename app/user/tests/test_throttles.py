@@ -0,0 +1,169 @@
+"""
+Tests for throttling the endpoints that hash passwords
+"""
+from unittest.mock import call, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from user.throttles import ScopedIdentityThrottle
+
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+
+RATES = {
+    'login_ip': '4/min',
+    'login_email': '2/min',
+    'signup_ip': '2/min',
+    'signup_email': '1/min',
+}
+
+
+@patch.object(ScopedIdentityThrottle, 'THROTTLE_RATES', RATES)
+class LoginThrottleTests(TestCase):
+    """Test throttling token requests"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def login(self, email, password='wrongpass', **extra):
+        return self.client.post(
+            TOKEN_URL,
+            {'email': email, 'password': password},
+            **extra,
+        )
+
+    @patch('user.serializers.authenticate', return_value=None)
+    def test_email_throttled_before_hashing(self, patched_authenticate):
+        """Test throttled attempts never reach the password check"""
+        self.login('user@example.com')
+        self.login('user@example.com')
+
+        res = self.login('user@example.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        self.assertEqual(patched_authenticate.call_count, 2)
+
+    def test_email_throttle_ignores_case_and_address(self):
+        """Test one account is limited whatever the client address"""
+        self.login('user@example.com', REMOTE_ADDR='10.0.0.1')
+        self.login(' USER@example.com', REMOTE_ADDR='10.0.0.2')
+
+        res = self.login('User@Example.com', REMOTE_ADDR='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_throttled_across_emails(self):
+        """Test one address is limited across accounts"""
+        for i in range(4):
+            self.login(f'user{i}@example.com')
+
+        res = self.login('other@example.com')
+        other_address = self.login('other@example.com', REMOTE_ADDR='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other_address.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forwarded_for_not_trusted(self):
+        """Test X-Forwarded-For cannot be rotated to escape the limit"""
+        for i in range(4):
+            self.login(f'user{i}@example.com', HTTP_X_FORWARDED_FOR=f'1.1.1.{i}')
+
+        res = self.login('other@example.com', HTTP_X_FORWARDED_FOR='1.1.1.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @patch.object(api_settings, 'NUM_PROXIES', 1)
+    def test_clients_behind_proxy_limited_separately(self):
+        """Test clients behind the HTTP proxy each get their own limit"""
+        proxy = {'REMOTE_ADDR': '172.18.0.5'}
+        for i in range(4):
+            # The proxy appends the client to whatever the client sent
+            self.login(
+                f'user{i}@example.com',
+                HTTP_X_FORWARDED_FOR=f'1.1.1.{i}, 203.0.113.1',
+                **proxy,
+            )
+
+        res = self.login(
+            'other@example.com',
+            HTTP_X_FORWARDED_FOR='203.0.113.1',
+            **proxy,
+        )
+        other_client = self.login(
+            'other@example.com',
+            HTTP_X_FORWARDED_FOR='203.0.113.2',
+            **proxy,
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other_client.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_history_lookups_recorded(self):
+        """Test each throttle's history lookup counts for the hit ratio"""
+        with patch('user.throttles.record_cache') as record_cache:
+            self.login('user@example.com')
+            self.login('user@example.com')
+
+        self.assertEqual(record_cache.call_args_list, [
+            call('throttle_login_ip', hit=False),
+            call('throttle_login_email', hit=False),
+            call('throttle_login_ip', hit=True),
+            call('throttle_login_email', hit=True),
+        ])
+
+    def test_successful_login_within_limit(self):
+        """Test logins under the limit are unaffected"""
+        res = self.login('user@example.com', password='testpass123')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('token', res.data)
+
+
+@patch.object(ScopedIdentityThrottle, 'THROTTLE_RATES', RATES)
+class SignupThrottleTests(TestCase):
+    """Test throttling sign-ups"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def signup(self, email):
+        return self.client.post(CREATE_USER_URL, {
+            'email': email,
+            'password': 'testpass123',
+            'name': 'Test',
+        })
+
+    def test_signup_throttled_per_email(self):
+        """Test repeated sign-ups for one email are throttled"""
+        self.signup('new@example.com')
+
+        res = self.signup('new@example.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_signup_throttled_per_ip(self):
+        """Test sign-ups from one address are throttled"""
+        self.signup('one@example.com')
+        self.signup('two@example.com')
+
+        res = self.signup('three@example.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(
+            get_user_model().objects.filter(email='three@example.com').exists()
+        )
@@ -5,6 +5,7 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
@@ -156,3 +157,16 @@ class PrivateUserAPITest(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+    def test_delete_account(self):
+        """Test deleting the account deactivates it at once"""
+        Token.objects.create(user=self.user)
+
+        result = self.client.delete(ME_URL)
+
+        self.assertEqual(result.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(result.data['kind'], 'user')
+        self.assertEqual(result.data['status'], 'pending')
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
@@ -0,0 +1,74 @@
+"""
+Throttles for the user API endpoints that hash passwords
+"""
+import hashlib
+
+from rest_framework.throttling import SimpleRateThrottle
+
+from core.metrics import record_cache
+
+
+class ScopedIdentityThrottle(SimpleRateThrottle):
+    """Throttle the throttle_scope of a view per client identity.
+
+    The rate is looked up as '<throttle_scope>_<identity>' in
+    DEFAULT_THROTTLE_RATES, so the token and sign-up views get their own
+    limits. Request timestamps are kept in the shared cache, making the
+    window sliding and common to every worker.
+    """
+    identity = None
+
+    def __init__(self):
+        # The rate depends on the view, it is resolved in allow_request
+        pass
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+
+        self.scope = f'{scope}_{self.identity}'
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        # As SimpleRateThrottle, counting the lookup of the history
+        history = self.cache.get(self.key)
+        record_cache(f'throttle_{self.scope}', hit=history is not None)
+        self.history = history or []
+        self.now = self.timer()
+        while self.history and self.history[-1] <= self.now - self.duration:
+            self.history.pop()
+        if len(self.history) >= self.num_requests:
+            return self.throttle_failure()
+        return self.throttle_success()
+
+
+class IPThrottle(ScopedIdentityThrottle):
+    """Limit requests from one client address"""
+    identity = 'ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class EmailThrottle(ScopedIdentityThrottle):
+    """Limit requests for one account, whatever address they come from"""
+    identity = 'email'
+
+    def get_cache_key(self, request, view):
+        email = getattr(request.data, 'get', lambda key: None)('email')
+        if not email or not isinstance(email, str):
+            return None
+
+        # Hashed to keep arbitrary input within cache key limits
+        email = email.strip().lower().encode()
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': hashlib.sha256(email).hexdigest(),
+        }
@@ -1,28 +1,41 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from drf_spectacular.utils import extend_schema
+
+from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core import deletion
+from core.instrumentation import InstrumentedViewMixin
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    DeletionTaskSerializer,
 )
+from user.throttles import EmailThrottle, IPThrottle
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(InstrumentedViewMixin, generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
+    # Throttles run before the serializer hashes the password
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'signup'
 
 
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(InstrumentedViewMixin, ObtainAuthToken):
     """Create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'login'
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(InstrumentedViewMixin,
+                     generics.RetrieveUpdateDestroyAPIView):
     """Manage autnticated user"""
     serializer_class = UserSerializer
     authentication_classes = [authentication.TokenAuthentication]
@@ -31,3 +44,12 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """Retrieve and return the authenticated user"""
         return self.request.user
+
+    @extend_schema(responses={202: DeletionTaskSerializer})
+    def delete(self, request, *args, **kwargs):
+        """Deactivate the account now, its data is deleted in the background"""
+        task = deletion.delete_user(request.user)
+        return Response(
+            DeletionTaskSerializer(task).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
@@ -1,8 +1,30 @@
 server {
     listen ${LISTEN_PORT};
 
-    location /static {
-        alias /vol/static;
+    # The volume also holds the uploaded media, which is never public
+    location /static/static/ {
+        alias /vol/static/static/;
+    }
+
+    # Recipe images, only reachable through the X-Accel-Redirect of the app
+    # once it checked the recipe belongs to the user. Upload names are
+    # unique, so files are cached for a year
+    location /protected-media/ {
+        internal;
+        alias                   /vol/static/media/;
+        sendfile                on;
+        tcp_nopush              on;
+        add_header              Cache-Control "private, max-age=31536000, immutable";
+    }
+
+    location = /metrics {
+        allow                   127.0.0.1;
+        allow                   10.0.0.0/8;
+        allow                   172.16.0.0/12;
+        allow                   192.168.0.0/16;
+        deny                    all;
+        uwsgi_pass              ${APP_HOST}:${APP_PORT};
+        include                 /etc/nginx/uwsgi_params;
     }
 
     location / {
@@ -2,5 +2,12 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
-nginx -g 'daemon off;'
\ No newline at end of file
+# APP_PROTOCOL is uwsgi for the uWSGI app server or http for the ASGI one
+if [ "$APP_PROTOCOL" = "http" ]; then
+    TEMPLATE=/etc/nginx/default-http.conf.tpl
+else
+    TEMPLATE=/etc/nginx/default.conf.tpl
+fi
+
+envsubst < "$TEMPLATE" > /etc/nginx/conf.d/default.conf
+nginx -g 'daemon off;'
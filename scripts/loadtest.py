@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+"""
+Concurrent HTTP load generator used to compare deployments.
+
+Every client keeps one keep-alive connection and sends requests back to
+back. Slow clients open connections and trickle their request headers for
+the whole run, the way bad mobile networks do, to show whether they tie up
+server workers.
+
+Compare the uWSGI and ASGI stacks by running the same load against each:
+
+    docker-compose -f docker-compose-deploy.yml up -d
+    python scripts/loadtest.py http://localhost:8000/api/recipe/recipes/ \\
+        --token $TOKEN --concurrency 200 --slow-clients 100 --json uwsgi.json
+
+    docker-compose -f docker-compose-deploy.yml \\
+        -f docker-compose-asgi.yml up -d
+    python scripts/loadtest.py http://localhost:8000/api/recipe/recipes/ \\
+        --token $TOKEN --concurrency 200 --slow-clients 100 --json asgi.json
+
+Check load shedding by overloading the app with list polling while a
+second run measures the writes that must keep working:
+
+    python scripts/loadtest.py http://localhost:8000/api/recipe/recipes/ \\
+        --token $TOKEN --concurrency 200 --duration 60 &
+    python scripts/loadtest.py http://localhost:8000/api/recipe/tags/1/ \\
+        --method PATCH --body '{"name": "Shed"}' --token $TOKEN \\
+        --concurrency 10 --duration 60
+
+The summary gives latency percentiles for each status code, so the fast
+503s of shed requests do not hide the latency of the served ones.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+    """Return a percentile of a sorted list"""
+    if not values:
+        return 0
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response and return its status code"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by server')
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+
+    return status, headers.get('connection') == 'close'
+
+
+class LoadTest:
+    """Run the load and collect latencies"""
+
+    def __init__(self, url, method, headers, body, duration, timeout,
+                 request_start=False):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.request = self.build_request(parts, method, headers, body)
+        self.duration = duration
+        self.timeout = timeout
+        self.request_start = request_start
+        self.latencies = []
+        self.latencies_by_status = collections.defaultdict(list)
+        self.statuses = collections.Counter()
+        self.errors = collections.Counter()
+
+    def build_request(self, parts, method, headers, body):
+        """Return the raw bytes of the request"""
+        target = parts.path or '/'
+        if parts.query:
+            target += f'?{parts.query}'
+        lines = [
+            f'{method} {target} HTTP/1.1',
+            f'Host: {parts.netloc}',
+            'Connection: keep-alive',
+        ]
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        if body:
+            lines.append(f'Content-Length: {len(body)}')
+
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin1') + body
+
+    def stamped(self):
+        """Return the request, with X-Request-Start when stamping"""
+        if not self.request_start:
+            return self.request
+
+        # Stands in for the header nginx adds, when testing without it
+        line_end = self.request.index(b'\r\n') + 2
+        stamp = f'X-Request-Start: t={time.time():.3f}\r\n'.encode()
+        return self.request[:line_end] + stamp + self.request[line_end:]
+
+    async def client(self, deadline):
+        """Send requests on one connection until the deadline"""
+        reader = writer = None
+        reused = False
+        while time.monotonic() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port),
+                        self.timeout,
+                    )
+                    reused = False
+                start = time.monotonic()
+                writer.write(self.stamped())
+                status, close = await asyncio.wait_for(
+                    read_response(reader),
+                    self.timeout,
+                )
+                latency = time.monotonic() - start
+                self.latencies.append(latency)
+                self.latencies_by_status[status].append(latency)
+                self.statuses[status] += 1
+                reused = True
+                if close:
+                    writer.close()
+                    writer = None
+            except (OSError, ConnectionError, asyncio.TimeoutError,
+                    asyncio.IncompleteReadError, ValueError) as exc:
+                # A server closing an idle keep-alive connection is not
+                # an error, the request is sent again on a new connection
+                if not (reused and isinstance(exc, ConnectionError)):
+                    self.errors[type(exc).__name__] += 1
+                if writer is not None:
+                    writer.close()
+                writer = None
+
+    async def slow_client(self, deadline):
+        """Hold a connection open by sending headers one byte at a time"""
+        try:
+            _, writer = await asyncio.open_connection(self.host, self.port)
+        except OSError as exc:
+            self.errors[f'slow:{type(exc).__name__}'] += 1
+            return
+
+        head = self.request.split(b'\r\n\r\n')[0]
+        delay = max(self.duration / max(len(head), 1), 0.05)
+        try:
+            for byte in head:
+                if time.monotonic() >= deadline:
+                    break
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(delay)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    async def run(self, concurrency, slow_clients):
+        """Run all clients and return the summary"""
+        deadline = time.monotonic() + self.duration
+        tasks = [self.slow_client(deadline) for _ in range(slow_clients)]
+        tasks += [self.client(deadline) for _ in range(concurrency)]
+        started = time.monotonic()
+        await asyncio.gather(*tasks)
+
+        return self.summary(time.monotonic() - started)
+
+    def summary(self, elapsed):
+        """Return throughput, latency percentiles and errors"""
+        latencies = sorted(self.latencies)
+        return {
+            'requests': len(latencies),
+            'elapsed': round(elapsed, 2),
+            'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+            'mean_ms': round(statistics.mean(latencies) * 1000, 1)
+            if latencies else 0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p90_ms': round(percentile(latencies, 0.90) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0,
+            'statuses': dict(self.statuses),
+            'p99_ms_by_status': {
+                status: round(percentile(sorted(values), 0.99) * 1000, 1)
+                for status, values in sorted(self.latencies_by_status.items())
+            },
+            'errors': dict(self.errors),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('url')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--token', help='API token sent as Authorization')
+    parser.add_argument(
+        '--header', action='append', default=[],
+        help='Extra header as "Name: value", may be repeated.',
+    )
+    parser.add_argument('--body', default='', help='Request body.')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--slow-clients', type=int, default=0)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--json', help='Also write the summary to a file.')
+    parser.add_argument(
+        '--request-start', action='store_true',
+        help='Send X-Request-Start as a proxy would, when there is none.',
+    )
+    args = parser.parse_args()
+
+    headers = dict(
+        (part.strip() for part in header.split(':', 1))
+        for header in args.header
+    )
+    if args.token:
+        headers['Authorization'] = f'Token {args.token}'
+    if args.body:
+        headers.setdefault('Content-Type', 'application/json')
+
+    load_test = LoadTest(
+        args.url,
+        args.method,
+        headers,
+        args.body.encode(),
+        args.duration,
+        args.timeout,
+        args.request_start,
+    )
+    summary = asyncio.run(load_test.run(args.concurrency, args.slow_clients))
+
+    print(json.dumps(summary, indent=2))
+    if args.json:
+        with open(args.json, 'w') as summary_file:
+            json.dump(summary, summary_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+#!/bin/sh
+
+set -e
+
+export BOOT_STARTED_AT=${BOOT_STARTED_AT:-$(date +%s)}
+
+# Shared directory where every worker writes its Prometheus samples
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Waits for the database, then skips collectstatic and migrate when
+# nothing changed since the last start, and prints how long each step took
+python manage.py boot
+
+# Each uvicorn worker runs an event loop, slow clients only hold a socket
+exec gunicorn app.asgi:application \
+    --worker-class uvicorn.workers.UvicornWorker \
+    --bind "0.0.0.0:${APP_PORT:-9000}" \
+    --workers "${ASGI_WORKERS:-$(nproc)}" \
+    --graceful-timeout 30 \
+    --timeout 60
@@ -2,8 +2,20 @@
 
 set -e
 
-python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py migrate
+export BOOT_STARTED_AT=${BOOT_STARTED_AT:-$(date +%s)}
 
-uwsgi --socket: 9000 --workers4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+# Shared directory where every uWSGI worker writes its Prometheus samples
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
+# Waits for the database, then skips collectstatic and migrate when
+# nothing changed since the last start, and prints how long each step took
+python manage.py boot
+
+# Workers are sized from the CPUs and memory of the container, set
+# WORKER_PROCESSES, WORKER_THREADS and the like to override
+python manage.py uwsgi_config --output /tmp/uwsgi.ini
+cat /tmp/uwsgi.ini
+
+exec uwsgi --ini /tmp/uwsgi.ini
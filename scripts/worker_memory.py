@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Report the unique and shared memory of every worker of a server.
+
+Unique set size (USS) is the memory freed if a worker exits, the pages no
+other process shares. Proportional set size (PSS) splits shared pages
+between the processes sharing them. Pass the pid of the uWSGI master:
+
+    python scripts/worker_memory.py $(pgrep -o uwsgi)
+"""
+import argparse
+import json
+import os
+
+FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty',
+          'Private_Clean', 'Private_Dirty')
+
+
+def children(pid):
+    """Return the pids of the direct children of a process"""
+    pids = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as file:
+            pids += [int(child) for child in file.read().split()]
+    return sorted(pids)
+
+
+def memory(pid):
+    """Return the memory of a process in kilobytes from smaps_rollup"""
+    values = dict.fromkeys(FIELDS, 0)
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            name, _, rest = line.partition(':')
+            if name in values:
+                values[name] = int(rest.split()[0])
+
+    return {
+        'pid': pid,
+        'rss_kb': values['Rss'],
+        'pss_kb': values['Pss'],
+        'uss_kb': values['Private_Clean'] + values['Private_Dirty'],
+        'shared_kb': values['Shared_Clean'] + values['Shared_Dirty'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('pid', type=int, help='Pid of the master process.')
+    parser.add_argument('--json', help='Also write the report to a file.')
+    args = parser.parse_args()
+
+    master = memory(args.pid)
+    workers = [memory(pid) for pid in children(args.pid)]
+    report = {
+        'master': master,
+        'workers': workers,
+        'mean_worker_uss_kb': round(
+            sum(worker['uss_kb'] for worker in workers) / len(workers)
+        ) if workers else 0,
+        'total_pss_kb': master['pss_kb'] + sum(
+            worker['pss_kb'] for worker in workers
+        ),
+    }
+
+    print(f'{"pid":>8} {"rss":>9} {"pss":>9} {"uss":>9} {"shared":>9}')
+    for row in [master] + workers:
+        print(
+            f'{row["pid"]:>8} {row["rss_kb"]:>9} {row["pss_kb"]:>9} '
+            f'{row["uss_kb"]:>9} {row["shared_kb"]:>9}'
+        )
+    print(f'mean worker USS: {report["mean_worker_uss_kb"]} kB')
+    print(f'total PSS: {report["total_pss_kb"]} kB')
+
+    if args.json:
+        with open(args.json, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()